@@ -1,3 +1,5 @@
+from django.template.loader import render_to_string
+
 GUEST_KEY = 'guest'
 
 
@@ -10,3 +12,17 @@ def is_regular_user(user):
 
 def is_guest_passthrough(request):
     return request.GET.get(GUEST_KEY, False)
+
+
+def render_account_links(request):
+    """
+    Renders the account links at the top of every page, which show whether or not the user is logged in.
+    """
+    return render_to_string("_account_links.html", {'user': request.user})
+
+
+def render_staff_links(request):
+    """
+    Renders the link to the admin site in the page footer, for staff only.
+    """
+    return render_to_string("_staff_links.html", {'user': request.user})
@@ -1,5 +1,7 @@
 from django.contrib import admin
 from accounts.models import CustomerProfile, CustomerBillingAddress, CustomerShippingAddress
+from accounts.export import export_customers_response
+from utils.export import ExportAdminMixin
 
 
 class BillingAddressInline(admin.StackedInline):
@@ -14,9 +16,12 @@ class ShippingAddressInline(admin.StackedInline):
     readonly_fields = ('last_used',)
 
 
-class CustomerProfileAdmin(admin.ModelAdmin):
+class CustomerProfileAdmin(ExportAdminMixin, admin.ModelAdmin):
     list_display = ('__unicode__', 'last_name', 'first_name', 'date_added')
     inlines = [ShippingAddressInline, BillingAddressInline]
     readonly_fields = ('date_added',)
 
+    def export(self, format, queryset=None, after=None):
+        return export_customers_response(format, queryset, after)
+
 admin.site.register(CustomerProfile, CustomerProfileAdmin)
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Streaming customer exports.  See utils.export for the chunking strategy.
+"""
+
+from accounts.models import CustomerProfile, CustomerShippingAddress, CustomerBillingAddress
+from utils.export import iterate_in_chunks, address_dict, export_response, export_to_file, ADDRESS_FIELDS, \
+    DEFAULT_CHUNK_SIZE, CSV
+
+CSV_COLUMNS = [
+    ('id', 'Customer'),
+    ('user', 'User'),
+    ('username', 'Username'),
+    ('email', 'Email'),
+    ('first_name', 'First Name'),
+    ('last_name', 'Last Name'),
+    ('phone', 'Phone'),
+    ('contact_method', 'Contact Method'),
+    ('date_added', 'Date Added'),
+    ('shipping_addresses', 'Shipping Addresses'),
+] + [('billing_%s' % f, 'Billing %s' % f.replace('_', ' ').title()) for f in ADDRESS_FIELDS]
+
+
+def customer_rows(queryset=None, after=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields one dictionary per customer profile, in increasing profile id.  Addresses are loaded with a fixed number
+    of queries per chunk of customers.
+    """
+    if queryset is None:
+        queryset = CustomerProfile.objects.all()
+
+    for customers in iterate_in_chunks(queryset.select_related('user'), chunk_size, after):
+        ids = [customer.id for customer in customers]
+        shipping_addresses = {}
+        for address in CustomerShippingAddress.objects.filter(customer__in=ids).order_by('-last_used'):
+            shipping_addresses.setdefault(address.customer_id, []).append(address)
+        billing_addresses = dict((address.customer_id, address) for address in
+                                 CustomerBillingAddress.objects.filter(customer__in=ids))
+
+        for customer in customers:
+            shipping = []
+            for address in shipping_addresses.get(customer.id, []):
+                row = address_dict(address)
+                row['nickname'] = address.nickname
+                shipping.append(row)
+
+            yield {
+                'id': customer.id,
+                'user': customer.user_id,
+                'username': customer.user.username,
+                'email': customer.user.email,
+                'first_name': customer.user.first_name,
+                'last_name': customer.user.last_name,
+                'phone': customer.phone,
+                'contact_method': customer.get_contact_method_display(),
+                'date_added': customer.date_added,
+                'shipping_addresses': shipping,
+                'billing_address': address_dict(billing_addresses.get(customer.id)),
+            }
+
+
+def as_csv_row(row):
+    """
+    Flattens a customer dictionary so that it fits in a single CSV row.
+    """
+    flat = dict(row)
+    flat['shipping_addresses'] = '; '.join([address['nickname'] for address in row['shipping_addresses']])
+    billing = row['billing_address'] or {}
+    for field in ADDRESS_FIELDS:
+        flat['billing_%s' % field] = billing.get(field)
+    return flat
+
+
+def _rows_for_format(format, rows):
+    if format == CSV:
+        return (as_csv_row(row) for row in rows)
+    return rows
+
+
+def export_customers_response(format, queryset=None, after=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    rows = _rows_for_format(format, customer_rows(queryset, after, chunk_size))
+    return export_response(format, CSV_COLUMNS, rows, 'customers')
+
+
+def export_customers_to_file(out, format, queryset=None, after=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    rows = _rows_for_format(format, customer_rows(queryset, after, chunk_size))
+    return export_to_file(out, format, CSV_COLUMNS, rows)
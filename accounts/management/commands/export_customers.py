@@ -0,0 +1,32 @@
+import sys
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from accounts.export import export_customers_to_file
+from utils.export import FORMATS, CSV, DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Exports customer profiles, with their addresses, as CSV or JSON."
+    option_list = BaseCommand.option_list + (
+        make_option('--format', dest='format', default=CSV, help="One of: %s" % ', '.join(FORMATS)),
+        make_option('--output', dest='output', default=None, help="Output file.  Defaults to stdout."),
+        make_option('--after', dest='after', type='int', default=None,
+                    help="Only export customers with an id greater than this one.  Use it to resume an export."),
+        make_option('--chunk-size', dest='chunk_size', type='int', default=DEFAULT_CHUNK_SIZE,
+                    help="The number of customer profiles to read from the database at a time."),
+    )
+
+    def handle(self, *args, **options):
+        format = options['format']
+        if format not in FORMATS:
+            raise CommandError("Unrecognized export format: %s" % format)
+
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout
+        try:
+            count, cursor = export_customers_to_file(out, format, after=options['after'],
+                                                     chunk_size=options['chunk_size'])
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        # report to stderr so that the cursor doesn't end up in the exported data when writing to stdout
+        sys.stderr.write("Exported %d customers.  Last customer id: %s\n" % (count, cursor))
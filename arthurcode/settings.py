@@ -1,4 +1,7 @@
 # Django settings for arthurcode project.
+import os
+import sys
+import tempfile
 
 DEBUG = True
 TEMPLATE_DEBUG = DEBUG
@@ -36,6 +39,49 @@ HAYSTACK_CONNECTIONS = {
         'INCLUDE_SPELLING': True,
     }
 }
+if os.environ.get('ARTHURCODE_SEARCH') == 'inprocess':
+    # search without a Solr server (development, CI), see search.inprocess_backend
+    HAYSTACK_CONNECTIONS = {
+        'default': {
+            'ENGINE': 'search.inprocess_backend.InProcessEngine',
+            'PATH': os.path.join(os.path.dirname(__file__), '..', 'search_index'),
+            'INCLUDE_SPELLING': True,
+        }
+    }
+# queue search index updates from catalogue edits, and send them to Solr in batches, see catalogue.indexutils
+HAYSTACK_SIGNAL_PROCESSOR = 'catalogue.indexutils.QueuedSignalProcessor'
+SEARCH_INDEX_UPDATES = 'background'
+SEARCH_INDEX_INTERVAL = 5   # seconds
+if 'test' in sys.argv[1:2]:
+    # tests mustn't send their products to the configured search backend, unless they ask for index updates
+    SEARCH_INDEX_UPDATES = 'off'
+# serve the category pages (products and filter counts) from the search index rather than the DB, see
+# catalogue.listingutils.  Needs an index that has been rebuilt with the stored listing fields.
+CATALOGUE_SEARCH_LISTINGS = False
+
+# The page cache, the search result and typeahead caches, and the version counters that invalidate them (see
+# utils.pagecache) must be shared by every process that serves the site, or a change seen by one process never
+# reaches the others.  The file based cache is shared by the processes on one host.  A deployment on more than one
+# host needs memcached instead:
+#     CACHES = {'default': {'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+#                           'LOCATION': '127.0.0.1:11211'}}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'arthurcode-cache'),
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        }
+    }
+}
+if os.environ.get('ARTHURCODE_CACHE') == 'locmem' or 'test' in sys.argv[1:2]:
+    # a single process (development, tests), and tests mustn't see what earlier runs left in the cache
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
 
 # Hosts/domain names that are valid for this site; required if DEBUG is False
 # See https://docs.djangoproject.com/en//ref/settings/#allowed-hosts
@@ -114,6 +160,7 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'utils.pagecache.PageCacheMiddleware',                       # must come after the auth and message middleware
     # Uncomment the next line for simple clickjacking protection:
     # 'django.middleware.clickjacking.XFrameOptionsMiddleware',
     #'debug_toolbar.middleware.DebugToolbarMiddleware',           # order is important, must come after middleware that encodes content, such as GZIP
@@ -126,7 +173,6 @@ WSGI_APPLICATION = 'arthurcode.wsgi.application'
 
 LOGIN_REDIRECT_URL = '/accounts/personal'
 
-import os
 TEMPLATE_DIRS = (os.path.join(os.path.dirname(__file__), '..', 'templates').replace('\\','/'),)
 
 INSTALLED_APPS = (
@@ -249,6 +295,17 @@ AUTHENTICATION_BACKENDS = (
 
 COMMENTS_HIDE_REMOVED = False
 ALLOW_REVIEWS = True
+AKISMET_ASYNC = False     # hold new comments and check them for spam on a background thread, see comments.spamcheck
+QUEUED_EMAIL_DELIVERY = 'background'   # how comment notification emails are delivered, see comments.mailqueue
+SEARCH_LOG_FLUSH = 'background'   # how buffered search terms are written to the DB, see search.searchutils
+CURRENCY = 'CAD'                   # the currency that prices are shown in, see utils.currency
+PAGE_CACHE_TIMEOUT = 10 * 60       # how long anonymous pages are served from the page cache, see utils.pagecache
+PAGE_CACHE_HOLES = {
+    'cart_summary': 'cart.templatetags.cart_tags.render_cart_summary',
+    'account_links': 'accounts.accountutils.render_account_links',
+    'staff_links': 'accounts.accountutils.render_staff_links',
+}
+PAGE_CACHE_AJAX_HOLES = False      # fill in the holes of cached pages in the browser, rather than when serving them
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
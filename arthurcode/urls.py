@@ -13,6 +13,8 @@ import wishlists.urls
 import giftcards.urls
 import emaillist.urls
 from arthurcode.views import AboutView, ContactView, FAQView, PrivacyPolicyView, ReturnPolicyView
+from utils.pagecache import page_cache
+from utils.views import page_holes_view
 
 from django.contrib import admin
 admin.autodiscover()
@@ -28,15 +30,15 @@ urlpatterns = patterns('',
     # Uncomment the next line to enable the admin:
     url(r'^admin/', include(admin.site.urls)),
 
-    url(r'^about/', AboutView.as_view(), name="about"),
+    url(r'^about/', page_cache(authenticated=True)(AboutView.as_view()), name="about"),
 
-    url(r'^contact/', ContactView.as_view(), name="contact"),
+    url(r'^contact/', page_cache(authenticated=True)(ContactView.as_view()), name="contact"),
 
-    url(r'^faq/', FAQView.as_view(), name="faq"),
+    url(r'^faq/', page_cache(authenticated=True)(FAQView.as_view()), name="faq"),
 
-    url(r'^privacy/', PrivacyPolicyView.as_view(), name="privacy"),
+    url(r'^privacy/', page_cache(authenticated=True)(PrivacyPolicyView.as_view()), name="privacy"),
 
-    url(r'^return-policy/', ReturnPolicyView.as_view(), name="return_policy"),
+    url(r'^return-policy/', page_cache(authenticated=True)(ReturnPolicyView.as_view()), name="return_policy"),
 
     url(r'^blog/', include(blog.urls)),
 
@@ -63,4 +65,6 @@ urlpatterns = patterns('',
     url(r'giftcards/', include(giftcards.urls)),
 
     url(r'mailing-list/', include(emaillist.urls)),
+
+    url(r'^page-holes$', page_holes_view, name="page_holes"),
 )
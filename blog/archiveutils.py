@@ -0,0 +1,108 @@
+"""
+The blog archive index: the number of published posts per month and per tag.
+
+The index is stored in the ArchiveMonth and ArchiveTag tables, and it is cached as a whole, so the archive pages and
+sidebar read it without touching the posts.  The Post and TaggedPost signal handlers keep it up to date: when a post
+is saved (which includes publishing it) or deleted they recount the months it was and is published in, and the tags
+of a post that is published or unpublished, and when a post is re-tagged they recount the tags that changed.  Each
+recount is a count query, so an edit costs a few small queries no matter how many posts there are.
+"""
+
+import datetime
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from blog.models import Post, TaggedPost, ArchiveMonth, ArchiveTag
+
+ARCHIVE_KEY = 'blog-archive-index'
+ARCHIVE_TIMEOUT = 24 * 60 * 60
+
+
+def _set_count(queryset, count, **fields):
+    """
+    Sets the post count of the index row that the given queryset selects, creating the row if it is missing and
+    deleting it if the count is 0.
+    """
+    if not count:
+        queryset.delete()
+    elif not queryset.update(post_count=count):
+        queryset.model.objects.create(post_count=count, **fields)
+
+
+@transaction.commit_on_success
+def update_months(months):
+    """
+    Recounts the published posts in each of the given (year, month) pairs.
+    """
+    for year, month in set(months):
+        count = Post.published.filter(pub_date__year=year, pub_date__month=month).count()
+        _set_count(ArchiveMonth.objects.filter(year=year, month=month), count, year=year, month=month)
+    cache.delete(ARCHIVE_KEY)
+
+
+@transaction.commit_on_success
+def update_tags(tag_ids):
+    """
+    Recounts the published posts with each of the given tags.
+    """
+    tag_ids = set(tag_ids)
+    counts = dict(TaggedPost.objects.filter(tag__in=tag_ids, content_object__is_draft=False).values_list('tag').
+                  annotate(n=Count('id')))
+    for tag_id in tag_ids:
+        _set_count(ArchiveTag.objects.filter(tag=tag_id), counts.get(tag_id, 0), tag_id=tag_id)
+    cache.delete(ARCHIVE_KEY)
+
+
+def _get_index():
+    index = cache.get(ARCHIVE_KEY)
+    if index is None:
+        index = {
+            'months': list(ArchiveMonth.objects.all()),
+            'tags': list(ArchiveTag.objects.select_related('tag').order_by('-post_count', 'tag__name')),
+        }
+        cache.set(ARCHIVE_KEY, index, ARCHIVE_TIMEOUT)
+    return index
+
+
+def get_archive_months():
+    """
+    Returns the ArchiveMonths that have published posts, newest first.
+    """
+    return _get_index()['months']
+
+
+def get_archive_years():
+    """
+    Returns a list of (year, post count, months) tuples, newest first, where months is the list of ArchiveMonths in
+    that year.
+    """
+    years = []
+    for month in get_archive_months():
+        if not years or years[-1][0] != month.year:
+            years.append((month.year, 0, []))
+        year, count, months = years[-1]
+        months.append(month)
+        years[-1] = (year, count + month.post_count, months)
+    return years
+
+
+def get_archive_tags():
+    """
+    Returns the ArchiveTags of the tags that are used by published posts, most used first.
+    """
+    return _get_index()['tags']
+
+
+def get_year_dates():
+    """
+    Returns the first day of every year that has published posts, newest first, as datetimes so that they can stand
+    in for a date_list query in the archive views.
+    """
+    return [datetime.datetime(year, 1, 1) for year, _, _ in get_archive_years()]
+
+
+def get_month_dates(year):
+    """
+    Returns the first day of every month in the given year that has published posts, newest first.
+    """
+    return [datetime.datetime(month.year, month.month, 1) for month in get_archive_months() if month.year == year]
@@ -1,11 +1,20 @@
 __author__ = 'rhyanarthur'
 
 from django.contrib.syndication.views import Feed
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, parse_etags, quote_etag
 from blog.models import Post
 import datetime
+import hashlib
+import time
 from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed, rfc3339_date
 
+# the rendered feeds are cached until a post, its tags or its author changes (see blog.signals), the timeout only
+# bounds how long a feed that nobody polls stays in the cache
+FEED_TIMEOUT = 24 * 60 * 60
+
 
 # BEGIN PATCH - https://code.djangoproject.com/ticket/14656
 # 'published' element missing from atom feeds
@@ -34,11 +43,51 @@ class LatestPostsFeed(Feed):
     feed_version = "RSS 2.01"
     description = "The latest in django web-development from Rhyan Arthur, founder of thetoytree.com."
 
+    def __call__(self, request, *args, **kwargs):
+        """
+        Serves the feed from the cache, with an ETag and a Last-Modified header, so that feed readers polling for
+        changes get a 304 response without any queries.
+        """
+        cached = cache.get(self.cache_key())
+        if cached is None:
+            cached = self._render(request, *args, **kwargs)
+            cache.set(self.cache_key(), cached, FEED_TIMEOUT)
+        content, content_type, etag, last_modified = cached
+
+        if self._not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def _render(self, request, *args, **kwargs):
+        response = super(LatestPostsFeed, self).__call__(request, *args, **kwargs)
+        content = response.content
+        # the posts' mod_date is only a date, so the feed is last modified when it was rendered: the cached feed is
+        # cleared whenever it changes
+        last_modified = int(time.time())
+        return content, response['Content-Type'], quote_etag(hashlib.md5(content).hexdigest()), last_modified
+
+    def _not_modified(self, request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag.strip('"') in etags
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return bool(if_modified_since and last_modified and last_modified <= if_modified_since)
+
+    @classmethod
+    def cache_key(cls):
+        return 'blog-feed-%s' % cls.__name__
+
     def link(self):
         return reverse('index')
 
     def items(self):
-        return Post.published.order_by('-pub_date')[:LatestPostsFeed.NUM_POSTS]
+        return Post.published.select_related('author__user').order_by('-pub_date')[:LatestPostsFeed.NUM_POSTS]
 
     def item_title(self, post):
         return post.title
@@ -81,4 +130,7 @@ class AtomLatestPostsFeed(LatestPostsFeed):
     feed_version = "Atom 1.0"
 
     def feed_url(self):
-        return reverse('atom')
\ No newline at end of file
+        return reverse('atom')
+
+def clear_feed_cache():
+    cache.delete_many([LatestPostsFeed.cache_key(), AtomLatestPostsFeed.cache_key()])
@@ -4,9 +4,10 @@ from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
 from comments.moderation import AkismetModeratorMixin, MPTTCommentModerator, moderator
 from utils.validators import not_blank, is_blank
+from utils.util import render_markdown
 import datetime
 from taggit.managers import TaggableManager
-from taggit.models import TaggedItemBase
+from taggit.models import TaggedItemBase, Tag
 from django.contrib.sites.models import Site
 
 
@@ -102,6 +103,7 @@ class Post(models.Model):
     mod_date = models.DateField(auto_now=True, verbose_name="last-modified date")
     body = models.TextField(help_text="The text of this blog post",
                             validators=[not_blank])
+    body_html = models.TextField(blank=True, editable=False)  # body rendered from markdown when the post is saved
 
     enable_comments = models.BooleanField(default=True)
 
@@ -140,6 +142,13 @@ class Post(models.Model):
         """
         return self.enable_comments
 
+    def save(self, *args, **kwargs):
+        self.render_body()
+        super(Post, self).save(*args, **kwargs)
+
+    def render_body(self):
+        self.body_html = render_markdown(self.body)
+
     def publish(self):
         if self.is_draft:
             today = datetime.date.today()
@@ -152,6 +161,41 @@ class Post(models.Model):
         return self.title
 
 
+class ArchiveMonth(models.Model):
+    """
+    The number of published posts in a month.  Together with ArchiveTag this makes up the archive index, which the
+    archive pages and sidebar read instead of scanning the posts.  See blog.archiveutils.
+    """
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('year', 'month')
+        ordering = ('-year', '-month')
+
+    def __unicode__(self):
+        return u"%d/%02d (%d posts)" % (self.year, self.month, self.post_count)
+
+    @property
+    def date(self):
+        return datetime.date(self.year, self.month, 1)
+
+
+class ArchiveTag(models.Model):
+    """
+    The number of published posts with a tag.
+    """
+    tag = models.OneToOneField(Tag, related_name='+')
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('-post_count',)
+
+    def __unicode__(self):
+        return u"%s (%d posts)" % (self.tag, self.post_count)
+
+
 class PostModerator(AkismetModeratorMixin, MPTTCommentModerator):
     email_notification = True
     enable_field = 'enable_comments'
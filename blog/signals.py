@@ -0,0 +1,70 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from blog.models import Post, TaggedPost, AuthorProfile
+from blog import archiveutils
+from blog.feeds import clear_feed_cache
+from comments.models import MPTTComment, CommentFlag
+from utils import pagecache
+
+
+def _published_month(pub_date, is_draft):
+    return [] if is_draft else [(pub_date.year, pub_date.month)]
+
+
+def _blog_changed():
+    clear_feed_cache()
+    pagecache.bump_version(pagecache.BLOG)
+
+
+@receiver(pre_save, sender=Post)
+def remember_published_state(sender, instance, **kwargs):
+    # the archive index has to be updated for the month the post was in as well as the one it is in now
+    saved = Post.objects.filter(id=instance.id).values_list('pub_date', 'is_draft') if instance.id else []
+    setattr(instance, '_saved_state', saved[0] if saved else None)
+
+
+@receiver(post_save, sender=Post)
+def update_archive_index(sender, instance, **kwargs):
+    """
+    Keep the archive index, the cached feeds and the cached blog pages in sync with the published posts.
+    Post.publish() saves the post, so it is covered too.
+    """
+    months = _published_month(instance.pub_date, instance.is_draft)
+    saved = getattr(instance, '_saved_state', None)
+    if saved is not None:
+        months += _published_month(*saved)
+    archiveutils.update_months(months)
+    if saved is not None and saved[1] != instance.is_draft:
+        # published or unpublished: the post's tags count or stop counting
+        archiveutils.update_tags(TaggedPost.objects.filter(content_object=instance).values_list('tag', flat=True))
+    _blog_changed()
+
+
+@receiver(post_delete, sender=Post)
+def update_archive_index_on_delete(sender, instance, **kwargs):
+    # the post's tags are deleted along with it, see update_archive_tags
+    archiveutils.update_months(_published_month(instance.pub_date, instance.is_draft))
+    _blog_changed()
+
+
+@receiver(post_save, sender=TaggedPost)
+@receiver(post_delete, sender=TaggedPost)
+def update_archive_tags(sender, instance, **kwargs):
+    archiveutils.update_tags([instance.tag_id])
+    _blog_changed()
+
+
+@receiver(post_save, sender=AuthorProfile)
+def update_feeds(sender, **kwargs):
+    # the feeds and the blog pages include the authors' pen names
+    clear_feed_cache()
+    pagecache.bump_version(pagecache.BLOG)
+
+
+@receiver(post_save, sender=MPTTComment)
+@receiver(post_delete, sender=MPTTComment)
+@receiver(post_save, sender=CommentFlag)
+@receiver(post_delete, sender=CommentFlag)
+def update_page_cache(sender, **kwargs):
+    # the cached post pages show the comments on the post
+    pagecache.bump_version(pagecache.BLOG)
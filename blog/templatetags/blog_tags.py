@@ -0,0 +1,14 @@
+from django import template
+from blog import archiveutils
+
+register = template.Library()
+
+
+@register.inclusion_tag("blog/_archive_summary.html")
+def archive_summary(show_months=True):
+    """
+    Lists the months and tags of the published posts with their post counts.  Reads the cached archive index, so it
+    is cheap enough to show on every blog page.
+    """
+    return {'archive_months': archiveutils.get_archive_months() if show_months else [],
+            'archive_tags': archiveutils.get_archive_tags()}
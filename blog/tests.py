@@ -16,7 +16,11 @@ from bs4 import BeautifulSoup
 from feeds import LatestPostsFeed
 import comments as comments_app
 from mock import patch
+from comments import spamcheck
+from blog import archiveutils
 from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
 from arthurcode import settings
 
 # -----------------------------
@@ -180,6 +184,20 @@ class PostTest(TestCase):
             post.save()
         self.assertIn("enable_comments", str(cm.exception))
 
+    def test_body_html(self):
+        post = create_post(author=self.author, body="Some *markdown*")
+        self.assertEqual(u"<p>Some <em>markdown</em></p>", post.body_html)
+        post.body = "Edited *markdown*"
+        post.save()
+        self.assertEqual(u"<p>Edited <em>markdown</em></p>", Post.objects.get(id=post.id).body_html)
+
+        # the backfill command re-renders the stored html without touching the modification date
+        Post.objects.filter(id=post.id).update(body_html="", mod_date=datetime.date(2013, 1, 1))
+        call_command('render_markdown')
+        post = Post.objects.get(id=post.id)
+        self.assertEqual(u"<p>Edited <em>markdown</em></p>", post.body_html)
+        self.assertEqual(datetime.date(2013, 1, 1), post.mod_date)
+
     def test_draft_post(self):
         today = datetime.date.today()
         two_days_ago = today - datetime.timedelta(2)
@@ -195,6 +213,125 @@ class PostTest(TestCase):
         self.assertEqual(1, Post.published.count())
 
 
+class ArchiveIndexTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('arthur', 'me@example.com', 'whocares')
+        self.author = AuthorProfile(user=self.user, pen_name="Captain Yoga Pants")
+        self.author.full_clean()
+        self.author.save()
+
+    def months(self):
+        return [(m.year, m.month, m.post_count) for m in archiveutils.get_archive_months()]
+
+    def tags(self):
+        return [(t.tag.name, t.post_count) for t in archiveutils.get_archive_tags()]
+
+    def test_index_follows_posts(self):
+        create_post(author=self.author, pub_date=datetime.date(2012, 12, 30), tags=["toys", "blocks"])
+        create_post(author=self.author, pub_date=datetime.date(2013, 1, 2), tags=["toys"])
+        post = create_post(author=self.author, pub_date=datetime.date(2013, 1, 3))
+        draft = create_post(author=self.author, is_draft=True, tags=["toys", "secret"])
+        self.assertEqual([(2013, 1, 2), (2012, 12, 1)], self.months())
+        self.assertEqual([("toys", 2), ("blocks", 1)], self.tags())
+        self.assertEqual([(2013, 2, [datetime.date(2013, 1, 1)]), (2012, 1, [datetime.date(2012, 12, 1)])],
+                         [(y, n, [m.date for m in months]) for y, n, months in archiveutils.get_archive_years()])
+
+        draft.publish()
+        today = datetime.date.today()
+        self.assertEqual((today.year, today.month, 1), self.months()[0])
+        self.assertEqual([("toys", 3), ("blocks", 1), ("secret", 1)], self.tags())
+
+        post.delete()
+        draft.tags.remove("secret")
+        self.assertEqual([(2013, 1, 1), (2012, 12, 1)], self.months()[1:])
+        self.assertEqual([("toys", 3), ("blocks", 1)], self.tags())
+
+    def test_moved_post(self):
+        post = create_post(author=self.author, pub_date=datetime.date(2013, 1, 2), tags=["toys"])
+        create_post(author=self.author, pub_date=datetime.date(2013, 2, 2))
+        post.pub_date = datetime.date(2013, 2, 5)
+        post.save()
+        self.assertEqual([(2013, 2, 2)], self.months())
+
+        post.is_draft = True
+        post.save()
+        self.assertEqual([(2013, 2, 1)], self.months())
+        self.assertEqual([], self.tags())
+
+    def test_archive_views_read_the_index(self):
+        create_post(author=self.author, pub_date=datetime.date(2013, 1, 2))
+        create_post(author=self.author, pub_date=datetime.date(2013, 2, 2))
+        response = self.client.get(reverse('archive'))
+        self.assertEqual([datetime.datetime(2013, 1, 1)], response.context['date_list'])
+        self.assertContains(response, "February</a> (1)")
+
+        # the index is cached after the first read
+        with self.assertNumQueries(0):
+            archiveutils.get_archive_years()
+            archiveutils.get_archive_tags()
+
+        response = self.client.get(reverse('year_archive', kwargs={'year': 2013}))
+        self.assertEqual([datetime.datetime(2013, 2, 1), datetime.datetime(2013, 1, 1)],
+                         response.context['date_list'])
+
+
+class FeedCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('arthur', 'me@example.com', 'whocares')
+        self.author = AuthorProfile(user=self.user, pen_name="Captain Yoga Pants")
+        self.author.full_clean()
+        self.author.save()
+
+    def test_conditional_get(self):
+        create_post(author=self.author, title="First Post", tags=["toys"])
+        for url in (reverse('rss'), reverse('atom')):
+            response = self.client.get(url)
+            self.assertEqual(200, response.status_code)
+            self.assertContains(response, "First Post")
+            etag = response['ETag']
+            last_modified = response['Last-Modified']
+
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(304, response.status_code)
+            self.assertEqual(etag, response['ETag'])
+
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(304, response.status_code)
+
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH='"stale"')
+            self.assertEqual(200, response.status_code)
+            self.assertContains(response, "First Post")
+
+    def test_publishing_changes_the_feed(self):
+        draft = create_post(author=self.author, title="Second Post", is_draft=True)
+        response = self.client.get(reverse('rss'))
+        self.assertNotContains(response, "Second Post")
+        etag = response['ETag']
+
+        draft.publish()
+        response = self.client.get(reverse('rss'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, "Second Post")
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_publishing_later_the_same_day(self):
+        draft = create_post(author=self.author, title="Second Post", is_draft=True)
+        last_modified = self.client.get(reverse('rss'))['Last-Modified']
+
+        with patch('blog.feeds.time.time', return_value=time.time() + 60 * 60):
+            draft.publish()
+            response = self.client.get(reverse('rss'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, "Second Post")
+
+
 #-----------------------------
 # VIEW TESTS
 #-----------------------------
@@ -679,7 +816,7 @@ class AkismetPostMock():
 AKISMET_POST_MOCK = AkismetPostMock()
 
 
-@override_settings(AKISMET_KEY="myfakekey")
+@override_settings(AKISMET_KEY="myfakekey", QUEUED_EMAIL_DELIVERY='immediate')
 @patch('comments.akismet.__post', AKISMET_POST_MOCK.post)
 class CommentingTest(TestCase):
 
@@ -692,6 +829,7 @@ class CommentingTest(TestCase):
         self.author.full_clean()
         self.author.save()
         AKISMET_POST_MOCK.restore_defaults()
+        cache.clear()   # forget the cached Akismet key verification
 
     def test_use_mptt_comments(self):
         """
@@ -897,6 +1035,37 @@ class CommentingTest(TestCase):
         post_args = AKISMET_POST_MOCK.post_args.pop()
         self.assertEqual(AKISMET_POST_MOCK.SUBMIT_SPAM_PATH, post_args[2])
 
+    @override_settings(AKISMET_ASYNC=True)
+    def test_async_spam_check_holds_comments(self):
+        post = create_post(author=self.author)
+        url = comments_app.get_form_target()
+        held = []
+        mail.outbox = []
+
+        with patch.object(spamcheck.spam_check_queue, 'submit', lambda function, *args: held.append((function, args))):
+            AKISMET_POST_MOCK.set_valid_key(True)
+            for i in range(2):
+                response = self.c.post(url, self.make_post_comment_data(post), follow=True)
+                self.assertEqual(200, response.status_code)
+
+        # both comments are held, and nobody has been told about them yet
+        ham, spam = MPTTComment.objects.order_by('id')
+        self.assertFalse(ham.is_public or spam.is_public)
+        self.assertFalse(ham.is_spam or spam.is_spam)
+        self.assertEqual(0, len(mail.outbox))
+
+        # run the held checks, the first comment is ham and the second one is spam
+        for (function, args), is_spam in zip(held, [False, True]):
+            AKISMET_POST_MOCK.set_comment_is_spam(is_spam)
+            function(*args)
+
+        ham, spam = MPTTComment.objects.order_by('id')
+        self.assertTrue(ham.is_public)
+        self.assertFalse(ham.is_spam)
+        self.assertFalse(spam.is_public)
+        self.assertTrue(spam.is_spam)
+        self.assertTrue(len(mail.outbox) > 0)
+
     def test_removed_and_non_public_comments(self):
         post = create_post(author=self.author)
         comment1 = self._make_ham_comment(post, parent=None)
@@ -4,6 +4,7 @@ from django.conf.urls import patterns, url, include
 from blog.views import BlogYearArchiveView, BlogMonthArchiveView, BlogDayArchiveView, BlogArchiveView, \
     BlogPostDetailView, index, FeedsView, BlogDraftPostDetailView, BlogCommentOnPostView
 from blog.feeds import LatestPostsFeed, AtomLatestPostsFeed
+from utils.pagecache import page_cache, BLOG
 
 urlpatterns = patterns('',
 
@@ -12,23 +13,23 @@ urlpatterns = patterns('',
                            name="index"),
 
                        url(r'^archive/$',
-                           BlogArchiveView.as_view(),
+                           page_cache(BLOG)(BlogArchiveView.as_view()),
                            name="archive"),
 
                        url(r'^(?P<year>\d{4})/$',
-                           BlogYearArchiveView.as_view(),
+                           page_cache(BLOG)(BlogYearArchiveView.as_view()),
                            name="year_archive"),
 
                        url(r'^(?P<year>\d{4})/(?P<month>\d+)/$',
-                           BlogMonthArchiveView.as_view(),
+                           page_cache(BLOG)(BlogMonthArchiveView.as_view()),
                            name="month_archive"),
 
                        url(r'^(?P<year>\d{4})/(?P<month>\d+)/(?P<day>\d+)/$',
-                           BlogDayArchiveView.as_view(),
+                           page_cache(BLOG)(BlogDayArchiveView.as_view()),
                            name="day_archive"),
 
                        url(r'^(?P<year>\d{4})/(?P<month>\d+)/(?P<day>\d+)/(?P<slug>[-\w]+)',
-                           BlogPostDetailView.as_view(),
+                           page_cache(BLOG)(BlogPostDetailView.as_view()),
                            name="post_detail"),
 
                        url(r'^comment/(?P<year>\d{4})/(?P<month>\d+)/(?P<day>\d+)/(?P<slug>[-\w]+)',
@@ -17,6 +17,18 @@ def get_cart_items(request):
     return list(get_cart_products(request)) + list(get_cart_gift_cards(request))
 
 
+def load_cart_items(request):
+    """
+    Same as get_cart_items, but the product cart items come with their product instances, products, options and
+    images already loaded, and a best_image attribute set.  Use this when rendering the whole cart.
+    """
+    products = list(get_cart_products(request).select_related('item__product').
+                    prefetch_related('item__options', 'item__product__images'))
+    for cart_item in products:
+        setattr(cart_item, 'best_image', cart_item.item.get_best_prefetched_image())
+    return products + list(get_cart_gift_cards(request))
+
+
 def get_cart_products(request):
     """
     Returns the subset of items in the cart that are linked to products (as opposed to gift certificates).
@@ -118,9 +130,10 @@ def remove_from_cart(request):
         cart_item.delete()
 
 
-def cart_subtotal(request):
+def cart_subtotal(request, cart_items=None):
     cart_total = decimal.Decimal('0.00')
-    cart_items = get_cart_items(request)
+    if cart_items is None:
+        cart_items = get_cart_items(request)
     for cart_item in cart_items:
         cart_total += cart_item.total()
     return cart_total
@@ -1,10 +1,17 @@
 from django import template
+from django.template.loader import render_to_string
 from cart import cartutils
+from utils import pagecache
 
 register = template.Library()
 
 
-@register.inclusion_tag("_cart_summary.html")
-def cart_summary(request):
+def render_cart_summary(request):
     cart_item_count = cartutils.cart_distinct_item_count(request)
-    return {'cart_item_count': cart_item_count}
\ No newline at end of file
+    return render_to_string("_cart_summary.html", {'cart_item_count': cart_item_count})
+
+
+@register.simple_tag
+def cart_summary(request):
+    # the cart summary is different for every visitor, so it is a hole in cached pages
+    return pagecache.hole(request, 'cart_summary', render_cart_summary(request))
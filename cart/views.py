@@ -38,10 +38,14 @@ def show_cart(request):
                 return HttpResponseRedirect(checkout_url)
 
     try:
-        cart_items = cartutils.get_cart_items(request)
+        cart_items = cartutils.load_cart_items(request)
 
         if checkout_errors == None:
-            checkout_errors = _get_cart_errors(request)
+            checkout_errors = _get_cart_errors(request, cart_items)
+
+        # map from cart item id --> the wish lists the item was added from, for the whole cart in one query
+        cart_wishlists = wishutils.get_wishlists_by_cart_item(cart_items)
+        wishlists = []
 
         for cart_item in cart_items:
             if bound_form_id == cart_item.id:
@@ -51,9 +55,13 @@ def show_cart(request):
                 form = UpdateCartItemForm(request)
                 form.fields['item_id'].widget.attrs['value'] = cart_item.id
             setattr(cart_item, 'update_form', form)
-            setattr(cart_item, 'wishlists', wishutils.get_wishlists_for_item(cart_item))
+            item_wishlists = cart_wishlists.get(cart_item.id, [])
+            setattr(cart_item, 'wishlists', item_wishlists)
+            for wishlist in item_wishlists:
+                if wishlist not in wishlists:
+                    wishlists.append(wishlist)
 
-        cart_subtotal = cartutils.cart_subtotal(request)
+        cart_subtotal = cartutils.cart_subtotal(request, cart_items)
         continue_shopping_url = get_continue_shopping_url(request)
 
         context = {
@@ -61,7 +69,7 @@ def show_cart(request):
             'continue_shopping_url': continue_shopping_url,
             'cart_items': cart_items,
             'checkout_errors': checkout_errors,
-            'wishlists': wishutils.get_wishlists(request),
+            'wishlists': wishlists,
         }
 
         return render_to_response('cart.html', context, context_instance=RequestContext(request))
@@ -111,13 +119,14 @@ def _process_update_cart_form(request, postdata):
         return bound_form, bound_form_id
 
 
-def _get_cart_errors(request):
+def _get_cart_errors(request, cart_items=None):
     """
     Checks this cart for any stock errors (ie. if there are more items in this user's cart that we have in stock)
     Returns an empty list if there are no errors.
     """
     checkout_errors = []
-    cart_items = cartutils.get_cart_items(request)
+    if cart_items is None:
+        cart_items = cartutils.get_cart_items(request)
     for cart_item in cart_items:
         error = cart_item.check_stock()
         if error:
@@ -1,27 +1,72 @@
 """
 Contains filters for filtering catalogue queries.
+
+The filters of a product listing come from its query string, see FilterSet.  Each filter checks its value when it is
+created and raises a ValueError if it is malformed.
 """
+import re
 from django.db.models import Q
 from catalogue.models import Award, Brand, Theme, Color
-from utils.util import to_bool
-from decimal import Decimal
-from utils.templatetags.extras import currency
+from decimal import Decimal, InvalidOperation
+from utils.currency import format_currency
 from django.db.models import Model
 from datetime import datetime, timedelta
 from urllib import quote_plus, unquote_plus
-from urlparse import parse_qsl
+from utils.querystring import get_query_params
 from django_countries.countries import OFFICIAL_COUNTRIES
 
 WILDCARD = "any"
 
+# the most filters that a listing applies, the rest of the query string is ignored
+MAX_FILTERS = 20
+
+SLUG_RE = re.compile(r'^[-\w]+$')
+TRUE_VALUES = ('True', 'true', 't', 'T', 'TRUE', '1')
+FALSE_VALUES = ('False', 'false', 'f', 'F', 'FALSE', '0')
+
+# the price and age ranges that product listings offer as filters
+PRICE_BINS = ('10', '20', '30', '40', '50', '75', '100', '200')
+AGE_BINS = [(0, 0), (1, 1), (2, 2), (3, 4), (5, 7), (8, 11), (12, 14), (15, None)]  # age ranges copied from ToysRUs
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError("Not a boolean: %r" % (value,))
+
+
+def index_term(field, value):
+    """
+    Returns a Solr query term that matches documents whose (exact) 'field' is 'value'.
+    """
+    return u'%s:"%s"' % (field, unicode(value).replace('\\', '\\\\').replace('"', '\\"'))
+
 
 class Filter(object):
 
     filter_key = None  # subclasses must define
+    filter_set = None  # the FilterSet that this filter belongs to, if any
 
     def apply(self, queryset):
         return queryset
 
+    def narrow(self, search_queryset):
+        """
+        Applies this filter to a SearchQuerySet of products, see catalogue.search_indexes.  The narrow query is tagged
+        with the filter key, so that facet counts can exclude it.
+        """
+        query = self.index_query()
+        if query is None:
+            return search_queryset
+        return search_queryset.narrow(u'{!tag=%s}%s' % (self.filter_key, query))
+
+    def index_query(self):
+        return None
+
     def __unicode__(self):
         raise Exception("Subclasses must override")
 
@@ -37,7 +82,7 @@ class OnSaleFilter(Filter):
     filter_key = "filterOnSale"
 
     def __init__(self, on_sale=True):
-        self.on_sale = to_bool(on_sale)
+        self.on_sale = parse_bool(on_sale)
 
     def apply(self, queryset):
         if self.on_sale:
@@ -47,6 +92,9 @@ class OnSaleFilter(Filter):
             # return products that are not on sale
             return queryset.filter(sale_price=None)
 
+    def index_query(self):
+        return u'on_sale:%s' % str(self.on_sale).lower()
+
     def __unicode__(self):
         if self.on_sale:
             return u'on sale'
@@ -63,11 +111,14 @@ class BooleanFieldFilter(Filter):
     field_name = None  # subclasses should override
 
     def __init__(self, value=True):
-        self.value = to_bool(value)
+        self.value = parse_bool(value)
 
     def apply(self, queryset):
         return queryset.filter(**{self.field_name: self.value})
 
+    def index_query(self):
+        return u'%s:%s' % (self.field_name, str(self.value).lower())
+
     def value_for_url(self):
         return str(self.value)
 
@@ -106,21 +157,28 @@ class RelatedModelFilter(Filter):
             self.slug = getattr(instance, self.slug_field)
             self.name = getattr(instance, self.name_field)
         else:
-            # assume that we've been given the model slug, the name will be derived if and when it is required
+            # assume that we've been given the model slug, the name will be derived if and when it is required (or
+            # set by FilterSet.resolve_names)
             self.slug = str(instance)
+            if not SLUG_RE.match(self.slug):
+                raise ValueError("Not a slug: %r" % self.slug)
 
     def apply(self, queryset):
         # return products that are related to the given model, identified by its slug
         return queryset.filter(**{self.related_name + "__" + self.slug_field: self.slug})
 
+    def index_query(self):
+        # the index fields are named after the related name, and hold slugs
+        return index_term(self.related_name + "_exact", self.slug)
+
     def get_name(self):
+        if not hasattr(self, 'name') and self.filter_set is not None:
+            # look up the names of all of the filters in the set at once
+            self.filter_set.resolve_names()
         # lookup up the instance name using the slug
         if not hasattr(self, 'name'):
-            instance = getattr(self.model, 'objects').filter(**{self.slug_field: self.slug})
-            if instance.count() > 0:
-                self.name = instance[0].name
-            else:
-                self.name = self.slug
+            names = self.model.objects.filter(**{self.slug_field: self.slug}).values_list(self.name_field, flat=True)
+            self.name = names[0] if names else self.slug
         return self.name
 
     def value_for_url(self):
@@ -142,6 +200,11 @@ class AwardFilter(RelatedModelFilter):
             # return products that have won this specific award
             return queryset.filter(awards__award__slug=self.slug)
 
+    def index_query(self):
+        if self.slug == WILDCARD:
+            return u'awards_exact:[* TO *]'
+        return index_term('awards_exact', self.slug)
+
     def __unicode__(self):
         if self.slug == WILDCARD:
             return u'award winners'
@@ -175,15 +238,23 @@ class MaxPriceFilter(Filter):
 
     def __init__(self, max_price):
         if not isinstance(max_price, Decimal):
-            max_price = Decimal(max_price)
+            try:
+                max_price = Decimal(max_price)
+            except InvalidOperation:
+                raise ValueError("Not a price: %r" % (max_price,))
+        if not max_price.is_finite() or max_price <= 0:
+            raise ValueError("Not a price: %r" % (max_price,))
         self.max_price = max_price
 
     def apply(self, queryset):
         where_clause = "COALESCE(sale_price, price) <= " + str(self.max_price)
         return queryset.extra(where=[where_clause])
 
+    def index_query(self):
+        return u'current_price:[* TO %s]' % self.max_price
+
     def __unicode__(self):
-        return "under " + currency(self.max_price)
+        return "under " + format_currency(self.max_price)
 
     def value_for_url(self):
         return str(self.max_price)
@@ -197,8 +268,10 @@ class AgeRangeFilter(Filter):
         if value is not None:
             (min_age, max_age) = self.decode_value(value)
 
-        if max_age and max_age < min_age:
-            raise Exception("Max age must be larger than min age.")
+        if min_age is None or min_age < 0:
+            raise ValueError("Min age must be a positive number.")
+        if max_age is not None and max_age < min_age:
+            raise ValueError("Max age must be larger than min age.")
         self.min_age = min_age
         self.max_age = max_age
 
@@ -217,6 +290,10 @@ class AgeRangeFilter(Filter):
 
         return queryset
 
+    def index_query(self):
+        upper = self.min_age if self.max_age is None else self.max_age
+        return u'min_age:[* TO %d] AND (max_age:[%d TO *] OR (*:* -max_age:[* TO *]))' % (upper, self.min_age)
+
     def value_for_url(self):
         return "%s+%s" % (self.min_age, self.max_age)
 
@@ -225,7 +302,8 @@ class AgeRangeFilter(Filter):
         Decodes a string of format [num]+[num|None]
         """
         tokens = value.split('+')
-        assert(len(tokens) == 2)
+        if len(tokens) != 2:
+            raise ValueError("Not an age range: %r" % (value,))
         last_token = None
         if tokens[1] != 'None':
             last_token = int(tokens[1])
@@ -250,19 +328,23 @@ class ColorFilter(Filter):
     filter_key = "color"
 
     def __init__(self, name):
+        if not name or len(name) > Color._meta.get_field('name').max_length:
+            raise ValueError("Not a color: %r" % (name,))
         self.name = name
+        self.option_ids = None  # the ids of the color options with this name, see FilterSet.resolve_options
 
     def apply(self, queryset):
         """
         Returns products that have the given color option.
         """
-        # get a list of product instances with this color option
-        try:
-            option = Color.objects.get(name=self.name)
-            return queryset.filter(instances__options=option)
-        except Color.DoesNotExist:
-            # bogus color, no products could possibly match
-            return queryset.none()
+        if self.option_ids is None:
+            self.option_ids = list(Color.objects.filter(name=self.name).values_list('id', flat=True))
+        # a bogus color has no option ids, so nothing matches.  An empty __in is used rather than none() because the
+        # facet counts call extra() and values() on the result, which EmptyQuerySet doesn't support
+        return queryset.filter(instances__options__in=self.option_ids)
+
+    def index_query(self):
+        return index_term('colors_exact', self.name)
 
     def value_for_url(self):
         return self.name
@@ -277,10 +359,15 @@ class RecentlyAddedFilter(Filter):
 
     def __init__(self, days):
         self.days = int(days)
+        if self.days < 1:
+            raise ValueError("Not a number of days: %r" % (days,))
 
     def apply(self, queryset):
         return queryset.filter(created_at__gte=(datetime.now() - timedelta(days=self.days)))
 
+    def index_query(self):
+        return u'created_at:[NOW/DAY-%dDAYS TO *]' % self.days
+
     def value_for_url(self):
         return str(self.days)
 
@@ -293,11 +380,16 @@ class CountryOfOriginFilter(Filter):
     filter_key = "madeIn"
 
     def __init__(self, country_code):
+        if country_code not in OFFICIAL_COUNTRIES:
+            raise ValueError("Not a country code: %r" % (country_code,))
         self.country_code = country_code
 
     def apply(self, queryset):
         return queryset.filter(country_of_origin=self.country_code)
 
+    def index_query(self):
+        return index_term('country_exact', self.country_code)
+
     @property
     def country_name(self):
         return OFFICIAL_COUNTRIES.get(self.country_code, 'unknown').title()
@@ -325,27 +417,126 @@ FILTERS = {
 }
 
 
-def parse_filters(request):
+class FilterSet(object):
     """
-    Returns a list of filters *IN THE SAME ORDER* as they appear in the query string.
+    The filters of a product listing, *IN THE SAME ORDER* as they appear in the query string.  Malformed and repeated
+    filters are dropped.  Iterating, indexing and len() work as they do on a list of the filters.
+
+    The names of the brand, theme and award filters are looked up with one query per kind of filter the first time
+    that one of them is needed, and the color options of all of the color filters are looked up with one query when
+    the filters are first applied.
     """
-    qs = request.META['QUERY_STRING']
-    params = parse_qsl(qs)
-    filters = []
 
-    for (filter_key, value) in params:
-        if filter_key in FILTERS:
-            filter_clazz = FILTERS[filter_key]
-            try:
-                filters.append(filter_clazz(unquote_plus(value)))
-            except:
-                # just ignore the filter, the value may be malformed
-                pass
-    return filters
+    def __init__(self, filters=()):
+        self.filters = []
+        seen = set()
+        for a_filter in filters:
+            param = a_filter.as_param()
+            if param not in seen:
+                seen.add(param)
+                a_filter.filter_set = self
+                self.filters.append(a_filter)
+        self._names_resolved = False
+        self._options_resolved = False
+
+    @classmethod
+    def parse(cls, params):
+        """
+        Returns the FilterSet of the given (key, value) query parameters.
+        """
+        filters = []
+        for (filter_key, value) in params:
+            if filter_key in FILTERS and len(filters) < MAX_FILTERS:
+                try:
+                    filters.append(FILTERS[filter_key](unquote_plus(value)))
+                except ValueError:
+                    # just ignore the filter, the value is malformed
+                    pass
+        return cls(filters)
+
+    def __iter__(self):
+        return iter(self.filters)
+
+    def __len__(self):
+        return len(self.filters)
+
+    def __getitem__(self, index):
+        return self.filters[index]
+
+    @property
+    def key(self):
+        """
+        A canonical form of the filters, which is the same for the same filters in any order.
+        """
+        return u'&'.join(sorted(a_filter.as_param() for a_filter in self.filters))
+
+    def resolve_names(self):
+        if self._names_resolved:
+            return
+        self._names_resolved = True
+
+        related = {}
+        for a_filter in self.filters:
+            if isinstance(a_filter, RelatedModelFilter) and a_filter.slug != WILDCARD and not hasattr(a_filter, 'name'):
+                related.setdefault(type(a_filter), []).append(a_filter)
+
+        for filter_clazz, related_filters in related.items():
+            slug_field, name_field = filter_clazz.slug_field, filter_clazz.name_field
+            slugs = [f.slug for f in related_filters]
+            names = dict(filter_clazz.model.objects.filter(**{slug_field + '__in': slugs}).
+                         values_list(slug_field, name_field))
+            for a_filter in related_filters:
+                a_filter.name = names.get(a_filter.slug, a_filter.slug)
+
+    def resolve_options(self):
+        if self._options_resolved:
+            return
+        self._options_resolved = True
+
+        colors = {}
+        for a_filter in self.filters:
+            if isinstance(a_filter, ColorFilter) and a_filter.option_ids is None:
+                colors.setdefault(a_filter.name, []).append(a_filter)
+
+        if colors:
+            option_ids = {}
+            for name, option_id in Color.objects.filter(name__in=colors.keys()).values_list('name', 'id'):
+                option_ids.setdefault(name, []).append(option_id)
+            for name, color_filters in colors.items():
+                for a_filter in color_filters:
+                    a_filter.option_ids = option_ids.get(name, [])
+
+    def get(self, filter_clazz):
+        """
+        Returns the applied filter of the given class, or None.
+        """
+        active_filter = None
+        for a_filter in self:
+            if isinstance(a_filter, filter_clazz):
+                active_filter = a_filter
+        return active_filter
+
+    def apply(self, queryset, exclude=None):
+        """
+        Applies the filters to the given product queryset, except for the filters of the 'exclude' class, if given.
+        """
+        self.resolve_options()
+        for a_filter in self:
+            if exclude is None or not isinstance(a_filter, exclude):
+                queryset = a_filter.apply(queryset)
+        return queryset
+
+
+def parse_filters(request):
+    """
+    Returns the FilterSet of the request's query string.  It is only parsed once per request.
+    """
+    filter_set = getattr(request, '_filter_set', None)
+    if filter_set is None:
+        filter_set = request._filter_set = FilterSet.parse(get_query_params(request))
+    return filter_set
 
 
 def filter_products(request, queryset):
     filters = parse_filters(request)
-    for a_filter in filters:
-        queryset = a_filter.apply(queryset)
-    return queryset, filters
\ No newline at end of file
+    return filters.apply(queryset), filters
@@ -0,0 +1,240 @@
+"""
+Incremental search index updates for products.
+
+QueuedSignalProcessor is installed as settings.HAYSTACK_SIGNAL_PROCESSOR.  Rather than sending an update to the
+search backend from every save, it queues the affected object ids in memory: saving a product or one of its instances
+queues the product, and saving a brand or theme queues the brand or theme, whose products are looked up when the queue
+is flushed.  A flush sends every queued product that is still active to the backend in a single update, and removes
+the rest (deleted or deactivated products) from the index.  How the queue is flushed depends on
+settings.SEARCH_INDEX_UPDATES:
+
+    'background'    a daemon thread flushes the queue every settings.SEARCH_INDEX_INTERVAL seconds (default)
+    'inline'        the queue is flushed as soon as something is added to it
+    'off'           nothing is queued, for the tests: only the tests that ask for index updates get them
+
+A flush that fails (e.g. because Solr is down) puts its updates back in the queue for the next flush.  Updates still
+queued when the process exits are flushed by an atexit hook (unless updates are off).  Anything that is lost (e.g.
+when the process is killed) is picked up by the next rebuild_index or update_index.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import close_connection
+from django.db.models import signals
+from haystack.signals import BaseSignalProcessor
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND = 'background'
+INLINE = 'inline'
+OFF = 'off'
+
+DEFAULT_INTERVAL = 5
+
+PRODUCT = 'product'
+BRAND = 'brand'
+THEME = 'theme'
+
+
+class IndexQueue(object):
+    """
+    The set of (kind, id) pairs whose products need to be re-indexed, where kind is one of PRODUCT, BRAND or THEME.
+    Safe to use from several threads.
+    """
+
+    def __init__(self):
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def interval(self):
+        return getattr(settings, 'SEARCH_INDEX_INTERVAL', DEFAULT_INTERVAL)
+
+    def mode(self):
+        return getattr(settings, 'SEARCH_INDEX_UPDATES', BACKGROUND)
+
+    def add(self, kind, id):
+        mode = self.mode()
+        if id is None or mode == OFF:
+            return
+        with self._lock:
+            self._pending.add((kind, id))
+
+        if mode == INLINE:
+            self.flush()
+        else:
+            self._start()
+
+    def pending(self):
+        with self._lock:
+            return set(self._pending)
+
+    def flush(self):
+        """
+        Updates the search index for every queued product, and returns the number of products that were updated and
+        the number that were removed.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        if not pending:
+            return 0, 0
+
+        try:
+            return update_products(self._product_ids(pending))
+        except Exception:
+            # e.g. Solr is down.  Put the updates back, so that the next flush tries them again.
+            with self._lock:
+                self._pending.update(pending)
+            raise
+
+    def _product_ids(self, pending):
+        from catalogue.models import Product
+        ids = set(id for kind, id in pending if kind == PRODUCT)
+        brands = [id for kind, id in pending if kind == BRAND]
+        themes = [id for kind, id in pending if kind == THEME]
+        if brands:
+            ids.update(Product.objects.filter(brand__in=brands).values_list('id', flat=True))
+        if themes:
+            ids.update(Product.objects.filter(themes__in=themes).values_list('id', flat=True))
+        return ids
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='search-index-updates')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval())
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Search index update failed")
+            finally:
+                close_connection()
+
+
+# the most ids that go into one Solr delete query, which stays under Solr's default maxBooleanClauses of 1024
+REMOVE_BATCH_SIZE = 500
+
+
+def _write_backend(using):
+    """
+    Returns a backend for the given connection that raises when an update fails.  Haystack's backends log and
+    swallow Solr errors unless SILENTLY_FAIL is off, which is what the searches want, but a failed flush has to raise
+    so that the queue keeps its updates.
+    """
+    from haystack import connections
+    connection = connections[using]
+    return connection.backend(using, **dict(connection.options, SILENTLY_FAIL=False))
+
+
+def _remove(backend, identifiers):
+    """
+    Removes the documents with the given identifiers from the index.  Solr gets a delete query for each batch of
+    identifiers and a single commit, other backends a remove for each identifier.
+    """
+    from haystack.backends.solr_backend import SolrSearchBackend
+    from haystack.constants import ID
+
+    if not isinstance(backend, SolrSearchBackend):
+        for identifier in identifiers:
+            backend.remove(identifier)
+        return
+
+    for start in range(0, len(identifiers), REMOVE_BATCH_SIZE):
+        batch = identifiers[start:start + REMOVE_BATCH_SIZE]
+        backend.conn.delete(q=u'%s:(%s)' % (ID, u' OR '.join(u'"%s"' % identifier for identifier in batch)),
+                            commit=False)
+    backend.conn.commit()
+
+
+def update_products(ids):
+    """
+    Sends the products with the given ids to every search backend: one update for the active products, and one
+    remove for the others.  Returns the number of products that were updated and the number that were removed.
+    """
+    from haystack import connections, connection_router
+    from catalogue.models import Product
+
+    if not ids:
+        return 0, 0
+
+    updated = removed = 0
+    for using in connection_router.for_write():
+        backend = _write_backend(using)
+        index = connections[using].get_unified_index().get_index(Product)
+        products = list(index.index_queryset().filter(id__in=ids).select_related('category', 'brand').
+                        prefetch_related('awards__award', 'instances', 'specifications'))
+        if products:
+            backend.update(index, products)
+        gone = sorted(set(ids) - set(product.id for product in products))
+        if gone:
+            # the same identifiers that haystack.utils.get_identifier gives the products
+            _remove(backend, ['%s.%s.%d' % (Product._meta.app_label, Product._meta.module_name, id) for id in gone])
+        updated, removed = len(products), len(gone)
+
+    if updated or removed:
+        # cached search results may include the old versions of these products
+        from search.resultcache import bump_version
+        bump_version()
+    return updated, removed
+
+
+index_queue = IndexQueue()
+
+
+@atexit.register
+def _flush_at_exit():
+    if index_queue.mode() != OFF:
+        index_queue.flush()
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    Queues index updates for products, brands, themes and everything else that is stored in the product documents
+    (product instances, images and review summaries) instead of updating the index right away.
+    """
+
+    def setup(self):
+        signals.post_save.connect(self.handle_save)
+        signals.post_delete.connect(self.handle_delete)
+        signals.m2m_changed.connect(self.handle_m2m_changed)
+
+    def teardown(self):
+        signals.post_save.disconnect(self.handle_save)
+        signals.post_delete.disconnect(self.handle_delete)
+        signals.m2m_changed.disconnect(self.handle_m2m_changed)
+
+    def _queue(self, instance):
+        label, name = instance._meta.app_label, instance._meta.object_name
+        if label == 'reviews' and name == 'ReviewSummary':
+            # the product documents store the average rating
+            index_queue.add(PRODUCT, instance.product_id)
+            return
+        if label != 'catalogue':
+            return
+        if name == 'Product':
+            index_queue.add(PRODUCT, instance.id)
+        elif name in ('ProductInstance', 'ProductImage'):
+            index_queue.add(PRODUCT, instance.product_id)
+        elif name == 'Brand':
+            index_queue.add(BRAND, instance.id)
+        elif name == 'Theme':
+            index_queue.add(THEME, instance.id)
+
+    def handle_save(self, sender, instance, **kwargs):
+        self._queue(instance)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        self._queue(instance)
+
+    def handle_m2m_changed(self, sender, instance, action, **kwargs):
+        # a product's themes or awards changed
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            self._queue(instance)
@@ -0,0 +1,322 @@
+"""
+Product listings served from the search index.
+
+The product documents store everything a listing shows or filters on (see catalogue.search_indexes), so a single
+search request returns the page of products together with the counts for every filter on the page, without any
+product queries against the DB.  The filter counts are Solr facets.  Each applied filter narrows the search with a
+query tagged with its filter key, and the facets of the same filter exclude that tag, so that (as on the DB backed
+listing) the brand counts ignore the brand filter, the price counts ignore the price filter and so on.
+
+Used by catalogue.views.category_view when settings.CATALOGUE_SEARCH_LISTINGS is True.
+"""
+
+from decimal import Decimal
+from django.core.urlresolvers import reverse
+from haystack.query import SearchQuerySet
+from catalogue import filters
+from catalogue.models import Product
+from catalogue.search_indexes import split_facet_value
+
+# sort key --> index field to order by.  bestMatch is the search score, which is the default order of a search.
+SORT_FIELDS = {
+    'bestselling': '-units_sold',
+    'priceMin': 'current_price',
+    'priceMax': '-current_price',
+    'nameA': 'name_exact',
+    'nameZ': '-name_exact',
+    'rating': '-rating',
+    'new': '-created_at',
+    'bestMatch': None,
+}
+
+COUNTRIES_OF_INTEREST = ['CA', 'US']
+
+
+def _decimal(value):
+    # haystack hands back decimal fields as strings
+    if value is None:
+        return None
+    return Decimal(value)
+
+
+class IndexedThumbnail(object):
+
+    def __init__(self, path):
+        self.thumb_path = self.path = path
+
+
+class IndexedProduct(object):
+    """
+    A product read from the search index.  It has the attributes and methods of Product that the product thumbnails
+    use (see the thumb template tag).
+    """
+
+    def __init__(self, result):
+        self.id = int(result.pk)
+        self.name = result.name
+        self.slug = result.slug
+        self.price = _decimal(result.price)
+        self.sale_price = _decimal(result.sale_price)
+        self.rating = result.rating
+        self.thumbnail = result.thumbnail
+
+    def __unicode__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return reverse('catalogue_product', kwargs={'slug': self.slug})
+
+    def percent_savings(self):
+        if self.sale_price:
+            return (self.price - self.sale_price) * 100 / self.price
+        return 0
+
+    def get_rating(self):
+        return self.rating
+
+    def get_thumbnail(self):
+        if not self.thumbnail:
+            return None
+        return IndexedThumbnail(self.thumbnail)
+
+
+class ProductListing(object):
+    """
+    The products of a category (all products if category is None) that match the search text and the applied
+    filters, in the requested order.  Can be paginated like a list of products, and the first page that is fetched
+    also fetches the facet counts.
+    """
+
+    def __init__(self, category=None, search_text=None, applied_filters=(), sort_key=None,
+                 search_queryset=None):
+        sqs = (search_queryset or SearchQuerySet()).models(Product)
+        if search_text:
+            sqs = sqs.auto_query(search_text)
+        if category is not None:
+            sqs = sqs.narrow(filters.index_term('category_path_exact', category.slug))
+        for a_filter in applied_filters:
+            sqs = a_filter.narrow(sqs)
+
+        if sort_key not in SORT_FIELDS:
+            sort_key = 'bestMatch' if search_text else 'priceMax'
+        if SORT_FIELDS[sort_key]:
+            sqs = sqs.order_by(SORT_FIELDS[sort_key])
+
+        self.sort_key = sort_key
+        self.applied_filters = applied_filters
+        self.sqs = add_facets(sqs)
+
+    def prefetch(self, start, end):
+        """
+        Runs the search for the given slice of the listing, which also fetches the hit count and the facet counts.
+        Fetching the same slice again is free, so call this with the page that is about to be displayed before
+        paginating.
+        """
+        self.sqs[start:end]
+
+    def count(self):
+        return self.sqs.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [IndexedProduct(result) for result in self.sqs[k]]
+        return IndexedProduct(self.sqs[k])
+
+    def facet_counts(self):
+        return self.sqs.facet_counts()
+
+    def get_facets(self, child_categories):
+        return build_facets(self.facet_counts(), self.applied_filters, child_categories)
+
+
+def _excluding(filter_clazz, field):
+    return u'{!ex=%s}%s' % (filter_clazz.filter_key, field)
+
+
+def _query_facet(a_filter, exclude=True):
+    """
+    Returns the facet query that counts the products matching the given filter.  The facet counts are keyed by it.
+    """
+    query = a_filter.index_query()
+    if exclude:
+        query = _excluding(type(a_filter), query)
+    return query
+
+
+def _feature_filters():
+    return [filters.IsEcoFriendlyFilter(),
+            filters.AwardFilter(),
+            filters.OnSaleFilter(),
+            filters.IsBoxStufferFilter()]
+
+
+def _price_filters():
+    return [filters.MaxPriceFilter(price) for price in filters.PRICE_BINS]
+
+
+def _age_filters():
+    return [filters.AgeRangeFilter(min_age=min_age, max_age=max_age) for min_age, max_age in filters.AGE_BINS]
+
+
+def add_facets(sqs):
+    """
+    Adds the facets that count the products of each listing filter to the given SearchQuerySet.
+    """
+    # haystack asks the backend for the category_path_exact field
+    sqs = sqs.facet('category_path')
+    sqs = sqs.facet(_excluding(filters.BrandFilter, 'brand_facet_exact'))
+    sqs = sqs.facet(_excluding(filters.ThemeFilter, 'theme_facets_exact'))
+    sqs = sqs.facet(_excluding(filters.ColorFilter, 'color_facets_exact'))
+    sqs = sqs.facet(_excluding(filters.CountryOfOriginFilter, 'country_exact'))
+
+    queries = [_query_facet(f) for f in _price_filters() + _age_filters()]
+    queries += [_query_facet(f, exclude=False) for f in _feature_filters()]
+    for query in queries:
+        # the backend joins the field and the query back together with a ':'
+        field, value = query.split(':', 1)
+        sqs = sqs.query_facet(field, value)
+    return sqs
+
+
+def _field_counts(facet_counts, name):
+    # haystack hands back the counts of a name_exact field under name
+    return facet_counts.get('fields', {}).get(name, [])
+
+
+def _active_filter(applied_filters, filter_clazz):
+    for a_filter in applied_filters:
+        if isinstance(a_filter, filter_clazz):
+            return a_filter
+    return None
+
+
+def _mark(a_filter, is_active, count):
+    setattr(a_filter, 'active_filter', is_active)
+    setattr(a_filter, 'product_count', count)
+    return a_filter
+
+
+def get_related_filters(facet_counts, field, filter_clazz, applied_filters):
+    """
+    Returns a filter for each brand or theme in the given facet, with the same attributes as the ones returned by
+    catalogue.views.get_brands.
+    """
+    active_filter = _active_filter(applied_filters, filter_clazz)
+    related_filters = []
+    for value, count in _field_counts(facet_counts, field):
+        slug, name = split_facet_value(value)
+        is_active = bool(active_filter) and active_filter.slug == slug
+        if is_active:
+            # set the name to avoid a DB call in the template
+            active_filter.name = name
+        if count or is_active:
+            a_filter = filter_clazz(slug)
+            a_filter.name = name
+            related_filters.append(_mark(a_filter, is_active, count))
+    related_filters.sort(key=lambda f: f.name)
+    return related_filters
+
+
+def get_prices(facet_counts, applied_filters):
+    queries = facet_counts.get('queries', {})
+    active_filter = _active_filter(applied_filters, filters.MaxPriceFilter)
+    price_filters = []
+    last_count = 0
+
+    for price_filter in _price_filters():
+        count = queries.get(_query_facet(price_filter), 0)
+        is_active = bool(active_filter) and active_filter.max_price == price_filter.max_price
+        if is_active or count > last_count:
+            price_filters.append(_mark(price_filter, is_active, count))
+            last_count = count
+    price_filters.reverse()
+    return price_filters
+
+
+def get_ages(facet_counts, applied_filters):
+    queries = facet_counts.get('queries', {})
+    active_filter = _active_filter(applied_filters, filters.AgeRangeFilter)
+    age_filters = []
+
+    for age_filter in _age_filters():
+        count = queries.get(_query_facet(age_filter), 0)
+        is_active = bool(active_filter) and active_filter.min_age == age_filter.min_age and \
+            active_filter.max_age == age_filter.max_age
+        if count > 0 or is_active:
+            age_filters.append(_mark(age_filter, is_active, count))
+    return age_filters
+
+
+def get_colors(facet_counts, applied_filters):
+    active_filter = _active_filter(applied_filters, filters.ColorFilter)
+    color_filters = []
+
+    for value, count in _field_counts(facet_counts, 'color_facets'):
+        name, html = split_facet_value(value)
+        is_active = bool(active_filter) and active_filter.name == name
+        if count or is_active:
+            color_filter = _mark(filters.ColorFilter(name), is_active, count)
+            setattr(color_filter, 'html', html)
+            color_filters.append(color_filter)
+    return color_filters
+
+
+def get_countries(facet_counts, applied_filters):
+    active_filter = _active_filter(applied_filters, filters.CountryOfOriginFilter)
+    counts = dict(_field_counts(facet_counts, 'country'))
+    country_filters = []
+
+    for country in COUNTRIES_OF_INTEREST:
+        count = counts.get(country, 0)
+        is_active = bool(active_filter) and active_filter.country_code == country
+        if count or is_active:
+            country_filters.append(_mark(filters.CountryOfOriginFilter(country), is_active, count))
+    return country_filters
+
+
+def get_features(facet_counts, applied_filters):
+    queries = facet_counts.get('queries', {})
+    applied_filter_types = tuple([type(f) for f in applied_filters])
+    feature_filters = []
+
+    for feature_filter in _feature_filters():
+        count = queries.get(_query_facet(feature_filter, exclude=False), 0)
+        is_active = isinstance(feature_filter, applied_filter_types)
+        if count > 0 or is_active:
+            feature_filters.append(_mark(feature_filter, is_active, count))
+    return feature_filters
+
+
+def add_category_counts(categories, facet_counts):
+    """
+    Returns the given categories that have matching products, with their product_count set.
+    """
+    counts = dict(_field_counts(facet_counts, 'category_path'))
+    with_products = []
+    for category in categories:
+        count = counts.get(category.slug, 0)
+        if count > 0:
+            setattr(category, 'product_count', count)
+            with_products.append(category)
+    return with_products
+
+
+def build_facets(facet_counts, applied_filters, child_categories=()):
+    """
+    Returns the listing filters and child categories of a category page, given the facet counts of its listing.  The
+    keys match the ones that category_view puts in the template context.
+    """
+    facet_counts = facet_counts or {}
+    return {
+        'child_categories': add_category_counts(child_categories, facet_counts),
+        'brands': get_related_filters(facet_counts, 'brand_facet', filters.BrandFilter, applied_filters),
+        'themes': get_related_filters(facet_counts, 'theme_facets', filters.ThemeFilter, applied_filters),
+        'prices': get_prices(facet_counts, applied_filters),
+        'ages': get_ages(facet_counts, applied_filters),
+        'features': get_features(facet_counts, applied_filters),
+        'colors': get_colors(facet_counts, applied_filters),
+        'countries': get_countries(facet_counts, applied_filters),
+    }
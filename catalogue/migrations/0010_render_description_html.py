@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import DataMigration
+from django.db import models
+from utils.util import render_markdown
+
+class Migration(DataMigration):
+
+    def forwards(self, orm):
+        "Renders the stored HTML of the product descriptions that were written before it was stored."
+        products = orm['catalogue.Product'].objects.only('id', 'short_description', 'long_description')
+        for product in products.iterator():
+            orm['catalogue.Product'].objects.filter(id=product.id).update(
+                short_description_html=render_markdown(product.short_description),
+                long_description_html=render_markdown(product.long_description))
+
+    def backwards(self, orm):
+        "Nothing to do, the HTML is dropped along with its column."
+
+    models = {
+        'catalogue.award': {
+            'Meta': {'object_name': 'Award'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'long_description': ('django.db.models.fields.TextField', [], {}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'}),
+            'short_description': ('django.db.models.fields.CharField', [], {'max_length': '500'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'unique': 'True', 'max_length': '50'})
+        },
+        'catalogue.awardinstance': {
+            'Meta': {'object_name': 'AwardInstance'},
+            'award': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'instances'", 'to': "orm['catalogue.Award']"}),
+            'date': ('django.db.models.fields.DateField', [], {}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'})
+        },
+        'catalogue.brand': {
+            'Meta': {'object_name': 'Brand'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'long_description': ('django.db.models.fields.TextField', [], {}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'}),
+            'short_description': ('django.db.models.fields.CharField', [], {'max_length': '500'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'unique': 'True', 'max_length': '50'})
+        },
+        'catalogue.category': {
+            'Meta': {'ordering': "['tree_id', 'lft']", 'object_name': 'Category'},
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'description': ('django.db.models.fields.TextField', [], {}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'level': ('django.db.models.fields.PositiveIntegerField', [], {'db_index': 'True'}),
+            'lft': ('django.db.models.fields.PositiveIntegerField', [], {'db_index': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '50'}),
+            'parent': ('mptt.fields.TreeForeignKey', [], {'blank': 'True', 'related_name': "'children'", 'null': 'True', 'to': "orm['catalogue.Category']"}),
+            'rght': ('django.db.models.fields.PositiveIntegerField', [], {'db_index': 'True'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'unique': 'True', 'max_length': '50'}),
+            'tree_id': ('django.db.models.fields.PositiveIntegerField', [], {'db_index': 'True'}),
+            'updated_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'})
+        },
+        'catalogue.color': {
+            'Meta': {'object_name': 'Color', '_ormbases': ['catalogue.ProductOption']},
+            'html': ('django.db.models.fields.CharField', [], {'max_length': '25'}),
+            'productoption_ptr': ('django.db.models.fields.related.OneToOneField', [], {'to': "orm['catalogue.ProductOption']", 'unique': 'True', 'primary_key': 'True'})
+        },
+        'catalogue.dimension': {
+            'Meta': {'ordering': "['id']", 'object_name': 'Dimension'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'key': ('django.db.models.fields.CharField', [], {'max_length': '50'}),
+            'product': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'dimensions'", 'to': "orm['catalogue.Product']"}),
+            'value': ('django.db.models.fields.CharField', [], {'max_length': '75'})
+        },
+        'catalogue.product': {
+            'Meta': {'object_name': 'Product'},
+            'awards': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "'products'", 'blank': 'True', 'to': "orm['catalogue.AwardInstance']"}),
+            'brand': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'products'", 'to': "orm['catalogue.Brand']"}),
+            'category': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['catalogue.Category']"}),
+            'country_of_origin': ('django_countries.fields.CountryField', [], {'max_length': '2'}),
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True', 'db_index': 'True'}),
+            'is_bestseller': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_box_stuffer': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_featured': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_green': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'long_description': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'long_description_html': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'max_age': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'meta_description': ('django.db.models.fields.CharField', [], {'max_length': '200'}),
+            'min_age': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '255'}),
+            'price': ('django.db.models.fields.DecimalField', [], {'max_digits': '9', 'decimal_places': '2'}),
+            'sale_price': ('django.db.models.fields.DecimalField', [], {'null': 'True', 'max_digits': '9', 'decimal_places': '2', 'blank': 'True'}),
+            'short_description': ('django.db.models.fields.CharField', [], {'max_length': '700'}),
+            'short_description_html': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'unique': 'True', 'max_length': '255'}),
+            'themes': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "'products'", 'blank': 'True', 'to': "orm['catalogue.Theme']"}),
+            'updated_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'weight': ('django.db.models.fields.DecimalField', [], {'max_digits': '6', 'decimal_places': '3'})
+        },
+        'catalogue.productimage': {
+            'Meta': {'object_name': 'ProductImage'},
+            'alt_text': ('django.db.models.fields.CharField', [], {'max_length': '200'}),
+            'detail_path': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_primary': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'option': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['catalogue.ProductOption']", 'null': 'True', 'blank': 'True'}),
+            'path': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'product': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'images'", 'to': "orm['catalogue.Product']"}),
+            'thumb_path': ('django.db.models.fields.CharField', [], {'max_length': '100', 'blank': 'True'})
+        },
+        'catalogue.productinstance': {
+            'Meta': {'object_name': 'ProductInstance'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'options': ('django.db.models.fields.related.ManyToManyField', [], {'to': "orm['catalogue.ProductOption']", 'symmetrical': 'False', 'blank': 'True'}),
+            'product': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'instances'", 'to': "orm['catalogue.Product']"}),
+            'quantity': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            'sku': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '10'})
+        },
+        'catalogue.productoption': {
+            'Meta': {'unique_together': "(('category', 'name'),)", 'object_name': 'ProductOption'},
+            'category': ('django.db.models.fields.IntegerField', [], {}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        'catalogue.restocknotification': {
+            'Meta': {'unique_together': "(('instance', 'email'),)", 'object_name': 'RestockNotification'},
+            'email': ('django.db.models.fields.EmailField', [], {'max_length': '75'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'instance': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'restock_notifications'", 'to': "orm['catalogue.ProductInstance']"})
+        },
+        'catalogue.size': {
+            'Meta': {'object_name': 'Size', '_ormbases': ['catalogue.ProductOption']},
+            'productoption_ptr': ('django.db.models.fields.related.OneToOneField', [], {'to': "orm['catalogue.ProductOption']", 'unique': 'True', 'primary_key': 'True'}),
+            'short_name': ('django.db.models.fields.CharField', [], {'max_length': '50'}),
+            'sort_index': ('django.db.models.fields.IntegerField', [], {})
+        },
+        'catalogue.specification': {
+            'Meta': {'object_name': 'Specification'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'key': ('django.db.models.fields.CharField', [], {'max_length': '50'}),
+            'product': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'specifications'", 'to': "orm['catalogue.Product']"}),
+            'value': ('django.db.models.fields.CharField', [], {'max_length': '75'})
+        },
+        'catalogue.theme': {
+            'Meta': {'object_name': 'Theme'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'}),
+            'short_description': ('django.db.models.fields.CharField', [], {'max_length': '500'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'unique': 'True', 'max_length': '50'})
+        }
+    }
+
+    complete_apps = ['catalogue']
+    symmetrical = True
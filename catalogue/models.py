@@ -6,6 +6,7 @@ from django.core.exceptions import ValidationError
 from django_countries import CountryField
 
 from utils.validators import not_blank, valid_sku
+from utils.util import render_markdown
 
 
 class Category(MPTTModel, models.Model):
@@ -129,6 +130,9 @@ class Product(models.Model):
                                         validators=[not_blank])
     short_description = models.CharField(max_length=700, help_text='You can use markdown formatting')
     long_description = models.TextField(blank=True, help_text='You can use markdown formatting')
+    # the descriptions rendered from markdown when the product is saved
+    short_description_html = models.TextField(blank=True, editable=False)
+    long_description_html = models.TextField(blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     category = models.ForeignKey(Category)
@@ -153,6 +157,14 @@ class Product(models.Model):
         if self.max_age and self.max_age < self.min_age:
             raise ValidationError(Product.ERROR_MAX_AGE_TOO_SMALL)
 
+    def save(self, *args, **kwargs):
+        self.render_descriptions()
+        super(Product, self).save(*args, **kwargs)
+
+    def render_descriptions(self):
+        self.short_description_html = render_markdown(self.short_description)
+        self.long_description_html = render_markdown(self.long_description)
+
     def __unicode__(self):
         return self.name
 
@@ -338,6 +350,21 @@ class ProductInstance(models.Model):
             return specific_images[0]
         return self.product.images.order_by('-is_primary', 'id')[0]
 
+    def get_best_prefetched_image(self):
+        """
+        Same as get_best_image, but chooses the image in python.  Assumes that self.product.images.all() and
+        self.options.all() have been pre-fetched, so that listings of many instances don't query the DB per instance.
+        """
+        images = sorted(self.product.images.all(), key=lambda image: (not image.is_primary, image.id))
+        if not images:
+            return None
+
+        option_ids = set([option.id for option in self.options.all()])
+        for image in images:
+            if image.option_id in option_ids:
+                return image
+        return images[0]
+
     @property
     def name(self):
         return self.product.name
@@ -1,11 +1,59 @@
+from django.core.exceptions import ObjectDoesNotExist
 from haystack import indexes
-from models import Product
+from django.db.models import Sum
+from models import Product, ProductOption
+from orders.models import Order, ProductOrderItem
+
+# facet values that need a display name as well as a filter value are indexed as "value|name"
+FACET_SEPARATOR = u'|'
+
+
+def facet_value(value, name):
+    return u'%s%s%s' % (value, FACET_SEPARATOR, name)
+
+
+def split_facet_value(value):
+    value, _, name = value.partition(FACET_SEPARATOR)
+    return value, name
 
 
 class ProductIndex(indexes.SearchIndex, indexes.Indexable):
+    """
+    Besides the document text, each product document stores everything that a product listing shows or filters on,
+    so that a listing can be served from the index alone (see catalogue.listingutils).  The stored fields have to be
+    kept up to date with the product, see catalogue.indexutils.
+    """
 
     text = indexes.CharField(document=True, use_template=True)
 
+    # stored for rendering product listings
+    name = indexes.CharField(model_attr='name', faceted=True)   # name_exact is used for sorting
+    slug = indexes.CharField(model_attr='slug', indexed=False)
+    price = indexes.DecimalField(model_attr='price')
+    sale_price = indexes.DecimalField(model_attr='sale_price', null=True)
+    rating = indexes.FloatField(null=True)
+    thumbnail = indexes.CharField(indexed=False, null=True)
+
+    # used for filtering, sorting and faceting
+    current_price = indexes.FloatField()
+    on_sale = indexes.BooleanField()
+    in_stock = indexes.BooleanField()
+    is_box_stuffer = indexes.BooleanField(model_attr='is_box_stuffer')
+    is_green = indexes.BooleanField(model_attr='is_green')
+    min_age = indexes.IntegerField(model_attr='min_age')
+    max_age = indexes.IntegerField(model_attr='max_age', null=True)
+    created_at = indexes.DateTimeField(model_attr='created_at')
+    units_sold = indexes.IntegerField()
+    country = indexes.CharField(model_attr='country_of_origin', faceted=True)
+    category_path = indexes.MultiValueField(faceted=True)
+    brand = indexes.CharField(model_attr='brand__slug', faceted=True)
+    brand_facet = indexes.CharField(faceted=True, indexed=False)
+    themes = indexes.MultiValueField(faceted=True)
+    theme_facets = indexes.MultiValueField(faceted=True, indexed=False)
+    awards = indexes.MultiValueField(faceted=True)
+    colors = indexes.MultiValueField(faceted=True)
+    color_facets = indexes.MultiValueField(faceted=True, indexed=False)
+
     def get_model(self):
         return Product
 
@@ -13,4 +61,64 @@ class ProductIndex(indexes.SearchIndex, indexes.Indexable):
         """
         Index active products.
         """
-        return self.get_model().active.all()
\ No newline at end of file
+        return self.get_model().active.select_related('brand', 'category', 'review_summary').\
+            prefetch_related('themes', 'awards__award', 'images', 'instances__options__color', 'specifications')
+
+    def prepare_rating(self, product):
+        try:
+            summary = product.review_summary
+        except ObjectDoesNotExist:
+            summary = None
+        if summary is None or summary.average is None:
+            # no reviews, or no summary yet (see ReviewSummary.for_product)
+            return None
+        return float(summary.average)
+
+    def prepare_thumbnail(self, product):
+        image = product.get_thumbnail()
+        if image is None:
+            return None
+        return image.thumb_path or image.path
+
+    def prepare_current_price(self, product):
+        return float(product.sale_price or product.price)
+
+    def prepare_on_sale(self, product):
+        return product.sale_price is not None
+
+    def prepare_in_stock(self, product):
+        return product.in_stock()
+
+    def prepare_units_sold(self, product):
+        # an order changes the stock of the product, which queues an index update (see catalogue.indexutils)
+        items = ProductOrderItem.objects.filter(item__product=product).exclude(order__status=Order.CANCELLED)
+        return items.aggregate(Sum('quantity'))['quantity__sum'] or 0
+
+    def prepare_category_path(self, product):
+        return [category.slug for category in product.get_breadcrumbs()]
+
+    def prepare_brand_facet(self, product):
+        return facet_value(product.brand.slug, product.brand.name)
+
+    def prepare_themes(self, product):
+        return [theme.slug for theme in product.themes.all()]
+
+    def prepare_theme_facets(self, product):
+        return [facet_value(theme.slug, theme.name) for theme in product.themes.all()]
+
+    def prepare_awards(self, product):
+        return list(set(award.award.slug for award in product.awards.all()))
+
+    def _colors(self, product):
+        colors = {}
+        for instance in product.instances.all():
+            for option in instance.options.all():
+                if option.category == ProductOption.COLOR:
+                    colors[option.name] = option.color.html
+        return colors
+
+    def prepare_colors(self, product):
+        return self._colors(product).keys()
+
+    def prepare_color_facets(self, product):
+        return [facet_value(name, html) for name, html in self._colors(product).items()]
@@ -1,8 +1,11 @@
-from django.db.models.signals import pre_save
-from catalogue.models import ProductInstance
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from catalogue.models import ProductInstance, Product, Brand, Category, Theme, Award, AwardInstance, ProductImage
+from catalogue.stockutils import clear_stock_level
 from django.dispatch import receiver
 from django.core.mail import send_mass_mail, mail_managers
 from arthurcode.settings import EMAIL_NOTIFICATIONS
+from search import typeahead
+from utils import pagecache
 
 @receiver(pre_save, sender=ProductInstance)
 def on_product_instance_save(sender, instance, **kwargs):
@@ -21,6 +24,51 @@ def on_product_instance_save(sender, instance, **kwargs):
         on_product_out_of_stock(instance)
 
 
+@receiver(post_save, sender=ProductInstance)
+def on_product_instance_saved(sender, instance, **kwargs):
+    # make sure the new stock count shows up right away, rather than when the cached stock count expires
+    clear_stock_level(instance.id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def update_typeahead(sender, **kwargs):
+    # the search box suggestions list product, brand and category names
+    typeahead.bump_version()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductInstance)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Theme)
+@receiver(post_delete, sender=Theme)
+@receiver(post_save, sender=Award)
+@receiver(post_delete, sender=Award)
+@receiver(post_save, sender=AwardInstance)
+@receiver(post_delete, sender=AwardInstance)
+def update_page_cache(sender, **kwargs):
+    # the cached catalogue pages list all of these, see utils.pagecache.  Product instances are saved on every order
+    # to change their stock, which the pages don't show, so only deleting one (and its colors) counts.
+    pagecache.bump_version(pagecache.CATALOGUE)
+
+
+@receiver(m2m_changed, sender=ProductInstance.options.through)
+def update_page_cache_for_options(sender, action, **kwargs):
+    # the color filters on the cached catalogue pages list the colors of the product instances
+    if action.startswith('post_'):
+        pagecache.bump_version(pagecache.CATALOGUE)
+
+
 def on_product_instance_restock(instance):
     notifications = instance.restock_notifications.all()
     if not notifications.exists():
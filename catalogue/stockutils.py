@@ -0,0 +1,32 @@
+from django.core.cache import cache
+from catalogue.models import ProductInstance
+
+# stock counts change with every order, so they are only cached for a short time.  This is enough to stop a burst of
+# traffic to the same page from re-reading the same stock counts on every request.
+STOCK_TIMEOUT = 60
+
+
+def _stock_key(instance_id):
+    return 'stock-%s' % instance_id
+
+
+def get_stock_levels(instance_ids):
+    """
+    Returns a map from product instance id --> quantity in stock for the given product instance ids.  Stock counts
+    are read from the cache, and any that are missing are read from the DB with a single query.
+    """
+    keys = dict((_stock_key(instance_id), instance_id) for instance_id in instance_ids)
+    cached = cache.get_many(keys.keys())
+    levels = dict((keys[key], quantity) for key, quantity in cached.items())
+
+    missing = [instance_id for instance_id in instance_ids if instance_id not in levels]
+    if missing:
+        fresh = dict(ProductInstance.objects.filter(id__in=missing).values_list('id', 'quantity'))
+        cache.set_many(dict((_stock_key(instance_id), quantity) for instance_id, quantity in fresh.items()),
+                       STOCK_TIMEOUT)
+        levels.update(fresh)
+    return levels
+
+
+def clear_stock_level(instance_id):
+    cache.delete(_stock_key(instance_id))
@@ -1,8 +1,8 @@
 from utils.templatetags.extras import query_string, get_query_string
+from utils.querystring import get_query_params
 from django.template import Library
 from django.core.urlresolvers import reverse
 from catalogue import filters
-from urlparse import parse_qsl
 
 register = Library()
 
@@ -68,10 +68,9 @@ def preserve_params(context, url):
     The only query parameter that is not preserved is the current-page identifier.
     """
     to_add = None
-    to_remove = "page"
+    to_remove = ["page"]
     request = context['request']
-    params = parse_qsl(request.META['QUERY_STRING'])
-    query_string = get_query_string(params, to_add, to_remove)
+    query_string = get_query_string(get_query_params(request), to_add, to_remove)
     if query_string == "?":
         query_string = ""
     return {"response": url + query_string}
@@ -1,11 +1,16 @@
 from django.test import TestCase, TransactionTestCase
 from blog.tests import Counter
-from catalogue.models import Category, Product, get_inactive_category
+from catalogue.models import Category, Product, Brand, ProductInstance, ProductOption, Color
 from datetime import datetime
 from django.test.client import Client
 from utils import validators
 from django.core.exceptions import ValidationError
 from django.db.utils import IntegrityError
+from utils import pagecache
+# the test runner only looks in this module
+from catalogue.tests_filters import *
+from catalogue.tests_index import *
+from catalogue.tests_listing import *
 
 
 class CategoryTest(TestCase):
@@ -297,4 +302,28 @@ def create_product(**kwargs):
                       sale_price=sale_price)
     product.full_clean()
     product.save()
-    return product
\ No newline at end of file
+    return product
+
+
+class PageCacheVersionTest(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Toys', slug='toys', description='Toys')
+        brand = Brand.objects.create(name='Brand', slug='brand', short_description='-', long_description='-')
+        product = Product.objects.create(name='Product', slug='product', brand=brand, price='5.00', category=category,
+                                         meta_description='-', weight='1.0')
+        self.instance = ProductInstance.objects.create(product=product, quantity=1, sku='ABC123')
+
+    def version(self):
+        return pagecache.get_versions([pagecache.CATALOGUE])
+
+    def test_stock_change_keeps_pages(self):
+        version = self.version()
+        self.instance.quantity = 0
+        self.instance.save()
+        self.assertEqual(version, self.version())
+
+    def test_color_change_bumps_version(self):
+        version = self.version()
+        self.instance.options.add(Color.objects.create(name='Red', category=ProductOption.COLOR, html='red'))
+        self.assertNotEqual(version, self.version())
@@ -0,0 +1,37 @@
+from decimal import Decimal
+from django.test import TestCase
+from catalogue import filters
+from catalogue.models import Category, Brand, Product
+
+
+class FilterSetTest(TestCase):
+
+    def test_parse(self):
+        params = [('filterBrand', 'lego'), ('filterMaxPrice', 'abc'), ('ageRange', '5+2'), ('filterBrand', 'lego'),
+                  ('madeIn', 'XX'), ('filterOnSale', 'maybe'), ('filterMaxPrice', '20'), ('page', '2'),
+                  ('filterTheme', 'bad slug!')]
+        filter_set = filters.FilterSet.parse(params)
+        self.assertEqual([filters.BrandFilter, filters.MaxPriceFilter], [type(f) for f in filter_set])
+        self.assertEqual(filter_set.key, filters.FilterSet.parse(reversed(params)).key)
+        self.assertEqual(Decimal('20'), filter_set.get(filters.MaxPriceFilter).max_price)
+        self.assertIsNone(filter_set.get(filters.ThemeFilter))
+
+    def test_names_resolved_together(self):
+        Brand.objects.create(name='Lego', slug='lego', short_description='-', long_description='-')
+        Brand.objects.create(name='Hape', slug='hape', short_description='-', long_description='-')
+        filter_set = filters.FilterSet.parse([('filterBrand', 'lego'), ('filterBrand', 'hape'),
+                                              ('filterBrand', 'nobody')])
+        with self.assertNumQueries(1):
+            self.assertEqual([u'Lego brand', u'Hape brand', u'nobody brand'], [unicode(f) for f in filter_set])
+
+    def test_apply(self):
+        category = Category.objects.create(name='Toys', slug='toys', description='Toys')
+        lego = Brand.objects.create(name='Lego', slug='lego', short_description='-', long_description='-')
+        hape = Brand.objects.create(name='Hape', slug='hape', short_description='-', long_description='-')
+        for brand in (lego, hape):
+            Product.objects.create(name=brand.name, slug=brand.slug, brand=brand, price='15.00',
+                                             category=category, meta_description='-', weight='1.0')
+        filter_set = filters.FilterSet.parse([('filterBrand', 'lego'), ('filterMaxPrice', '20'), ('color', 'red')])
+        self.assertEqual([], list(filter_set.apply(Product.objects.all())))
+        self.assertEqual([lego.products.get()],
+                         list(filter_set.apply(Product.objects.all(), exclude=filters.ColorFilter)))
@@ -0,0 +1,121 @@
+from django.test import TestCase
+from django.test.utils import override_settings
+from haystack import connections
+from mock import Mock, patch
+from pysolr import SolrError
+from catalogue import indexutils
+from catalogue.models import Category, Brand, Product, ProductInstance
+
+
+@override_settings(SEARCH_INDEX_UPDATES='background')
+class IndexQueueTest(TestCase):
+
+    def setUp(self):
+        # whatever backend is configured (e.g. Solr), the updates go to a mock
+        self.backend = Mock()
+        self.write_backend = patch.object(indexutils, '_write_backend', return_value=self.backend)
+        self.write_backend.start()
+        indexutils.index_queue.flush()
+        # no worker thread in the tests, the queue is flushed by hand
+        self.start = patch.object(indexutils.index_queue, '_start')
+        self.start.start()
+        self.category = Category.objects.create(name='Toys', slug='toys', description='Toys')
+        self.brand = Brand.objects.create(name='Brand', slug='brand', short_description='-', long_description='-')
+        self.products = [Product.objects.create(name='Product %d' % i, slug='product-%d' % i, brand=self.brand,
+                                                price='5.00', category=self.category, meta_description='-',
+                                                weight='1.0') for i in range(3)]
+        indexutils.index_queue.flush()
+        self.backend.reset_mock()
+
+    def tearDown(self):
+        self.start.stop()
+        self.write_backend.stop()
+
+    def test_updates_are_batched(self):
+        update, remove = self.backend.update, self.backend.remove
+        first, second, third = self.products
+        first.name = 'Renamed'
+        first.save()
+        second.is_active = False
+        second.save()
+        ProductInstance.objects.create(product=third, quantity=1, sku='ABC123')
+        self.assertFalse(update.called)
+
+        self.assertEqual((2, 1), indexutils.index_queue.flush())
+        self.assertEqual(1, update.call_count)
+        self.assertEqual(set([first, third]), set(update.call_args[0][1]))
+        remove.assert_called_once_with('catalogue.product.%d' % second.id)
+        self.assertEqual(set(), indexutils.index_queue.pending())
+
+    def test_brand_and_delete(self):
+        self.brand.name = 'New Brand'
+        self.brand.save()
+        self.assertEqual((3, 0), indexutils.index_queue.flush())
+
+        product_id = self.products[0].id
+        self.products[0].delete()
+        self.assertEqual((0, 1), indexutils.index_queue.flush())
+        self.backend.remove.assert_called_once_with('catalogue.product.%d' % product_id)
+
+    def test_failed_flush_is_requeued(self):
+        self.products[0].save()
+        self.backend.update.side_effect = IOError("Solr is down")
+        self.assertRaises(IOError, indexutils.index_queue.flush)
+        self.assertEqual(set([(indexutils.PRODUCT, self.products[0].id)]), indexutils.index_queue.pending())
+
+        self.backend.update.side_effect = None
+        self.assertEqual((1, 0), indexutils.index_queue.flush())
+        self.assertEqual(set(), indexutils.index_queue.pending())
+
+    def test_nothing_queued_when_off(self):
+        with self.settings(SEARCH_INDEX_UPDATES=indexutils.OFF):
+            self.products[0].save()
+        self.assertEqual(set(), indexutils.index_queue.pending())
+
+
+@override_settings(SEARCH_INDEX_UPDATES='background')
+class SolrIndexUpdateTest(TestCase):
+    """
+    Flushes the queue to a real Solr backend, with haystack's default SILENTLY_FAIL.
+    """
+
+    def setUp(self):
+        # nothing listens on port 9
+        self.connection = patch.dict(connections.connections_info, {'default': {
+            'ENGINE': 'haystack.backends.solr_backend.SolrEngine',
+            'URL': 'http://127.0.0.1:9/solr',
+            'TIMEOUT': 1,
+        }})
+        self.connection.start()
+        connections.reload('default')
+        self.start = patch.object(indexutils.index_queue, '_start')
+        self.start.start()
+        category = Category.objects.create(name='Toys', slug='toys', description='Toys')
+        brand = Brand.objects.create(name='Brand', slug='brand', short_description='-', long_description='-')
+        self.products = [Product.objects.create(name='Product %d' % i, slug='product-%d' % i, brand=brand,
+                                                price='5.00', category=category, meta_description='-',
+                                                weight='1.0') for i in range(2)]
+
+    def tearDown(self):
+        with indexutils.index_queue._lock:
+            indexutils.index_queue._pending.clear()
+        self.start.stop()
+        self.connection.stop()
+        connections.reload('default')
+
+    def test_failed_flush_is_requeued(self):
+        queued = indexutils.index_queue.pending()
+        self.assertRaises(SolrError, indexutils.index_queue.flush)
+        self.assertEqual(queued, indexutils.index_queue.pending())
+
+    def test_removes_are_batched(self):
+        for product in self.products:
+            product.is_active = False
+            product.save()
+        with patch('pysolr.Solr._update') as update:
+            self.assertEqual((0, 2), indexutils.index_queue.flush())
+        messages = [args[0] for args, kwargs in update.call_args_list]
+        self.assertEqual(2, len(messages))
+        self.assertTrue(messages[0].startswith('<delete><query>id:("catalogue.product.%d" OR "catalogue.product.%d")'
+                                               % tuple(product.id for product in self.products)))
+        self.assertTrue(messages[1].startswith('<commit'))
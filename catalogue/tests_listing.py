@@ -0,0 +1,81 @@
+from decimal import Decimal
+from django.test import TestCase
+from haystack.models import SearchResult
+from mock import patch
+from catalogue import filters, listingutils
+from catalogue.models import Category, Brand, Product, ProductInstance
+from catalogue.search_indexes import ProductIndex
+
+
+class ProductListingTest(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Toys', slug='toys', description='Toys')
+        self.brand = Brand.objects.create(name='Brand', slug='brand', short_description='-', long_description='-')
+        self.product = Product.objects.create(name='Product', slug='product', brand=self.brand, price='20.00',
+                                              sale_price='15.00', category=self.category, meta_description='-',
+                                              weight='1.0', min_age=3, country_of_origin='CA')
+        ProductInstance.objects.create(product=self.product, quantity=2, sku='ABC123')
+
+    def test_document(self):
+        index = ProductIndex()
+        product = index.index_queryset().get(id=self.product.id)
+        data = index.full_prepare(product)
+        self.assertEqual(15.0, data['current_price'])
+        self.assertTrue(data['on_sale'])
+        self.assertTrue(data['in_stock'])
+        self.assertEqual(['toys'], data['category_path'])
+        self.assertEqual('brand', data['brand'])
+        self.assertEqual(u'brand|Brand', data['brand_facet'])
+        self.assertEqual(u'brand|Brand', data['brand_facet_exact'])
+        self.assertEqual('CA', data['country_exact'])
+        self.assertEqual(None, data.get('rating'))
+        self.assertEqual(0, data['units_sold'])
+
+    def test_indexed_product(self):
+        result = SearchResult('catalogue', 'product', self.product.id, 1.0, name='Product', slug='product',
+                              price=u'20.00', sale_price=u'15.00', rating=4.5, thumbnail='thumb.jpg')
+        product = listingutils.IndexedProduct(result)
+        self.assertEqual(self.product.get_absolute_url(), product.get_absolute_url())
+        self.assertEqual(25, product.percent_savings())
+        self.assertEqual(4.5, product.get_rating())
+        self.assertEqual('thumb.jpg', product.get_thumbnail().thumb_path)
+
+    def test_facet_fields(self):
+        listing = listingutils.ProductListing(category=self.category)
+        results = {'results': [], 'hits': 0, 'facets': {'fields': {'category_path_exact': [(u'toys', 1)]}}}
+        with patch.object(listing.sqs.query.backend, 'search', return_value=results) as search:
+            listing.prefetch(0, 10)
+        # the category slugs are counted in the untokenized field
+        self.assertTrue('category_path_exact' in search.call_args[1]['facets'])
+        self.assertEqual([self.category], listing.get_facets([self.category])['child_categories'])
+
+    def test_facets(self):
+        applied = [filters.BrandFilter('lego'), filters.MaxPriceFilter('20')]
+        under_10 = filters.MaxPriceFilter('10')
+        under_20 = filters.MaxPriceFilter('20')
+        facet_counts = {
+            'fields': {
+                'brand_facet': [(u'lego|Lego', 3), (u'brio|Brio', 2), (u'hape|Hape', 0)],
+                'category_path': [(u'toys', 5)],
+                'country': [(u'CA', 4), (u'CN', 1)],
+            },
+            'queries': {
+                u'{!ex=filterMaxPrice}%s' % under_10.index_query(): 1,
+                u'{!ex=filterMaxPrice}%s' % under_20.index_query(): 3,
+                filters.OnSaleFilter().index_query(): 2,
+            },
+        }
+        other = Category.objects.create(name='Other', slug='other', description='Other')
+        facets = listingutils.build_facets(facet_counts, applied, [self.category, other])
+
+        self.assertEqual([self.category], facets['child_categories'])
+        self.assertEqual(5, facets['child_categories'][0].product_count)
+        self.assertEqual([(u'Brio', 2, False), (u'Lego', 3, True)],
+                         [(f.name, f.product_count, f.active_filter) for f in facets['brands']])
+        self.assertEqual(u'Lego', applied[0].name)
+        self.assertEqual([(Decimal('20'), 3, True), (Decimal('10'), 1, False)],
+                         [(f.max_price, f.product_count, f.active_filter) for f in facets['prices']])
+        self.assertEqual(['CA'], [f.country_code for f in facets['countries']])
+        self.assertEqual([filters.OnSaleFilter], [type(f) for f in facets['features']])
+        self.assertEqual([], facets['themes'])
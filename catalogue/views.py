@@ -1,5 +1,3 @@
-from decimal import Decimal
-
 from django.shortcuts import get_object_or_404, render_to_response, redirect
 from django.template import RequestContext
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
@@ -11,22 +9,26 @@ from catalogue.models import Product, Category, Brand, Theme, ProductInstance, P
     Award
 from arthurcode import settings
 from cart.forms import ProductAddToCartForm, ProductAddToWishListForm, ProductAddToCartOrWishListForm
-from catalogue import filters
-from search import searchutils
+from catalogue import filters, listingutils
+from search import searchutils, resultcache
 import json
 from catalogue.forms import RestockNotifyForm
 from urllib import urlencode
 from wishlists.views import PRODUCT_INSTANCE_KEY
-from haystack.query import SearchQuerySet
+from reviews.models import ReviewSummary
+from reviews.reviewutils import get_review_page
+from utils import pagecache
 
 
 DEFAULT_PAGE_SIZE = 16
+PAGE_SIZES = [DEFAULT_PAGE_SIZE, 32, 64, 96]
 
 
 def home_view(request):
     return redirect('catalogue_featured')
 
 
+@pagecache.page_cache(pagecache.CATALOGUE, authenticated=True)
 def featured_view(request):
     featured_products = Product.active.filter(is_featured=True)
     context = {
@@ -75,8 +77,8 @@ def product_detail_view(request, slug=""):
     request.session.set_test_cookie()
     breadcrumbs = product.get_breadcrumbs()
     meta_description = product.meta_description
-    reviews = product.reviews.select_related('product', 'user__public_profile').\
-        prefetch_related('flags').order_by('-last_modified')
+    review_summary = ReviewSummary.for_product(product)
+    reviews, next_reviews_cursor = get_review_page(product, request.GET.get('reviews', None))
     images = product.images.order_by('-is_primary').select_related('option') # make sure the primary image(s) appear first in this list
 
     # map from product-option-id --> product-image-id
@@ -114,21 +116,16 @@ def product_detail_view(request, slug=""):
 
     option_to_stock_map = json.dumps(option_to_stock_map)  # should now be a string
 
-    # manually calculate the average rating rather than hit the DB again
-    avg = None
-    if reviews:
-        avg = Decimal('0')
-        for review in reviews:
-            avg += review.rating
-        avg /= reviews.count()
-
     context = {
         'form': form,
         'product': product,
         'breadcrumbs': list(breadcrumbs),                      # force evaluation to save a query in the template
         'meta_description': meta_description,
         'reviews': reviews,
-        'avg_rating': avg,
+        'next_reviews_cursor': next_reviews_cursor,
+        'review_count': review_summary.count,
+        'review_histogram': review_summary.histogram(),
+        'avg_rating': review_summary.average,
         'images': images,
         'option_id_map': option_id_map,
         'option_to_stock_map': option_to_stock_map,
@@ -143,7 +140,43 @@ def _search_text(request):
     return request.GET.get('search', None)
 
 
+def _page_size(request, product_list):
+    """
+    Returns the requested page size, and whether or not it shows all of the products on one page.
+    """
+    pageSize = request.GET.get('pageSize') or DEFAULT_PAGE_SIZE
+
+    showing_all_products = False
+    if pageSize == "All":
+        pageSize = max(product_list.count(), 1)
+        showing_all_products = True
+
+    # make sure pageSize is an integer.  If it isn't, fall back to the default size
+    try:
+        pageSize = int(pageSize)
+        if pageSize < 1:
+            pageSize = DEFAULT_PAGE_SIZE
+    except:
+        pageSize = DEFAULT_PAGE_SIZE
+    return pageSize, showing_all_products
+
+
+def _page(request, paginator):
+    page = request.GET.get('page')
+
+    try:
+        return paginator.page(page)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator._num_pages)
+
+
+@pagecache.page_cache(pagecache.CATALOGUE, authenticated=True)
 def category_view(request, category_slug=""):
+    if getattr(settings, 'CATALOGUE_SEARCH_LISTINGS', False):
+        return indexed_category_view(request, category_slug)
+
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug)
         pre_filter_product_list = products_in_category(category, Product.active)
@@ -163,20 +196,16 @@ def category_view(request, category_slug=""):
     score_map = {}
 
     if search_text:
-        sqs = SearchQuerySet().auto_query(search_text).models(Product)
-        spelling_suggestion = sqs.spelling_suggestion()
-        if isinstance(spelling_suggestion, dict):
-            # for some reason solr sometimes returns a dict, so we need to grab the 'suggestion' list
-            spelling_suggestion = spelling_suggestion['suggestion'][0]
-        # force the evaluation of the pre-filter product list queryset to
-        # avoid running expensive search sub-queries more than once
-        pre_filter_product_list = pre_filter_product_list.filter(id__in=[p.pk for p in sqs])
-        # log the search query
-        searchutils.store(request, search_text, sqs.count())
+        # paging, sorting and filtering a search re-use the cached results of the first page view
+        results = resultcache.search_products(search_text)
+        spelling_suggestion = results['suggestion']
+        pre_filter_product_list = pre_filter_product_list.filter(id__in=results['ids'])
+        searchutils.store(request, search_text, results['total'])
+        # every search is logged, so a search page can't be served from the page cache
+        pagecache.skip(request)
 
         # build up a map of product id --> search score
-        for p in sqs:
-            score_map[int(p.pk)] = p.score
+        score_map = dict(zip(results['ids'], results['scores']))
 
     final_product_list, applied_filters = filters.filter_products(request, pre_filter_product_list)
     final_product_list = final_product_list.annotate(rating=Avg('reviews__rating'))
@@ -192,32 +221,12 @@ def category_view(request, category_slug=""):
     child_categories = add_product_count(child_categories, final_product_subquery)
 
     # paginate the product listing
-    pageSize = request.GET.get('pageSize') or DEFAULT_PAGE_SIZE
-
-    showing_all_products = False
-    if pageSize == "All":
-        pageSize = max(final_product_list.count(), 1)
-        showing_all_products = True
-
-    # make sure pageSize is an integer.  If it isn't, fall back to the default size
-    try:
-        pageSize = int(pageSize)
-        if pageSize < 1:
-            pageSize = DEFAULT_PAGE_SIZE
-    except:
-        pageSize = DEFAULT_PAGE_SIZE
+    pageSize, showing_all_products = _page_size(request, final_product_list)
     paginator = Paginator(final_product_list, per_page=pageSize, allow_empty_first_page=True)
-    page = request.GET.get('page')
-
-    try:
-        products = paginator.page(page)
-    except PageNotAnInteger:
-        products = paginator.page(1)
-    except EmptyPage:
-        products = paginator.page(paginator._num_pages)
+    products = _page(request, paginator)
 
     context = {
-        'page_sizes': [DEFAULT_PAGE_SIZE, 32, 64, 96],
+        'page_sizes': PAGE_SIZES,
         'products': products,
         'showing_all_products': showing_all_products,
         'category': category,
@@ -225,16 +234,7 @@ def category_view(request, category_slug=""):
         'meta_description': meta_description,
         'child_categories': child_categories,
         'sort_key': sort_key,
-        'sorts': [
-            ('bestselling', 'Most Popular'),
-            ('priceMin', 'Price (Low to high)'),
-            ('priceMax', 'Price (High to Low)'),
-            ('nameA', 'Name (A to Z)'),
-            ('nameZ', 'Name (Z to A)'),
-            ('rating', 'Top Rated'),
-            ('new', 'Recently Added'),
-            ('bestMatch', 'Best Match'),
-        ],
+        'sorts': PRODUCT_SORT_NAMES,
         'search_text': search_text,
         'spelling_suggestion': spelling_suggestion,  # will be None if there was no search
         'filters': applied_filters,
@@ -249,6 +249,72 @@ def category_view(request, category_slug=""):
     return render_to_response("category.html", context, context_instance=RequestContext(request))
 
 
+def indexed_category_view(request, category_slug=""):
+    """
+    The same page as category_view, but the products, the filter counts and the child category counts all come from
+    a single search request, see catalogue.listingutils.
+    """
+    if category_slug:
+        category = get_object_or_404(Category, slug=category_slug)
+        meta_description = category.description
+        child_categories = category.get_children()
+        parent_categories = category.get_ancestors(ascending=False, include_self=False)
+    else:
+        category = None
+        parent_categories = None
+        meta_description = "All products for sale at %s." % settings.SITE_NAME
+        child_categories = Category.objects.root_nodes()
+
+    search_text = _search_text(request)
+    applied_filters = filters.parse_filters(request)
+    listing = listingutils.ProductListing(category, search_text, applied_filters, request.GET.get('sortBy', None))
+
+    # fetch the requested page first, the paginator's count and the facet counts come back with it
+    pageSize, showing_all_products = _page_size(request, listing)
+    try:
+        start = (int(request.GET.get('page')) - 1) * pageSize
+    except (TypeError, ValueError):
+        start = 0
+    listing.prefetch(max(start, 0), max(start, 0) + pageSize)
+    products = _page(request, Paginator(listing, per_page=pageSize, allow_empty_first_page=True))
+
+    spelling_suggestion = None
+    if search_text:
+        spelling_suggestion = listing.sqs.spelling_suggestion()
+        if isinstance(spelling_suggestion, dict):
+            spelling_suggestion = spelling_suggestion['suggestion'][0]
+        searchutils.store(request, search_text, listing.count())
+        pagecache.skip(request)
+
+    context = {
+        'page_sizes': PAGE_SIZES,
+        'products': products,
+        'showing_all_products': showing_all_products,
+        'category': category,
+        'parent_categories': parent_categories,
+        'meta_description': meta_description,
+        'sort_key': listing.sort_key,
+        'sorts': PRODUCT_SORT_NAMES,
+        'search_text': search_text,
+        'spelling_suggestion': spelling_suggestion,
+        'filters': applied_filters,
+    }
+    context.update(listing.get_facets(child_categories.order_by('name')))
+    return render_to_response("category.html", context, context_instance=RequestContext(request))
+
+
+PRODUCT_SORT_NAMES = [
+    ('bestselling', 'Most Popular'),
+    ('priceMin', 'Price (Low to high)'),
+    ('priceMax', 'Price (High to Low)'),
+    ('nameA', 'Name (A to Z)'),
+    ('nameZ', 'Name (Z to A)'),
+    ('rating', 'Top Rated'),
+    ('new', 'Recently Added'),
+    ('bestMatch', 'Best Match'),
+]
+
+
 PRODUCT_SORTS = {
     'bestselling': lambda q: q, # TODO
     # http://stackoverflow.com/questions/981375/using-a-django-custom-model-method-property-in-order-by
@@ -314,16 +380,10 @@ def get_brands(pre_filter_queryset, final_queryset, request_filters):
     in product_count.  See https://docs.djangoproject.com/en/dev/topics/db/aggregation/ for more details.  Sweet!
     The brands will be in alphabetical order.
     """
-    queryset = pre_filter_queryset
-    active_filter = None
-
-    for a_filter in request_filters:
-        if isinstance(a_filter, filters.BrandFilter):
-            active_filter = a_filter
-            continue
-        queryset = a_filter.apply(queryset)
-
-    if not active_filter:
+    active_filter = request_filters.get(filters.BrandFilter)
+    if active_filter:
+        queryset = request_filters.apply(pre_filter_queryset, exclude=filters.BrandFilter)
+    else:
         # there are no brand filters active, therefore we can go ahead and use final_queryset to simplify the subquery
         queryset = final_queryset
 
@@ -343,16 +403,10 @@ def get_brands(pre_filter_queryset, final_queryset, request_filters):
 
 
 def get_themes(pre_filter_queryset, final_queryset, request_filters):
-    queryset = pre_filter_queryset
-    active_filter = None
-
-    for a_filter in request_filters:
-        if isinstance(a_filter, filters.ThemeFilter):
-            active_filter = a_filter
-            continue
-        queryset = a_filter.apply(queryset)
-
-    if not active_filter:
+    active_filter = request_filters.get(filters.ThemeFilter)
+    if active_filter:
+        queryset = request_filters.apply(pre_filter_queryset, exclude=filters.ThemeFilter)
+    else:
         # there are no theme filters active, therefore we can go ahead and use final_queryset and simplify the subquery
         queryset = final_queryset
 
@@ -377,18 +431,12 @@ def get_prices(pre_filter_queryset, final_queryset, request_filters):
     This hits the DB multiple times.  It should be possible to do this in a single query, but not without using
     custom SQL.  This is TBD.
     """
-    price_bins = ('10', '20', '30', '40', '50', '75', '100', '200')
+    price_bins = filters.PRICE_BINS
     price_filters = []
-    queryset = pre_filter_queryset
-    active_filter = None
-
-    for a_filter in request_filters:
-        if isinstance(a_filter, filters.MaxPriceFilter):
-            active_filter = a_filter
-            continue
-        queryset = a_filter.apply(queryset)
-
-    if not active_filter:
+    active_filter = request_filters.get(filters.MaxPriceFilter)
+    if active_filter:
+        queryset = request_filters.apply(pre_filter_queryset, exclude=filters.MaxPriceFilter)
+    else:
         # simplify the subquery when there is no currently active price filter
         queryset = final_queryset
 
@@ -419,20 +467,14 @@ def get_prices(pre_filter_queryset, final_queryset, request_filters):
 
 
 def get_ages(pre_filter_queryset, final_queryset, request_filters):
-    queryset = pre_filter_queryset
-    active_filter = None
-
-    for a_filter in request_filters:
-        if isinstance(a_filter, filters.AgeRangeFilter):
-            active_filter = a_filter
-            continue
-        queryset = a_filter.apply(queryset)
-
-    if not active_filter:
+    active_filter = request_filters.get(filters.AgeRangeFilter)
+    if active_filter:
+        queryset = request_filters.apply(pre_filter_queryset, exclude=filters.AgeRangeFilter)
+    else:
         # simplification
         queryset = final_queryset
 
-    age_bins = [(0, 0), (1, 1), (2, 2), (3, 4), (5, 7), (8, 11), (12, 14), (15, None)]  # age ranges copied from ToysRUs
+    age_bins = filters.AGE_BINS
     age_filters = []
 
     select = {}
@@ -467,16 +509,10 @@ def get_ages(pre_filter_queryset, final_queryset, request_filters):
 
 
 def get_colors(pre_filter_queryset, final_queryset, request_filters):
-    queryset = pre_filter_queryset
-    active_filter = None
-
-    for a_filter in request_filters:
-        if isinstance(a_filter, filters.ColorFilter):
-            active_filter = a_filter
-            continue
-        queryset = a_filter.apply(queryset)
-
-    if not active_filter:
+    active_filter = request_filters.get(filters.ColorFilter)
+    if active_filter:
+        queryset = request_filters.apply(pre_filter_queryset, exclude=filters.ColorFilter)
+    else:
         # simplification
         queryset = final_queryset
 
@@ -500,16 +536,10 @@ def get_colors(pre_filter_queryset, final_queryset, request_filters):
 
 
 def get_countries(pre_filter_queryset, final_queryset, request_filters):
-    queryset = pre_filter_queryset
-    active_filter = None
-
-    for a_filter in request_filters:
-        if isinstance(a_filter, filters.CountryOfOriginFilter):
-            active_filter = a_filter
-            continue
-        queryset = a_filter.apply(queryset)
-
-    if not active_filter:
+    active_filter = request_filters.get(filters.CountryOfOriginFilter)
+    if active_filter:
+        queryset = request_filters.apply(pre_filter_queryset, exclude=filters.CountryOfOriginFilter)
+    else:
         # simplification
         queryset = final_queryset
 
@@ -585,6 +615,7 @@ def restock_notify_view(request, instance_id):
     return render_to_response('restock_notify.html', context, context_instance=RequestContext(request))
 
 
+@pagecache.page_cache(pagecache.CATALOGUE, authenticated=True)
 def brands_view(request):
     # only show brands with active products, display in alphabetical order
     brands = Brand.objects.filter(products__is_active=True).distinct().order_by('name')
@@ -594,6 +625,7 @@ def brands_view(request):
     return render_to_response('brands.html', context, context_instance=RequestContext(request))
 
 
+@pagecache.page_cache(pagecache.CATALOGUE, authenticated=True)
 def brand_view(request, brand_slug):
     brand = get_object_or_404(Brand, slug=brand_slug)
     filter = filters.BrandFilter(brand_slug)
@@ -608,6 +640,7 @@ def brand_view(request, brand_slug):
     return render_to_response('brand.html', context, context_instance=RequestContext(request))
 
 
+@pagecache.page_cache(pagecache.CATALOGUE, authenticated=True)
 def awards_view(request):
     # get all awards that have been won by active products
     awards = Award.objects.filter(instances__products__is_active=True).distinct().order_by('name')
@@ -617,6 +650,7 @@ def awards_view(request):
     return render_to_response('awards.html', context, context_instance=RequestContext(request))
 
 
+@pagecache.page_cache(pagecache.CATALOGUE, authenticated=True)
 def award_view(request, award_slug):
     award = get_object_or_404(Award, slug=award_slug)
     filter = filters.AwardFilter(award_slug)
@@ -1,8 +1,9 @@
 from django.contrib import admin
-from comments.models import MPTTComment, CommentFlag
+from comments.models import MPTTComment, CommentFlag, QueuedEmail
 from django.utils.translation import ugettext_lazy as _, ungettext
 from comments import get_model
 from comments.views.moderation import perform_flag, perform_approve, perform_remove, perform_mark_as_spam
+from comments.commentutils import reclassify_comments
 
 # TODO: put this code in a better place since it's specific to Blog's models
 from django.contrib.admin import SimpleListFilter
@@ -85,7 +86,7 @@ class CommentsAdmin(admin.ModelAdmin):
     ordering = ('-submit_date',)
     raw_id_fields = ('user',)
     search_fields = ('comment', 'user__username', 'user_name', 'user_email', 'user_url', 'ip_address')
-    actions = ["flag_comments", "approve_comments", "remove_comments", "mark_as_spam"]
+    actions = ["flag_comments", "approve_comments", "remove_comments", "mark_as_spam", "mark_as_not_spam"]
     readonly_fields = ('is_spam',)
 
     def get_actions(self, request):
@@ -100,6 +101,8 @@ class CommentsAdmin(admin.ModelAdmin):
                 actions.pop('remove_comments')
             if 'mark_as_spam' in actions:
                 actions.pop('mark_as_spam')
+            if 'mark_as_not_spam' in actions:
+                actions.pop('mark_as_not_spam')
         return actions
 
     def flag_comments(self, request, queryset):
@@ -118,10 +121,26 @@ class CommentsAdmin(admin.ModelAdmin):
     remove_comments.short_description = _("Remove selected comments")
 
     def mark_as_spam(self, request, queryset):
-        self._bulk_flag(request, queryset, perform_mark_as_spam,
-                        lambda n: ungettext('marked as spam', 'marked as spam', n))
+        self._bulk_reclassify(request, queryset, True, _('marked as spam'))
     mark_as_spam.short_description = _("Mark comments as spam")
 
+    def mark_as_not_spam(self, request, queryset):
+        self._bulk_reclassify(request, queryset, False, _('marked as not spam'))
+    mark_as_not_spam.short_description = _("Mark comments as not spam (and approve them)")
+
+    def _bulk_reclassify(self, request, queryset, spam, done_message):
+        """
+        Marks comments as spam or ham in bulk, and reports the changes to Akismet in parallel.
+        """
+        n_comments, failed = reclassify_comments(queryset, spam, request.user)
+        msg = ungettext(u'1 comment was successfully %(action)s.',
+                        u'%(count)s comments were successfully %(action)s.',
+                        n_comments)
+        self.message_user(request, msg % {'count': n_comments, 'action': done_message})
+        if failed:
+            self.message_user(request, _(u'Akismet could not be told about comments %s.') %
+                                       ', '.join([str(id) for id in failed]))
+
     def _bulk_flag(self, request, queryset, action, done_message):
         """
         Flag, approve, or remove some comments from an admin action. Actually
@@ -154,3 +173,12 @@ class CommentsAdmin(admin.ModelAdmin):
 # (this won't be true if there's a custom comment app).
 if get_model() is MPTTComment:
     admin.site.register(MPTTComment, CommentsAdmin)
+
+
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'date_queued', 'date_claimed', 'date_sent', 'attempts')
+    list_filter = ('date_sent',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('date_queued',)
+
+admin.site.register(QueuedEmail, QueuedEmailAdmin)
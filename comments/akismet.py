@@ -1,11 +1,13 @@
 #!/usr/bin/python
 
-__version__ = "0.3"
+__version__ = "0.4"
 __date__ = "2005-12-01"
 __author__ = "David Lynch (kemayo AT Google's mail service DOT com)"
 __copyright__ = "Copyright 2005, David Lynch"
 __license__ = "New BSD"
 __history__ = """
+0.4 - Reuse keep-alive connections, and send the key as the api_key parameter so that every call goes to the
+    same host.
 0.3 - 20051205 - Cleaned up __post.
 0.2 - 20051201 - Added documentation, and tweaked the circumstances where an error
     will be thrown.
@@ -13,11 +15,17 @@ __history__ = """
 """
 
 import httplib
+import socket
+import threading
 from urllib import urlencode
 
 USERAGENT = ""
 AKISMET_URL = "rest.akismet.com"
 AKISMET_PORT = 80
+AKISMET_TIMEOUT = 10
+
+# keep-alive connections, one per (host, port) and per thread since httplib connections aren't thread safe
+_connections = threading.local()
 
 class AkismetError(Exception):
     def __init__(self, response, statuscode):
@@ -26,14 +34,40 @@ class AkismetError(Exception):
     def __str__(self):
          return repr(self.value)
 
+def _get_connection(host, port):
+    pool = getattr(_connections, 'pool', None)
+    if pool is None:
+        pool = _connections.pool = {}
+    connection = pool.get((host, port))
+    if connection is None:
+        connection = pool[(host, port)] = httplib.HTTPConnection(host, port, timeout=AKISMET_TIMEOUT)
+    return connection
+
+def _drop_connection(host, port):
+    connection = getattr(_connections, 'pool', {}).pop((host, port), None)
+    if connection is not None:
+        connection.close()
+
+def close_connections():
+    """Closes the pooled connections of the current thread."""
+    for connection in getattr(_connections, 'pool', {}).values():
+        connection.close()
+    _connections.pool = {}
+
 def __post(request, host, path, port = 80):
-    connection = httplib.HTTPConnection(host, port)
-    connection.request("POST", path, request,
-        {"User-Agent":"%s | %s/%s" % (USERAGENT,"Akistmet.py", __version__),
-        "Content-type":"application/x-www-form-urlencoded"})
-    response = connection.getresponse()
-    
-    return response.read(), response.status
+    headers = {"User-Agent":"%s | %s/%s" % (USERAGENT,"Akistmet.py", __version__),
+               "Content-type":"application/x-www-form-urlencoded"}
+    # a pooled connection may have been closed by the server since it was last used, so retry once on a fresh one
+    for attempt in range(2):
+        connection = _get_connection(host, port)
+        try:
+            connection.request("POST", path, request, headers)
+            response = connection.getresponse()
+            return response.read(), response.status
+        except (httplib.HTTPException, socket.error):
+            _drop_connection(host, port)
+            if attempt:
+                raise
 
 def verify_key(key, blog):
     """Find out whether a given WordPress.com API key is valid.
@@ -42,7 +76,7 @@ def verify_key(key, blog):
         blog: URL of the front page of the site comments will be submitted to.
     Returns True if a valid key, False if invalid.
     """
-    response, status = __post("key=%s&blog=%s" % (key,blog), AKISMET_URL, "/1.1/verify-key", AKISMET_PORT)
+    response, status = __post(urlencode({'key': key, 'blog': blog}), AKISMET_URL, "/1.1/verify-key", AKISMET_PORT)
     
     if response == "valid":
         return True
@@ -68,9 +102,9 @@ def comment_check(key, blog, user_ip, user_agent, **other):
     anything unexpected.
     """
     
-    request = {'blog': blog, 'user_ip': user_ip, 'user_agent': user_agent}
+    request = {'api_key': key, 'blog': blog, 'user_ip': user_ip, 'user_agent': user_agent}
     request.update(other)
-    response, status = __post(urlencode(request), "%s.%s" % (key,AKISMET_URL), "/1.1/comment-check", AKISMET_PORT)
+    response, status = __post(urlencode(request), AKISMET_URL, "/1.1/comment-check", AKISMET_PORT)
     
     if response == "true":
         return True
@@ -84,9 +118,9 @@ def submit_spam(key, blog, user_ip, user_agent, **other):
     Same arguments as comment_check.
     Doesn't return anything.  Throws an AkismetError if the server says anything.
     """
-    request = {'blog': blog, 'user_ip': user_ip, 'user_agent': user_agent}
+    request = {'api_key': key, 'blog': blog, 'user_ip': user_ip, 'user_agent': user_agent}
     request.update(other)
-    response, status = __post(urlencode(request), "%s.%s" % (key,AKISMET_URL), "/1.1/submit-spam", AKISMET_PORT)
+    response, status = __post(urlencode(request), AKISMET_URL, "/1.1/submit-spam", AKISMET_PORT)
     if status != 200 or response != "":
         raise AkismetError(response, status)
 
@@ -95,8 +129,8 @@ def submit_ham(key, blog, user_ip, user_agent, **other):
     Same arguments as comment_check.
     Doesn't return anything.  Throws an AkismetError if the server says anything.
     """
-    request = {'blog': blog, 'user_ip': user_ip, 'user_agent': user_agent}
+    request = {'api_key': key, 'blog': blog, 'user_ip': user_ip, 'user_agent': user_agent}
     request.update(other)
-    response, status = __post(urlencode(request), "%s.%s" % (key,AKISMET_URL), "/1.1/submit-ham", AKISMET_PORT)
+    response, status = __post(urlencode(request), AKISMET_URL, "/1.1/submit-ham", AKISMET_PORT)
     if status != 200 or response != "":
         raise AkismetError(response, status)
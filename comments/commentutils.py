@@ -0,0 +1,165 @@
+import uuid
+from django.core.cache import cache
+from django.db.models.query import prefetch_related_objects
+from django.utils import timezone
+from django.utils.encoding import smart_unicode
+from django.contrib.contenttypes.models import ContentType
+from comments import spamcheck
+from comments.models import CommentFlag
+
+# comment threads and counts are cached per thread version, and the version changes whenever one of the object's
+# comments or comment flags is saved or deleted.  The timeout only bounds how long the cache holds on to threads that
+# are no longer being read.
+THREAD_TIMEOUT = 60 * 60
+THREAD_VERSION_TIMEOUT = 30 * 24 * 60 * 60
+
+# keeps "id IN (...)" lists below the query parameter limits of the DB backends
+ID_BATCH_SIZE = 500
+
+
+def prune_hidden_subtrees(comments, hide_removed=True):
+    """
+    Takes MPTT comments in tree order (tree_id, lft) and returns the visible ones, in the same order.  A comment is
+    hidden if it is not public (or removed, if hide_removed is True), and so are all of its descendants.  Because the
+    comments are in tree order, a hidden comment's descendants are exactly the comments that follow it in the same
+    tree up to its 'rght' value, so this takes a single pass over the comments.
+    """
+    visible = []
+    hidden_tree_id = hidden_rght = None
+    for comment in comments:
+        if comment.tree_id == hidden_tree_id and comment.rght < hidden_rght:
+            continue
+        if not comment.is_public or (hide_removed and comment.is_removed):
+            hidden_tree_id, hidden_rght = comment.tree_id, comment.rght
+            continue
+        visible.append(comment)
+    return visible
+
+
+def load_comment_thread(queryset, hide_removed=True):
+    """
+    Loads the visible comments of a queryset of MPTT comments with one query, plus one query for the flags of the
+    visible comments.  Returns the comments in tree order with their children already cached, so the thread can be
+    walked with get_children() (or the recursetree template tag) without any further queries.
+    """
+    comments = prune_hidden_subtrees(queryset.order_by('tree_id', 'lft'), hide_removed)
+    prefetch_related_objects(comments, ['flags'])
+
+    by_id = {}
+    for comment in comments:
+        comment._cached_children = []
+        by_id[comment.id] = comment
+        parent = by_id.get(comment.parent_id)
+        if parent is not None:
+            parent._cached_children.append(comment)
+    return comments
+
+
+def _object_key(content_type_id, object_pk):
+    return '%s-%s' % (content_type_id, smart_unicode(object_pk))
+
+
+def get_thread_version(content_type_id, object_pk):
+    """
+    Returns the current version of the comment thread of the given object.  Cached threads and counts are keyed on
+    this value.
+    """
+    key = 'comment-thread-version-%s' % _object_key(content_type_id, object_pk)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version, THREAD_VERSION_TIMEOUT)
+    return version
+
+
+def bump_thread_version(content_type_id, object_pk):
+    """
+    Invalidates the cached comment thread and comment count of the given object.
+    """
+    cache.set('comment-thread-version-%s' % _object_key(content_type_id, object_pk), uuid.uuid4().hex,
+              THREAD_VERSION_TIMEOUT)
+
+
+def _thread_keys(content_type_id, object_pk):
+    suffix = '%s-%s' % (_object_key(content_type_id, object_pk), get_thread_version(content_type_id, object_pk))
+    return 'comment-thread-%s' % suffix, 'comment-count-%s' % suffix
+
+
+def get_comment_thread(queryset, content_type_id, object_pk, hide_removed=True):
+    """
+    Returns the visible comments of the given object, as loaded by load_comment_thread.  'queryset' must select the
+    comments of that object, and it is only read when the thread isn't in the cache.
+    """
+    thread_key, count_key = _thread_keys(content_type_id, object_pk)
+    comments = cache.get(thread_key)
+    if comments is None:
+        comments = load_comment_thread(queryset, hide_removed)
+        cache.set_many({thread_key: comments, count_key: len(comments)}, THREAD_TIMEOUT)
+    return comments
+
+
+def get_comment_count(queryset, content_type_id, object_pk, hide_removed=True):
+    """
+    Returns the number of visible comments of the given object.  The count is cached separately from the thread, so
+    pages that list many objects with their comment counts don't have to load (or unpickle) the threads.
+    """
+    _, count_key = _thread_keys(content_type_id, object_pk)
+    count = cache.get(count_key)
+    if count is None:
+        count = len(get_comment_thread(queryset, content_type_id, object_pk, hide_removed))
+    return count
+
+
+def _batches(ids):
+    for i in range(0, len(ids), ID_BATCH_SIZE):
+        yield ids[i:i + ID_BATCH_SIZE]
+
+
+def reclassify_comments(queryset, spam, user, **kwargs):
+    """
+    Marks the given comments as spam, or as not spam (approved by 'user'), with a fixed number of queries per batch of
+    comments rather than a few queries per comment.  Comments on moderated models whose classification changed are
+    reported to Akismet concurrently, see spamcheck.report_verdicts for the keyword arguments.  Returns the number of
+    comments that were marked, together with the ids of the comments whose Akismet reports failed.
+    """
+    # both of these import this module
+    from comments.moderation import moderator
+    from comments.signals import comment_was_flagged
+
+    comments = list(queryset.select_related('site'))
+    if not comments:
+        return 0, []
+    model = queryset.model
+    ids = [comment.id for comment in comments]
+    changed = [comment for comment in comments if comment.is_spam != spam]
+    fields = {'is_spam': True, 'is_public': False} if spam else {'is_spam': False, 'is_public': True, 'is_removed': False}
+    for comment in comments:
+        # the signal receivers get the comments as they are after the update
+        for name, value in fields.items():
+            setattr(comment, name, value)
+    by_id = dict((comment.id, comment) for comment in comments)
+
+    for batch in _batches(ids):
+        model.objects.filter(id__in=batch).update(**fields)
+        if not spam:
+            flags = CommentFlag.objects.filter(comment__in=batch, user=user, flag=CommentFlag.MODERATOR_APPROVAL)
+            approved = set(flags.values_list('comment_id', flat=True))
+            now = timezone.now()
+            CommentFlag.objects.bulk_create([CommentFlag(comment_id=id, user=user, flag=CommentFlag.MODERATOR_APPROVAL,
+                                                         flag_date=now) for id in batch if id not in approved])
+            # bulk_create() doesn't return the new flags, so read them back to send comment_was_flagged, as
+            # perform_approve does (there is no request to pass along)
+            for flag in flags.all():
+                comment_was_flagged.send(sender=model, comment=by_id[flag.comment_id], flag=flag,
+                                         created=flag.comment_id not in approved, request=None)
+
+    # update() and bulk_create() don't send the signals that invalidate the cached threads
+    for content_type_id, object_pk in set((comment.content_type_id, comment.object_pk) for comment in comments):
+        bump_thread_version(content_type_id, object_pk)
+
+    # like the moderator, only report the comments on moderated models
+    moderated = set(content_type_id for content_type_id in set(comment.content_type_id for comment in changed)
+                    if moderator.is_moderated(ContentType.objects.get_for_id(content_type_id).model_class()))
+    items = [(comment.id, comment.site.domain, spamcheck.comment_spam_data(comment)) for comment in changed
+             if comment.content_type_id in moderated]
+    return len(comments), spamcheck.report_verdicts(items, spam, **kwargs)
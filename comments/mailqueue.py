@@ -0,0 +1,158 @@
+"""
+A durable outbox for email notifications.
+
+queue_email saves the email to the QueuedEmail table, which only costs the request a single INSERT, and then wakes
+up the delivery worker.  Deliveries send everything that is waiting over a single SMTP connection.  How they are run
+depends on settings.QUEUED_EMAIL_DELIVERY:
+
+    'background'    a daemon thread in the web process delivers the outbox as soon as something is queued (default)
+    'command'       nothing is delivered in the web process, run the send_queued_email management command instead
+    'immediate'     the outbox is delivered before queue_email returns, which is handy for tests
+
+Emails that fail, including when the SMTP server can't be reached at all, are retried by later deliveries, up to
+MAX_ATTEMPTS times.  The send_queued_email command also picks up anything a web process queued but didn't get to
+deliver, and anything a delivery claimed more than CLAIM_TIMEOUT ago but never finished (because the process died,
+say).  Such an email may have gone out just before the crash, so it can be sent twice, but it is never lost.
+"""
+
+import datetime
+import logging
+import threading
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_connection
+from django.db.models import F, Q
+from django.utils import timezone
+from comments.models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND = 'background'
+COMMAND = 'command'
+IMMEDIATE = 'immediate'
+
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 100
+CLAIM_TIMEOUT = datetime.timedelta(minutes=10)
+
+
+def queue_email(subject, body, recipient_list, thread_key=''):
+    """
+    Adds an email to the outbox, and returns it.  If a thread_key is given and there is only one recipient, the email
+    isn't queued (and None is returned) when that recipient already has an unsent email for the same thread.
+    """
+    if not recipient_list:
+        return None
+    recipients = ','.join(recipient_list)
+
+    if thread_key and len(recipient_list) == 1 and \
+            QueuedEmail.objects.filter(thread_key=thread_key, recipients=recipients, date_sent=None,
+                                       attempts__lt=MAX_ATTEMPTS).exists():
+        return None
+
+    email = QueuedEmail.objects.create(subject=subject, body=body, from_email=settings.DEFAULT_FROM_EMAIL,
+                                       recipients=recipients, thread_key=thread_key)
+    schedule_delivery()
+    return email
+
+
+def schedule_delivery():
+    delivery = getattr(settings, 'QUEUED_EMAIL_DELIVERY', BACKGROUND)
+    if delivery == IMMEDIATE:
+        deliver_queued_email()
+    elif delivery == BACKGROUND:
+        delivery_worker.wake()
+
+
+def _unclaimed(now):
+    """
+    The emails that are waiting to be sent, and aren't being sent by another delivery.
+    """
+    return QueuedEmail.objects.filter(Q(date_claimed=None) | Q(date_claimed__lt=now - CLAIM_TIMEOUT), date_sent=None)
+
+
+def deliver_queued_email(batch_size=BATCH_SIZE):
+    """
+    Sends every email in the outbox over one SMTP connection.  Each email is claimed before it is sent, so concurrent
+    deliveries never send the same email twice.  A claim expires after CLAIM_TIMEOUT, so an email whose delivery
+    crashed before it was marked as sent or failed is picked up again by a later delivery.  Returns the number of
+    emails sent and the number that failed.
+    """
+    sent = failed = 0
+    connection = None
+    after = 0
+    try:
+        while True:
+            batch = list(_unclaimed(timezone.now()).filter(id__gt=after, attempts__lt=MAX_ATTEMPTS)[:batch_size])
+            if not batch:
+                break
+            after = batch[-1].id
+
+            for email in batch:
+                now = timezone.now()
+                if not _unclaimed(now).filter(id=email.id).update(date_claimed=now):
+                    continue   # somebody else got to it first
+
+                try:
+                    if connection is None:
+                        connection = get_connection()
+                        connection.open()
+                    EmailMessage(email.subject, email.body, email.from_email, email.recipient_list(),
+                                 connection=connection).send()
+                except Exception, e:
+                    logger.warning("Failed to send queued email %d: %s", email.id, e)
+                    QueuedEmail.objects.filter(id=email.id).update(date_claimed=None, attempts=F('attempts') + 1,
+                                                                    last_error=unicode(e))
+                    failed += 1
+                    # the connection may be broken, start a new one for the next email
+                    if connection is not None:
+                        _close(connection)
+                        connection = None
+                else:
+                    QueuedEmail.objects.filter(id=email.id).update(date_sent=timezone.now())
+                    sent += 1
+    finally:
+        if connection is not None:
+            _close(connection)
+    return sent, failed
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception, e:
+        logger.warning("Failed to close the email connection: %s", e)
+
+
+class DeliveryWorker(object):
+    """
+    A daemon thread that delivers the outbox whenever it is woken up.  Wake-ups that arrive while a delivery is
+    running are coalesced into one more delivery.
+    """
+
+    def __init__(self):
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def wake(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='queued-email-delivery')
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                deliver_queued_email()
+            except Exception:
+                logger.exception("Queued email delivery failed")
+            finally:
+                close_connection()
+
+
+delivery_worker = DeliveryWorker()
@@ -0,0 +1,78 @@
+import sys
+from optparse import make_option
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+import comments
+from comments.commentutils import reclassify_comments
+from comments.spamcheck import DEFAULT_BATCH_WORKERS, DEFAULT_ATTEMPTS, DEFAULT_BACKOFF
+from reviews.models import Review
+from reviews.reviewutils import reclassify_reviews
+
+
+def parse_ids(value):
+    """
+    Parses a list of ids such as "3,7,10-20".
+    """
+    ids = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if '-' in part:
+                first, last = part.split('-')
+                ids.extend(range(int(first), int(last) + 1))
+            else:
+                ids.append(int(part))
+        except ValueError:
+            raise CommandError("Invalid id or id range: %s" % part)
+    return ids
+
+
+class Command(BaseCommand):
+    args = "spam|ham"
+    help = "Marks comments and reviews as spam (or ham) in bulk, and reports them to Akismet."
+    option_list = BaseCommand.option_list + (
+        make_option('--comments', dest='comments', default='',
+                    help="Comment ids, as a comma separated list of ids and id ranges, e.g. 3,7,10-20"),
+        make_option('--reviews', dest='reviews', default='', help="Review ids, in the same format as --comments."),
+        make_option('--user', dest='user', default=None,
+                    help="The username of the moderator that the approval and removal flags are recorded for."),
+        make_option('--workers', dest='workers', type='int', default=DEFAULT_BATCH_WORKERS,
+                    help="The maximum number of concurrent requests to Akismet."),
+        make_option('--attempts', dest='attempts', type='int', default=DEFAULT_ATTEMPTS,
+                    help="The number of times to try each Akismet report."),
+        make_option('--backoff', dest='backoff', type='float', default=DEFAULT_BACKOFF,
+                    help="Seconds to wait before the first retry, doubled for every retry after that."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1 or args[0] not in ('spam', 'ham'):
+            raise CommandError("Usage: reclassify_spam %s" % self.args)
+        spam = args[0] == 'spam'
+
+        if not options['user']:
+            raise CommandError("--user is required")
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError("No such user: %s" % options['user'])
+
+        kwargs = {'workers': options['workers'], 'attempts': options['attempts'], 'backoff': options['backoff']}
+        jobs = [
+            ('comments', comments.get_model(), parse_ids(options['comments']), reclassify_comments),
+            ('reviews', Review, parse_ids(options['reviews']), reclassify_reviews),
+        ]
+        for name, model, ids, reclassify in jobs:
+            if not ids:
+                continue
+            count, failed = reclassify(model.objects.filter(id__in=ids), spam, user, progress=self._progress(name),
+                                       **kwargs)
+            sys.stderr.write("\nMarked %d %s as %s.\n" % (count, name, args[0]))
+            if failed:
+                sys.stderr.write("Akismet reports failed for %s %s\n" % (name, ','.join([str(id) for id in failed])))
+
+    def _progress(self, name):
+        def progress(done, total):
+            sys.stderr.write("\rReported %d of %d %s to Akismet" % (done, total, name))
+        return progress
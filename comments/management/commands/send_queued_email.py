@@ -0,0 +1,28 @@
+import datetime
+import sys
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from comments.mailqueue import deliver_queued_email, BATCH_SIZE
+from comments.models import QueuedEmail
+
+
+class Command(BaseCommand):
+    help = "Sends the comment notification emails that are waiting in the outbox."
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', dest='batch_size', type='int', default=BATCH_SIZE,
+                    help="The number of queued emails to read from the DB at a time."),
+        make_option('--purge-days', dest='purge_days', type='int', default=None,
+                    help="Also delete emails that were sent more than this many days ago."),
+    )
+
+    def handle(self, *args, **options):
+        sent, failed = deliver_queued_email(options['batch_size'])
+        sys.stderr.write("Sent %d queued emails, %d failed.\n" % (sent, failed))
+
+        if options['purge_days'] is not None:
+            cutoff = timezone.now() - datetime.timedelta(days=options['purge_days'])
+            old = QueuedEmail.objects.filter(date_sent__lt=cutoff)
+            count = old.count()
+            old.delete()
+            sys.stderr.write("Deleted %d sent emails.\n" % count)
@@ -239,3 +239,34 @@ class MPTTComment(MPTTModel, Comment):
     class Meta:
         ordering=['tree_id', 'lft']
 
+
+
+class QueuedEmail(models.Model):
+    """
+    An email notification waiting in the outbox.  Comment moderators queue their notifications here instead of
+    sending them during the comment POST, and comments.mailqueue delivers them.  Sent emails are kept, with the time
+    they were sent, until they are cleaned up.
+    """
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    recipients = models.TextField(help_text='Comma separated email addresses.')
+    thread_key = models.CharField(max_length=100, blank=True, db_index=True,
+                                  help_text='Identifies the comment thread of a reply notification.  A recipient is '
+                                            'only sent one unsent notification per thread.')
+    date_queued = models.DateTimeField(auto_now_add=True)
+    date_sent = models.DateTimeField(null=True, blank=True, db_index=True)
+    date_claimed = models.DateTimeField(null=True, blank=True,
+                                        help_text='When a delivery last started sending the email.  A claim that is '
+                                                  'older than mailqueue.CLAIM_TIMEOUT has expired.')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __unicode__(self):
+        return u"%s to %s" % (self.subject, self.recipients)
+
+    def recipient_list(self):
+        return [recipient for recipient in self.recipients.split(',') if recipient]
@@ -57,14 +57,13 @@ class.
 import datetime
 
 from django.conf import settings
-from django.core.mail import send_mail
 from comments import signals
 from django.db.models.base import ModelBase
 from django.template import Context, loader
 import comments
 from django.contrib.sites.models import Site
 from django.utils import timezone
-from akismet import AkismetError, verify_key, comment_check, submit_ham, submit_spam
+from comments import spamcheck, mailqueue
 
 
 class AlreadyModerated(Exception):
@@ -228,7 +227,11 @@ class CommentModerator(object):
             moderate_after_date = getattr(content_object, self.auto_moderate_field)
             if moderate_after_date is not None and self._get_delta(timezone.now(), moderate_after_date).days >= self.moderate_after:
                 return True
-        if self.check_spam(comment, content_object, request):
+        spam = self.check_spam(comment, content_object, request)
+        if spam is None:
+            # the spam check will finish after the comment is saved, hold the comment until then
+            return True
+        if spam:
             comment.is_spam = True
             return True
         return False
@@ -247,7 +250,11 @@ class CommentModerator(object):
         self._send_email(comment, content_object, 'comments/email_new_comment.html', subject, recipient_list)
         return recipient_list
 
-    def _send_email(self, comment, content_object, template, subject, recipient_list):
+    def _send_email(self, comment, content_object, template, subject, recipient_list, thread_key=''):
+        """
+        Queues the email for delivery outside of the request, see comments.mailqueue.  Pass the comment's
+        thread_key for reply notifications, so that a busy thread doesn't send the same person a pile of them.
+        """
         if not recipient_list:
             return
         t = loader.get_template(template)
@@ -255,11 +262,21 @@ class CommentModerator(object):
                       'content_object': content_object,
                       'recipients': recipient_list})
         message = t.render(c)
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, recipient_list, fail_silently=True)
+        mailqueue.queue_email(subject, message, recipient_list, thread_key)
 
     def check_spam(self, comment, content_object, request):
+        """
+        Returns True if the comment is spam and False if it's ham.  Returns None if the verdict isn't known yet, in
+        which case the comment is held (saved as non-public) until check_held_comment is called.
+        """
         return False
 
+    def check_held_comment(self, comment):
+        """
+        Called after a comment that check_spam returned None for has been saved.
+        """
+        pass
+
     def marked_as_spam(self, comment, request):
         pass
 
@@ -269,6 +286,9 @@ class CommentModerator(object):
 
 class MPTTCommentModerator(CommentModerator):
 
+    def _thread_key(self, comment):
+        return 'comment-thread-%s-%s-%s' % (comment.content_type_id, comment.object_pk, comment.tree_id)
+
     def email(self, comment, content_object, request):
         recipient_list = super(MPTTCommentModerator, self).email(comment, content_object, request)
 
@@ -289,7 +309,8 @@ class MPTTCommentModerator(CommentModerator):
 
         subject = '[%s] %s replied to your comment on "%s"' % (Site.objects.get_current().name,
                                                                comment.user_name, content_object)
-        self._send_email(comment, content_object, 'comments/email_new_comment.html', subject, recipient_list)
+        self._send_email(comment, content_object, 'comments/email_new_comment.html', subject, recipient_list,
+                         self._thread_key(comment))
         return recipient_list
 
     def _email_comment_ancestors(self, comment, content_object, request, already_notified):
@@ -308,81 +329,73 @@ class MPTTCommentModerator(CommentModerator):
 
         for recipient in recipient_list:
             # we don't want the comment authors to see the email addresses of the other comment authors
-            self._send_email(comment, content_object, 'comments/email_new_comment.html', subject, [recipient])
+            self._send_email(comment, content_object, 'comments/email_new_comment.html', subject, [recipient],
+                             self._thread_key(comment))
         return recipient_list
 
 
 class AkismetModeratorMixin:
     """ Checks for comment spam using the Akismet API.
 
-    Expects there to be an AKISMET_KEY variable in settings.py.
+    Expects there to be an AKISMET_KEY variable in settings.py.  If AKISMET_ASYNC is True, new comments are held
+    while they are checked on a background thread, see comments.spamcheck.
     """
 
     def check_spam(self, comment, content_object, request):
         """
-        Returns True if the comment is spam and False if it's ham.
+        Returns True if the comment is spam and False if it's ham, or None if the check will be run in the background.
         """
-        key = self._get_key()
-
-        if not key:
-            # TODO: log a warning
+        if not spamcheck.get_key():
             return False
 
-        try:
-            if verify_key(key, comment.site.domain):
-                data = self._get_data_from_comment(comment)
-                data.update({
-                    # not stored on the comment model, have to get them from the request
-                    'referrer': request.META.get('HTTP_REFERER', ''),
-                    'user_agent': request.META.get('HTTP_USER_AGENT', '')
-                })
-                return comment_check(key, comment.site.domain, **data)
-        except AkismetError, e:
-            # TODO: log a warning with the exception
-            print e.response, e.statuscode
-        return False
+        data = self._get_data_from_comment(comment)
+        data.update({
+            # not stored on the comment model, have to get them from the request
+            'referrer': request.META.get('HTTP_REFERER', ''),
+            'user_agent': request.META.get('HTTP_USER_AGENT', '')
+        })
 
-    def marked_as_spam(self, comment, request):
-        key = self._get_key()
-        if not key:
-            return
+        if spamcheck.is_async():
+            comment.held_spam_data = data
+            return None
+        return spamcheck.is_spam(comment.site.domain, data)
 
-        try:
-            if verify_key(key, comment.site.domain):
-                data = self._get_data_from_comment(comment)
-                submit_spam(key, comment.site.domain, **data)
-        except AkismetError, e:
-            print e.response, e.statuscode
+    def check_held_comment(self, comment):
+        spamcheck.spam_check_queue.submit(self._check_held_comment, comment.id, comment.site.domain,
+                                          comment.held_spam_data)
 
-    def marked_not_spam(self, comment, request):
-        key = self._get_key()
-        if not key:
-            return
+    def _check_held_comment(self, comment_id, domain, data):
+        self.release_held_comment(comment_id, spamcheck.is_spam(domain, data))
 
+    def release_held_comment(self, comment_id, spam):
+        """
+        Flags a held comment as spam, or publishes it and sends the new comment notifications that were skipped while
+        it was held.  Does nothing if a moderator has already dealt with the comment.
+        """
         try:
-            if verify_key(key, comment.site.domain):
-                data = self._get_data_from_comment(comment)
-                submit_ham(key, comment.site.domain, **data)
-        except AkismetError, e:
-            print e.response, e.statuscode
+            comment = comments.get_model().objects.get(id=comment_id)
+        except comments.get_model().DoesNotExist:
+            return
 
-    def _get_key(self):
-        return getattr(settings, 'AKISMET_KEY', None)
+        if comment.is_public or comment.is_spam or comment.is_removed:
+            return
 
-    def _get_data_from_comment(self, comment):
-        data = {
-            'comment_type': 'comment',
-            'comment_author': comment.user_name.encode('utf-8'),
-            'comment_author_email': unicode(comment.user_email or ''),
-            'comment_content': comment.comment.encode('utf-8'),
-            'user_ip': unicode(comment.ip_address or ''),
-            'user_agent': '',
-        }
+        if spam:
+            comment.is_spam = True
+            comment.save()
+        else:
+            comment.is_public = True
+            comment.save()
+            self.email(comment, comment.content_object, None)
 
-        if comment.user_url:
-            data.update('comment_author_url', comment.user_url.encode('utf-8'))
+    def marked_as_spam(self, comment, request):
+        spamcheck.report_spam(comment.site.domain, self._get_data_from_comment(comment))
+
+    def marked_not_spam(self, comment, request):
+        spamcheck.report_ham(comment.site.domain, self._get_data_from_comment(comment))
 
-        return data
+    def _get_data_from_comment(self, comment):
+        return spamcheck.comment_spam_data(comment)
 
 class Moderator(object):
     """
@@ -462,6 +475,12 @@ class Moderator(object):
                 raise NotModerated("The model '%s' is not currently being moderated" % model._meta.module_name)
             del self._registry[model]
 
+    def is_moderated(self, model):
+        """
+        Returns True if the comments on the given model are moderated.
+        """
+        return model in self._registry
+
     def pre_save_moderation(self, sender, comment, request, **kwargs):
         """
         Apply any necessary pre-save moderation steps to new
@@ -490,6 +509,10 @@ class Moderator(object):
         model = comment.content_type.model_class()
         if model not in self._registry:
             return
+        if hasattr(comment, 'held_spam_data'):
+            # notifications are sent if and when the spam check publishes the comment
+            self._registry[model].check_held_comment(comment)
+            return
         self._registry[model].email(comment, comment.content_object, request)
 
     def marked_as_spam_moderation(self, sender, comment, request, **kwargs):
@@ -1,7 +1,10 @@
 """
 Signals relating to comments.
 """
-from django.dispatch import Signal
+from django.dispatch import Signal, receiver
+from django.db.models.signals import post_save, post_delete
+from comments.models import MPTTComment, CommentFlag
+from comments.commentutils import bump_thread_version
 
 # Sent just before a comment will be posted (after it's been approved and
 # moderated; this can be used to modify the comment (in place) with posting
@@ -30,3 +33,18 @@ comment_was_marked_as_spam = Signal(providing_args=["comment", "request"])
 # not-spam by an administrator.  Some comment moderators may be able to learn
 # from this mistake, which is why we send the signal.
 comment_was_marked_not_spam = Signal(providing_args=["comment", "request"])
+
+
+@receiver(post_save, sender=MPTTComment)
+@receiver(post_delete, sender=MPTTComment)
+def on_comment_changed(sender, instance, **kwargs):
+    # posting, approving, removing and marking a comment as spam all save the comment
+    bump_thread_version(instance.content_type_id, instance.object_pk)
+
+
+@receiver(post_save, sender=CommentFlag)
+@receiver(post_delete, sender=CommentFlag)
+def on_comment_flag_changed(sender, instance, **kwargs):
+    # cached threads include each comment's flags
+    comment = instance.comment
+    bump_thread_version(comment.content_type_id, comment.object_pk)
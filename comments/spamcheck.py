@@ -0,0 +1,230 @@
+"""
+Akismet spam checking for comments and other user contributed content.
+
+Key verification results are cached, so a spam check is a single request to Akismet, and requests go out over a
+pooled keep-alive connection (see comments.akismet).  Comment checks can also be run off the request thread, on a
+small pool of worker threads, when settings.AKISMET_ASYNC is True.  In that case the comment moderator holds the new
+comment as non-public and publishes or flags it once the verdict arrives.
+"""
+
+import hashlib
+import httplib
+import logging
+import socket
+import threading
+import time
+import Queue
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_connection
+from comments.akismet import AkismetError, verify_key, comment_check, submit_spam, submit_ham, close_connections
+
+logger = logging.getLogger(__name__)
+
+# a key stays valid (or invalid) for a long time, so there is no need to re-verify it with every spam check
+KEY_VERIFICATION_TIMEOUT = 24 * 60 * 60
+
+DEFAULT_WORKERS = 2
+
+# batch re-classification: the number of concurrent requests to Akismet, and how often to try each one
+DEFAULT_BATCH_WORKERS = 4
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BACKOFF = 1.0
+
+
+def get_key():
+    return getattr(settings, 'AKISMET_KEY', None)
+
+
+def is_async():
+    return bool(getattr(settings, 'AKISMET_ASYNC', False)) and bool(get_key())
+
+
+def comment_spam_data(comment):
+    """
+    Returns the Akismet parameters for the given comment that are stored on the comment itself.
+    """
+    data = {
+        'comment_type': 'comment',
+        'comment_author': comment.user_name.encode('utf-8'),
+        'comment_author_email': unicode(comment.user_email or ''),
+        'comment_content': comment.comment.encode('utf-8'),
+        'user_ip': unicode(comment.ip_address or ''),
+        'user_agent': '',
+    }
+
+    if comment.user_url:
+        data['comment_author_url'] = comment.user_url.encode('utf-8')
+
+    return data
+
+
+def is_key_valid(key, blog):
+    """
+    Returns True if the given Akismet key is valid for the given site.  The answer is cached, errors are not.
+    """
+    cache_key = 'akismet-key-%s' % hashlib.md5('%s %s' % (key, blog)).hexdigest()
+    valid = cache.get(cache_key)
+    if valid is None:
+        valid = verify_key(key, blog)
+        cache.set(cache_key, valid, KEY_VERIFICATION_TIMEOUT)
+    return valid
+
+
+def is_spam(blog, data):
+    """
+    Returns True if Akismet thinks that the content described by 'data' is spam.  Returns False if the content is
+    ham, and also if there is no (valid) key or Akismet can't be reached: content is never rejected just because
+    the spam check isn't working.
+    """
+    key = get_key()
+    if not key:
+        return False
+
+    try:
+        if is_key_valid(key, blog):
+            return comment_check(key, blog, **data)
+        logger.warning("The AKISMET_KEY setting is not a valid key for %s", blog)
+    except AkismetError, e:
+        logger.warning("Akismet spam check failed: %s %s", e.statuscode, e.response)
+    except (httplib.HTTPException, socket.error), e:
+        logger.warning("Akismet spam check failed: %s", e)
+    return False
+
+
+def report_spam(blog, data):
+    """
+    Tells Akismet about spam that it missed.
+    """
+    _report(submit_spam, blog, data)
+
+
+def report_ham(blog, data):
+    """
+    Tells Akismet about content that it wrongly marked as spam.
+    """
+    _report(submit_ham, blog, data)
+
+
+def _report(submit, blog, data):
+    key = get_key()
+    if not key:
+        return
+
+    try:
+        if is_key_valid(key, blog):
+            submit(key, blog, **data)
+    except AkismetError, e:
+        logger.warning("Akismet %s failed: %s %s", submit.__name__, e.statuscode, e.response)
+    except (httplib.HTTPException, socket.error), e:
+        logger.warning("Akismet %s failed: %s", submit.__name__, e)
+
+
+def report_verdicts(items, spam, workers=DEFAULT_BATCH_WORKERS, attempts=DEFAULT_ATTEMPTS, backoff=DEFAULT_BACKOFF,
+                    progress=None):
+    """
+    Reports a batch of spam (or ham, if spam is False) verdicts to Akismet, with at most 'workers' requests in
+    flight at a time.  'items' is a list of (id, blog, data) tuples.  A report that fails is retried up to 'attempts'
+    times in all, waiting backoff, 2 * backoff, 4 * backoff, ... seconds between tries.  If given, progress(done, total)
+    is called after each item.  Returns the list of ids whose reports failed.
+    """
+    key = get_key()
+    if not key or not items:
+        return []
+    submit = submit_spam if spam else submit_ham
+
+    failed = []
+    state = {'done': 0}
+    lock = threading.Lock()
+    queue = Queue.Queue()
+    for item in items:
+        queue.put(item)
+
+    def work():
+        while True:
+            try:
+                id, blog, data = queue.get_nowait()
+            except Queue.Empty:
+                close_connections()
+                return
+            ok = _submit_with_retries(submit, key, blog, data, attempts, backoff)
+            with lock:
+                if not ok:
+                    failed.append(id)
+                state['done'] += 1
+                if progress:
+                    progress(state['done'], len(items))
+
+    threads = [threading.Thread(target=work, name='spam-report-%d' % i) for i in range(min(workers, len(items)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return failed
+
+
+def _submit_with_retries(submit, key, blog, data, attempts, backoff):
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            if not is_key_valid(key, blog):
+                logger.warning("The AKISMET_KEY setting is not a valid key for %s", blog)
+                return False
+            submit(key, blog, **data)
+            return True
+        except AkismetError, e:
+            logger.warning("Akismet %s failed (attempt %d): %s %s", submit.__name__, attempt + 1, e.statuscode,
+                           e.response)
+        except (httplib.HTTPException, socket.error), e:
+            logger.warning("Akismet %s failed (attempt %d): %s", submit.__name__, attempt + 1, e)
+    return False
+
+
+class SpamCheckQueue(object):
+    """
+    Runs spam checks on a small pool of daemon worker threads, so that the request that created the content doesn't
+    wait on Akismet.  The worker threads are started with the first submitted check.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        self._queue = Queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args):
+        """
+        Calls function(*args) on one of the worker threads.
+        """
+        self._start()
+        self._queue.put((function, args))
+
+    def join(self):
+        """
+        Blocks until every submitted check has been run.
+        """
+        self._queue.join()
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name='spam-check-%d' % len(self._threads))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            function, args = self._queue.get()
+            try:
+                function(*args)
+            except Exception:
+                logger.exception("Spam check %s%r failed", function.__name__, args)
+            finally:
+                # the worker threads outlive any request, so don't keep their DB connections open between checks
+                close_connection()
+                self._queue.task_done()
+
+
+spam_check_queue = SpamCheckQueue()
@@ -4,6 +4,7 @@ from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.utils.encoding import smart_unicode
 import comments
+from comments.commentutils import get_comment_thread, get_comment_count
 
 register = template.Library()
 
@@ -64,10 +65,13 @@ class BaseCommentNode(template.Node):
         self.comment = comment
 
     def render(self, context):
-        qs = self.get_query_set(context)
-        context[self.as_varname] = self.get_context_value_from_queryset(context, qs)
+        context[self.as_varname] = self.get_context_value(context)
         return ''
 
+    def is_threaded(self):
+        field_names = [f.name for f in self.comment_model._meta.fields]
+        return 'lft' in field_names and 'rght' in field_names
+
     def get_query_set(self, context):
         ctype, object_pk = self.get_target_ctype_pk(context)
         if not object_pk:
@@ -79,18 +83,18 @@ class BaseCommentNode(template.Node):
             site__pk     = settings.SITE_ID,
         )
 
+        if self.is_threaded():
+            # mptt comments - hiding non-public comments also hides their descendants, which is done by
+            # get_comment_list rather than in SQL
+            return qs
+
         # The is_public and is_removed fields are implementation details of the
         # built-in comment model's spam filtering system, so they might not
         # be present on a custom comment model subclass. If they exist, we
         # should filter on them.
         field_names = [f.name for f in self.comment_model._meta.fields]
 
-        if 'lft' in field_names and 'rght' in field_names:
-            # mptt comments - remove non-public comments as well as their descendants
-            private_comments = qs.filter(is_public=False)
-            for pc in private_comments:
-                qs = qs.exclude(tree_id=pc.tree_id, lft__gte=pc.lft, rght__lte=pc.rght)
-        elif 'is_public' in field_names:
+        if 'is_public' in field_names:
             qs = qs.filter(is_public=True)
 
         if getattr(settings, 'COMMENTS_HIDE_REMOVED', True) and 'is_removed' in field_names:
@@ -100,6 +104,19 @@ class BaseCommentNode(template.Node):
 
         return qs
 
+    def get_comment_list(self, context):
+        """
+        Returns the list of visible comments.  Threaded comments are returned in tree order with their children
+        and flags already loaded.
+        """
+        if self.is_threaded():
+            ctype, object_pk = self.get_target_ctype_pk(context)
+            if not object_pk:
+                return []
+            return get_comment_thread(self.get_query_set(context), ctype.id, object_pk,
+                                      getattr(settings, 'COMMENTS_HIDE_REMOVED', True))
+        return list(self.get_query_set(context))
+
     def get_target_ctype_pk(self, context):
         if self.object_expr:
             try:
@@ -110,19 +127,26 @@ class BaseCommentNode(template.Node):
         else:
             return self.ctype, self.object_pk_expr.resolve(context, ignore_failures=True)
 
-    def get_context_value_from_queryset(self, context, qs):
+    def get_context_value(self, context):
         """Subclasses should override this."""
         raise NotImplementedError
 
 class CommentListNode(BaseCommentNode):
     """Insert a list of comments into the context."""
-    def get_context_value_from_queryset(self, context, qs):
-        return list(qs)
+    def get_context_value(self, context):
+        return self.get_comment_list(context)
 
 class CommentCountNode(BaseCommentNode):
     """Insert a count of comments into the context."""
-    def get_context_value_from_queryset(self, context, qs):
-        return qs.count()
+    def get_context_value(self, context):
+        if self.is_threaded():
+            # the visible comments of a thread can't be counted in SQL without hiding private subtrees in SQL
+            ctype, object_pk = self.get_target_ctype_pk(context)
+            if not object_pk:
+                return 0
+            return get_comment_count(self.get_query_set(context), ctype.id, object_pk,
+                                     getattr(settings, 'COMMENTS_HIDE_REMOVED', True))
+        return self.get_query_set(context).count()
 
 class CommentFormNode(BaseCommentNode):
     """Insert a form for the comment model into the context."""
@@ -214,10 +238,9 @@ class RenderCommentListNode(CommentListNode):
                 "comments/%s/list.html" % ctype.app_label,
                 "comments/list.html"
             ]
-            qs = self.get_query_set(context)
             context.push()
             liststr = render_to_string(template_search_list, {
-                "comment_list" : self.get_context_value_from_queryset(context, qs)
+                "comment_list" : self.get_comment_list(context)
             }, context)
             context.pop()
             return liststr
@@ -5,7 +5,29 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+import datetime
+import threading
+import urlparse
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+from mock import patch
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sites.models import Site
+from django.contrib.auth.models import User
+from django.utils import timezone
+from comments.models import MPTTComment
+from django.core.cache import cache
+from comments.models import CommentFlag
+from comments.commentutils import load_comment_thread, get_comment_thread, get_comment_count, reclassify_comments
+import comments.signals
+from comments import spamcheck, akismet, mailqueue
+from comments.moderation import CommentModerator, moderator as comment_moderator
+from comments.signals import comment_was_flagged
+from comments.models import QueuedEmail
+from django.core import mail
+from django.core.mail.backends import locmem
 
 
 class SimpleTest(TestCase):
@@ -14,3 +36,289 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class LoadCommentThreadTest(TestCase):
+
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.ct = ContentType.objects.get_for_model(self.site)
+
+    def comment(self, name, parent=None, is_public=True):
+        return MPTTComment.objects.create(content_type=self.ct, object_pk=unicode(self.site.pk), site=self.site,
+                                          user_name=name, comment=name, parent=parent, is_public=is_public,
+                                          submit_date=timezone.now())
+
+    def test_private_subtrees_are_hidden(self):
+        a = self.comment('a')
+        b = self.comment('b', parent=a, is_public=False)
+        self.comment('c', parent=b)
+        d = self.comment('d', parent=a)
+        e = self.comment('e', is_public=False)
+        self.comment('f', parent=e)
+        g = self.comment('g')
+
+        with self.assertNumQueries(2):
+            comments = load_comment_thread(MPTTComment.objects.filter(content_type=self.ct))
+            self.assertEqual([comment.user_name for comment in comments], ['a', 'd', 'g'])
+            self.assertEqual(list(comments[0].get_children()), [d])
+            self.assertEqual(list(comments[1].get_children()), [])
+            self.assertFalse(comments[2].is_flagged_for_removal())
+        self.assertEqual(comments[2], g)
+
+    def test_cached_thread(self):
+        cache.clear()
+        a = self.comment('a')
+        self.comment('b', parent=a, is_public=False)
+        queryset = MPTTComment.objects.filter(content_type=self.ct)
+
+        self.assertEqual(get_comment_count(queryset, self.ct.id, self.site.pk), 1)
+        with self.assertNumQueries(0):
+            comments = get_comment_thread(queryset, self.ct.id, self.site.pk)
+            self.assertEqual(comments, [a])
+            self.assertEqual(list(comments[0].get_children()), [])
+            self.assertFalse(comments[0].is_approved())
+
+        # new comments and flags show up right away
+        self.comment('c', parent=a)
+        self.assertEqual(get_comment_count(queryset, self.ct.id, self.site.pk), 2)
+        user = User.objects.create_user('moderator', 'moderator@example.com', 'password')
+        CommentFlag.objects.create(user=user, comment=a, flag=CommentFlag.MODERATOR_APPROVAL)
+        self.assertTrue(get_comment_thread(queryset, self.ct.id, self.site.pk)[0].is_approved())
+
+
+class FakeAkismetHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def do_POST(self):
+        params = urlparse.parse_qs(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append((self.path, params))
+        if self.path == '/1.1/verify-key':
+            body = 'valid'
+        elif self.path == '/1.1/comment-check':
+            body = 'true' if 'viagra' in params['comment_content'][0] else 'false'
+        else:
+            body = ''
+        if self.server.failures and self.path != '/1.1/verify-key':
+            self.server.failures -= 1
+            body = 'try again later'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeAkismetServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), FakeAkismetHandler)
+        self.connections = 0
+        self.requests = []
+        self.failures = 0
+
+    def handle_error(self, request, client_address):
+        # pooled client connections are dropped when the test process exits
+        pass
+
+
+@override_settings(AKISMET_KEY='fakekey')
+class SpamCheckTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.server = FakeAkismetServer()
+        threading.Thread(target=self.server.serve_forever).start()
+        self.patches = [patch('comments.akismet.AKISMET_URL', '127.0.0.1'),
+                        patch('comments.akismet.AKISMET_PORT', self.server.server_address[1])]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        akismet._drop_connection('127.0.0.1', self.server.server_address[1])
+        self.server.shutdown()
+        self.server.server_close()
+
+    def data(self, content):
+        return {'user_ip': '127.0.0.1', 'user_agent': 'Mozilla/5.0', 'comment_content': content}
+
+    def test_key_verified_once_over_one_connection(self):
+        self.assertFalse(spamcheck.is_spam('example.com', self.data('hello')))
+        self.assertTrue(spamcheck.is_spam('example.com', self.data('cheap viagra')))
+        spamcheck.report_ham('example.com', self.data('cheap viagra'))
+
+        self.assertEqual([path for path, _ in self.server.requests],
+                         ['/1.1/verify-key', '/1.1/comment-check', '/1.1/comment-check', '/1.1/submit-ham'])
+        self.assertEqual(self.server.requests[1][1]['api_key'], ['fakekey'])
+        self.assertEqual(self.server.connections, 1)
+
+    def test_unreachable_server_is_not_spam(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with patch('comments.akismet.AKISMET_PORT', 1):
+            self.assertFalse(spamcheck.is_spam('example.com', self.data('cheap viagra')))
+
+    def test_unreachable_server_reports_are_dropped(self):
+        # the key is verified (and cached) before Akismet goes away
+        self.assertFalse(spamcheck.is_spam('example.com', self.data('hello')))
+        akismet._drop_connection('127.0.0.1', self.server.server_address[1])
+        self.server.shutdown()
+        self.server.server_close()
+        spamcheck.report_spam('example.com', self.data('cheap viagra'))
+        spamcheck.report_ham('example.com', self.data('hello'))
+
+    def test_queue(self):
+        queue = spamcheck.SpamCheckQueue(workers=2)
+        verdicts = {}
+
+        def check(content):
+            verdicts[content] = spamcheck.is_spam('example.com', self.data(content))
+            akismet._drop_connection('127.0.0.1', self.server.server_address[1])
+
+        for content in ['hello', 'cheap viagra', 'nice post']:
+            queue.submit(check, content)
+        queue.join()
+        self.assertEqual(verdicts, {'hello': False, 'cheap viagra': True, 'nice post': False})
+
+    def test_reclassify_comments(self):
+        site = Site.objects.get_current()
+        ct = ContentType.objects.get_for_model(site)
+        moderator = User.objects.create_user('moderator', 'moderator@example.com', 'password')
+        ham, spam = [MPTTComment.objects.create(content_type=ct, object_pk=unicode(site.pk), site=site,
+                                                user_name=name, comment=name, is_spam=name == 'spam',
+                                                is_public=name != 'spam', submit_date=timezone.now())
+                     for name in ('ham', 'spam')]
+        progress = []
+
+        # comments on models that aren't moderated are marked, but not reported
+        self.assertEqual((2, []), reclassify_comments(MPTTComment.objects.all(), True, moderator))
+        self.assertEqual([], [path for path, params in self.server.requests if path == '/1.1/submit-spam'])
+        MPTTComment.objects.filter(id=ham.id).update(is_spam=False, is_public=True)
+
+        comment_moderator.register(Site, CommentModerator)
+        self.addCleanup(comment_moderator.unregister, Site)
+
+        # the first report fails and is retried
+        self.server.failures = 1
+        count, failed = reclassify_comments(MPTTComment.objects.all(), True, moderator, backoff=0,
+                                            progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual((count, failed), (2, []))
+        self.assertEqual(MPTTComment.objects.filter(is_spam=True, is_public=False).count(), 2)
+        # only the comment that changed is reported to Akismet
+        self.assertEqual([params['comment_content'] for path, params in self.server.requests
+                          if path == '/1.1/submit-spam'], [['ham'], ['ham']])
+        self.assertEqual(progress, [(1, 1)])
+
+        self.server.failures = 10
+        flagged = []
+        receiver = lambda sender, comment, flag, created, **kwargs: flagged.append((comment.id, flag.flag, created))
+        comment_was_flagged.connect(receiver)
+        self.addCleanup(comment_was_flagged.disconnect, receiver)
+        count, failed = reclassify_comments(MPTTComment.objects.all(), False, moderator, attempts=2, backoff=0)
+        self.assertEqual(count, 2)
+        self.assertEqual(sorted(failed), sorted([ham.id, spam.id]))
+        self.assertEqual(MPTTComment.objects.filter(is_spam=False, is_public=True).count(), 2)
+        self.assertEqual(CommentFlag.objects.filter(user=moderator, flag=CommentFlag.MODERATOR_APPROVAL).count(), 2)
+        self.assertEqual(sorted(flagged), sorted([(ham.id, CommentFlag.MODERATOR_APPROVAL, True),
+                                                  (spam.id, CommentFlag.MODERATOR_APPROVAL, True)]))
+
+
+class CountingBackend(locmem.EmailBackend):
+    connections = 0
+    fail = False
+    fail_open = False
+
+    def open(self):
+        if CountingBackend.fail_open:
+            raise IOError("connection refused")
+        CountingBackend.connections += 1
+
+    def send_messages(self, messages):
+        if CountingBackend.fail:
+            raise IOError("connection refused")
+        return super(CountingBackend, self).send_messages(messages)
+
+
+@override_settings(QUEUED_EMAIL_DELIVERY='command',
+                   EMAIL_BACKEND='comments.tests.CountingBackend')
+class MailQueueTest(TestCase):
+
+    def setUp(self):
+        CountingBackend.connections = 0
+        CountingBackend.fail = False
+        CountingBackend.fail_open = False
+
+    def test_thread_notifications_are_deduped(self):
+        mailqueue.queue_email("New reply", "first", ["a@example.com"], 'thread-1')
+        mailqueue.queue_email("New reply", "second", ["a@example.com"], 'thread-1')
+        mailqueue.queue_email("New reply", "other thread", ["a@example.com"], 'thread-2')
+        mailqueue.queue_email("New reply", "other person", ["b@example.com"], 'thread-1')
+        mailqueue.queue_email("New comment", "managers", ["a@example.com"])
+        mailqueue.queue_email("New comment", "managers", ["a@example.com"])
+        self.assertEqual(5, QueuedEmail.objects.count())
+        self.assertEqual(0, len(mail.outbox))
+
+        # once the first notification has gone out, the next reply is news again
+        mailqueue.deliver_queued_email()
+        mailqueue.queue_email("New reply", "third", ["a@example.com"], 'thread-1')
+        self.assertEqual(6, QueuedEmail.objects.count())
+
+    def test_delivery_uses_one_connection(self):
+        for i in range(5):
+            mailqueue.queue_email("Subject %d" % i, "body", ["a@example.com", "b@example.com"])
+        self.assertEqual((5, 0), mailqueue.deliver_queued_email(batch_size=2))
+        self.assertEqual(1, CountingBackend.connections)
+        self.assertEqual(["Subject %d" % i for i in range(5)], [m.subject for m in mail.outbox])
+        self.assertEqual(["a@example.com", "b@example.com"], mail.outbox[0].to)
+        self.assertEqual((0, 0), mailqueue.deliver_queued_email())
+
+    def test_failed_email_is_retried(self):
+        email = mailqueue.queue_email("Subject", "body", ["a@example.com"])
+        CountingBackend.fail = True
+        self.assertEqual((0, 1), mailqueue.deliver_queued_email())
+        email = QueuedEmail.objects.get(id=email.id)
+        self.assertEqual(1, email.attempts)
+        self.assertEqual(None, email.date_sent)
+        self.assertTrue("connection refused" in email.last_error)
+
+        CountingBackend.fail = False
+        self.assertEqual((1, 0), mailqueue.deliver_queued_email())
+        self.assertTrue(QueuedEmail.objects.get(id=email.id).date_sent)
+        self.assertEqual(1, len(mail.outbox))
+
+    def test_gives_up_after_max_attempts(self):
+        email = mailqueue.queue_email("Subject", "body", ["a@example.com"])
+        QueuedEmail.objects.filter(id=email.id).update(attempts=mailqueue.MAX_ATTEMPTS)
+        self.assertEqual((0, 0), mailqueue.deliver_queued_email())
+
+    def test_unreachable_server_is_retried(self):
+        email = mailqueue.queue_email("Subject", "body", ["a@example.com"])
+        CountingBackend.fail_open = True
+        self.assertEqual((0, 1), mailqueue.deliver_queued_email())
+        email = QueuedEmail.objects.get(id=email.id)
+        self.assertEqual((1, None, None), (email.attempts, email.date_sent, email.date_claimed))
+
+        CountingBackend.fail_open = False
+        self.assertEqual((1, 0), mailqueue.deliver_queued_email())
+        self.assertEqual(1, len(mail.outbox))
+
+    def test_expired_claim_is_retried(self):
+        email = mailqueue.queue_email("Subject", "body", ["a@example.com"])
+        # another delivery is sending it
+        QueuedEmail.objects.filter(id=email.id).update(date_claimed=timezone.now())
+        self.assertEqual((0, 0), mailqueue.deliver_queued_email())
+
+        # that delivery died without marking the email as sent or failed
+        QueuedEmail.objects.filter(id=email.id).update(
+            date_claimed=timezone.now() - mailqueue.CLAIM_TIMEOUT - datetime.timedelta(seconds=1))
+        self.assertEqual((1, 0), mailqueue.deliver_queued_email())
+        self.assertTrue(QueuedEmail.objects.get(id=email.id).date_sent)
@@ -1,5 +1,7 @@
 from django.contrib.admin import ModelAdmin, site, TabularInline, StackedInline
 from orders.models import Order, OrderItem, OrderBillingAddress, OrderShippingAddress
+from orders.export import export_orders_response
+from utils.export import ExportAdminMixin
 
 
 class OrderItemInline(TabularInline):
@@ -13,7 +15,7 @@ class BillingAddressInline(StackedInline):
 class ShippingAddressInline(StackedInline):
     model = OrderShippingAddress
 
-class OrderAdmin(ModelAdmin):
+class OrderAdmin(ExportAdminMixin, ModelAdmin):
     list_display = ('__unicode__', 'user', 'date', 'status')
     inlines = [BillingAddressInline, ShippingAddressInline, OrderItemInline]
     readonly_fields = ('date', 'last_updated', 'shipping_charge', 'ip_address',
@@ -35,5 +37,8 @@ class OrderAdmin(ModelAdmin):
         })
     )
 
+    def export(self, format, queryset=None, after=None):
+        return export_orders_response(format, queryset, after)
+
 
 site.register(Order, OrderAdmin)
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Streaming order exports.  See utils.export for the chunking strategy.
+"""
+
+from decimal import Decimal
+from orders.models import Order, ProductOrderItem, GiftCardOrderItem, OrderTax, OrderShippingAddress, \
+    OrderBillingAddress, CreditCardPayment, GiftCardPayment
+from utils.export import iterate_in_chunks, address_dict, export_response, export_to_file, ADDRESS_FIELDS, \
+    DEFAULT_CHUNK_SIZE, CSV
+
+CSV_COLUMNS = [
+    ('id', 'Order'),
+    ('date', 'Date'),
+    ('status', 'Status'),
+    ('user', 'User'),
+    ('first_name', 'First Name'),
+    ('last_name', 'Last Name'),
+    ('email', 'Email'),
+    ('phone', 'Phone'),
+    ('contact_method', 'Contact Method'),
+    ('is_pickup', 'Pickup'),
+    ('shipping_method', 'Shipping Method'),
+    ('shipping_charge', 'Shipping Charge'),
+    ('merchandise_total', 'Merchandise Total'),
+    ('gift_card_total', 'Gift Card Total'),
+    ('tax_total', 'Tax Total'),
+    ('total', 'Total'),
+    ('items', 'Items'),
+    ('taxes', 'Taxes'),
+    ('payments', 'Payments'),
+] + [('shipping_%s' % f, 'Shipping %s' % f.replace('_', ' ').title()) for f in ADDRESS_FIELDS] \
+  + [('billing_%s' % f, 'Billing %s' % f.replace('_', ' ').title()) for f in ADDRESS_FIELDS]
+
+
+def _group_by_order(queryset, order_ids):
+    grouped = {}
+    for obj in queryset.filter(order__in=order_ids):
+        grouped.setdefault(obj.order_id, []).append(obj)
+    return grouped
+
+
+def _by_order(queryset, order_ids):
+    return dict((obj.order_id, obj) for obj in queryset.filter(order__in=order_ids))
+
+
+def _order_dict(order, products, gift_cards, taxes, shipping_address, billing_address, credit_card, gc_payments):
+    merchandise_total = sum((item.total for item in products), Decimal('0.00'))
+    gift_card_total = sum((item.total for item in gift_cards), Decimal('0.00'))
+    tax_total = sum((tax.total for tax in taxes), Decimal('0.00'))
+
+    items = [{'sku': item.item.sku, 'name': item.item.product.name, 'quantity': item.quantity, 'price': item.price}
+             for item in products]
+    items += [{'sku': item.sku, 'name': item.name, 'quantity': item.quantity, 'price': item.price}
+              for item in gift_cards]
+
+    payments = []
+    if credit_card:
+        payments.append({'type': credit_card.get_card_type_display(), 'amount': credit_card.amount,
+                         'transaction_id': credit_card.transaction_id, 'status': credit_card.get_status_display()})
+    for gc in gc_payments:
+        payments.append({'type': 'Gift Card', 'amount': gc.amount, 'transaction_id': gc.transaction_id,
+                         'status': gc.get_status_display()})
+
+    return {
+        'id': order.id,
+        'date': order.date,
+        'status': order.get_status_display(),
+        'user': order.user_id,
+        'first_name': order.first_name,
+        'last_name': order.last_name,
+        'email': order.email,
+        'phone': order.phone,
+        'contact_method': order.get_contact_method_display(),
+        'is_pickup': order.is_pickup,
+        'shipping_method': order.get_shipping_method_display(),
+        'shipping_charge': order.shipping_charge,
+        'merchandise_total': merchandise_total,
+        'gift_card_total': gift_card_total,
+        'tax_total': tax_total,
+        'total': merchandise_total + order.shipping_charge + tax_total + gift_card_total,
+        'items': items,
+        'taxes': [{'name': tax.name, 'rate': tax.rate, 'total': tax.total} for tax in taxes],
+        'payments': payments,
+        'shipping_address': address_dict(shipping_address),
+        'billing_address': address_dict(billing_address),
+    }
+
+
+def order_rows(queryset=None, after=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields one dictionary per order, in increasing order id.  The related addresses, items, taxes and payments are
+    loaded with a fixed number of queries per chunk of orders, never per order.
+    """
+    if queryset is None:
+        queryset = Order.objects.all()
+
+    for orders in iterate_in_chunks(queryset, chunk_size, after):
+        ids = [order.id for order in orders]
+        products = _group_by_order(ProductOrderItem.objects.select_related('item__product'), ids)
+        gift_cards = _group_by_order(GiftCardOrderItem.objects.all(), ids)
+        taxes = _group_by_order(OrderTax.objects.all(), ids)
+        gc_payments = _group_by_order(GiftCardPayment.objects.all(), ids)
+        shipping_addresses = _by_order(OrderShippingAddress.objects.all(), ids)
+        billing_addresses = _by_order(OrderBillingAddress.objects.all(), ids)
+        credit_cards = _by_order(CreditCardPayment.objects.all(), ids)
+
+        for order in orders:
+            yield _order_dict(order,
+                              products.get(order.id, []),
+                              gift_cards.get(order.id, []),
+                              taxes.get(order.id, []),
+                              shipping_addresses.get(order.id),
+                              billing_addresses.get(order.id),
+                              credit_cards.get(order.id),
+                              gc_payments.get(order.id, []))
+
+
+def as_csv_row(row):
+    """
+    Flattens an order dictionary so that it fits in a single CSV row.
+    """
+    flat = dict(row)
+    flat['items'] = '; '.join(['%(quantity)s x %(sku)s @ %(price)s' % item for item in row['items']])
+    flat['taxes'] = '; '.join(['%(name)s %(total)s' % tax for tax in row['taxes']])
+    flat['payments'] = '; '.join(['%(type)s %(amount)s' % payment for payment in row['payments']])
+    for prefix in ('shipping', 'billing'):
+        address = row['%s_address' % prefix] or {}
+        for field in ADDRESS_FIELDS:
+            flat['%s_%s' % (prefix, field)] = address.get(field)
+    return flat
+
+
+def _rows_for_format(format, rows):
+    if format == CSV:
+        return (as_csv_row(row) for row in rows)
+    return rows
+
+
+def export_orders_response(format, queryset=None, after=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    rows = _rows_for_format(format, order_rows(queryset, after, chunk_size))
+    return export_response(format, CSV_COLUMNS, rows, 'orders')
+
+
+def export_orders_to_file(out, format, queryset=None, after=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    rows = _rows_for_format(format, order_rows(queryset, after, chunk_size))
+    return export_to_file(out, format, CSV_COLUMNS, rows)
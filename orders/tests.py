@@ -6,6 +6,13 @@ Replace this with more appropriate tests for your application.
 """
 
 from django.test import TestCase
+from decimal import Decimal
+from StringIO import StringIO
+import csv
+import json
+from orders.models import Order, GiftCardOrderItem, OrderTax
+from orders.export import order_rows, export_orders_to_file
+from utils.export import CSV, JSON
 
 
 class SimpleTest(TestCase):
@@ -14,3 +21,39 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        self.orders = []
+        for i in range(5):
+            order = Order(first_name='First%d' % i, last_name='Last', email='customer%d@example.com' % i,
+                          shipping_charge=Decimal('10.00'), is_pickup=True)
+            order.save()
+            GiftCardOrderItem(order=order, quantity=2, price=Decimal('25.00'), value=25).save()
+            OrderTax(order=order, name='GST', rate=Decimal('5'), total=Decimal('0.50')).save()
+            self.orders.append(order)
+
+    def test_chunks_resume_after_cursor(self):
+        rows = list(order_rows(after=self.orders[1].id, chunk_size=2))
+        self.assertEqual([o.id for o in self.orders[2:]], [row['id'] for row in rows])
+        self.assertEqual(Decimal('60.50'), rows[0]['total'])
+        self.assertEqual(1, len(rows[0]['items']))
+
+    def test_csv(self):
+        out = StringIO()
+        count, cursor = export_orders_to_file(out, CSV, chunk_size=2)
+        self.assertEqual(5, count)
+        self.assertEqual(self.orders[-1].id, cursor)
+        lines = list(csv.reader(StringIO(out.getvalue())))
+        self.assertEqual(6, len(lines))
+        self.assertEqual('Order', lines[0][0])
+        self.assertTrue(lines[1][16].startswith('2 x GIFTCARD @ 25'))
+
+    def test_json(self):
+        out = StringIO()
+        export_orders_to_file(out, JSON, after=self.orders[2].id)
+        data = json.loads(out.getvalue())
+        self.assertEqual([o.id for o in self.orders[3:]], [row['id'] for row in data])
+        self.assertEqual('GST', data[0]['taxes'][0]['name'])
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from reviews.models import Review, ReviewFlag
+from reviews.reviewutils import reclassify_reviews
 
 
 class HasReviewFlagFilter(admin.SimpleListFilter):
@@ -45,5 +46,21 @@ class ReviewAdmin(admin.ModelAdmin):
     list_display = ('user', 'product', 'rating', 'date_added', 'is_flagged_for_removal', 'is_approved')
     list_filter = ('product', 'rating', IsFlaggedForRemovalFilter, IsApprovedFilter)
     readonly_fields = ('date_added', 'last_modified')
+    actions = ['mark_as_spam', 'mark_as_not_spam']
+
+    def mark_as_spam(self, request, queryset):
+        self._bulk_reclassify(request, queryset, True, 'reported as spam and flagged for removal')
+    mark_as_spam.short_description = "Mark reviews as spam"
+
+    def mark_as_not_spam(self, request, queryset):
+        self._bulk_reclassify(request, queryset, False, 'reported as not spam and approved')
+    mark_as_not_spam.short_description = "Mark reviews as not spam (and approve them)"
+
+    def _bulk_reclassify(self, request, queryset, spam, done_message):
+        count, failed = reclassify_reviews(queryset, spam, request.user)
+        self.message_user(request, "%d review(s) %s." % (count, done_message))
+        if failed:
+            self.message_user(request, "Akismet could not be told about reviews %s." %
+                                       ', '.join([str(id) for id in failed]))
 
 admin.site.register(Review, ReviewAdmin)
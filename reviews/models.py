@@ -1,8 +1,9 @@
 import datetime
+from decimal import Decimal
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.db import models, IntegrityError, transaction
 
 # Create your models here.
 from catalogue.models import Product
@@ -132,4 +133,96 @@ class ReviewFlag(models.Model):
 
     def __unicode__(self):
         return "%s flag of review ID %s by %s" % \
-               (self.flag, self.review_id, self.user.username)
\ No newline at end of file
+               (self.flag, self.review_id, self.user.username)
+
+
+class ReviewSummary(models.Model):
+    """
+    Stored review aggregates for a product: the number of reviews, the sum of their ratings and the number of reviews
+    with each star rating.  The product page reads these instead of loading every review to compute them.  Kept up to
+    date by the review post_save and post_delete signal handlers.
+    """
+    product = models.OneToOneField(Product, related_name="review_summary")
+    count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
+    stars1 = models.PositiveIntegerField(default=0)
+    stars2 = models.PositiveIntegerField(default=0)
+    stars3 = models.PositiveIntegerField(default=0)
+    stars4 = models.PositiveIntegerField(default=0)
+    stars5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Review summaries'
+
+    def __unicode__(self):
+        return u"%s (%d reviews)" % (self.product, self.count)
+
+    @property
+    def average(self):
+        """
+        Returns the average rating, or None if there are no reviews.
+        """
+        if not self.count:
+            return None
+        return Decimal(self.rating_total) / self.count
+
+    def histogram(self):
+        """
+        Returns a list of (stars, review count, percentage of reviews) tuples, from 5 stars down to 1 star.
+        """
+        bins = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, 'stars%d' % stars)
+            percent = count * 100 / self.count if self.count else 0
+            bins.append((stars, count, percent))
+        return bins
+
+    def recalculate(self):
+        """
+        Recalculates the aggregates from the product's reviews with a single query.  Does not save.
+        """
+        self.count = 0
+        self.rating_total = 0
+        for stars in range(1, 6):
+            setattr(self, 'stars%d' % stars, 0)
+
+        ratings = Review.objects.filter(product=self.product_id).values('rating').annotate(n=models.Count('id'))
+        for row in ratings:
+            self.count += row['n']
+            self.rating_total += row['rating'] * row['n']
+            setattr(self, 'stars%d' % row['rating'], row['n'])
+
+    @classmethod
+    def for_product(cls, product):
+        """
+        Returns the review summary of the given product.  The summary is created the first time it is asked for,
+        so products reviewed before summaries existed don't need a separate backfill.
+        """
+        try:
+            return cls.objects.get(product=product)
+        except cls.DoesNotExist:
+            return cls.update_for_product(product.id)
+
+    @classmethod
+    def update_for_product(cls, product_id, create=True):
+        """
+        Recalculates and saves the review summary of the product with the given id.  If the product doesn't have a
+        summary yet, one is only created when 'create' is True.
+        """
+        summary = cls(product_id=product_id)
+        summary.recalculate()
+        fields = dict((name, getattr(summary, name)) for name in ('count', 'rating_total', 'stars1', 'stars2',
+                                                                   'stars3', 'stars4', 'stars5'))
+        summaries = cls.objects.filter(product=product_id)
+        if summaries.update(**fields) or not create:
+            return summary
+        # the same savepoint dance as QuerySet.get_or_create
+        sid = transaction.savepoint()
+        try:
+            summary.save(force_insert=True)
+            transaction.savepoint_commit(sid)
+        except IntegrityError:
+            # another request created the summary in the meantime
+            transaction.savepoint_rollback(sid)
+            summaries.update(**fields)
+        return summary
@@ -0,0 +1,104 @@
+"""
+Helpers for listing a product's reviews one page at a time, and for re-classifying reviews as spam in bulk.
+
+Reviews are listed newest first and paged with a keyset cursor rather than with OFFSET: the cursor is the
+(last_modified, id) of the last review on the previous page, so every page is a single indexed range query no matter
+how deep into the list it is, and a review edited between two page loads can't cause the next page to repeat or skip
+a review.
+"""
+
+import datetime
+from django.conf import settings
+from django.db.models import Q
+from django.contrib.sites.models import Site
+from django.utils import timezone
+from comments import spamcheck
+from comments.commentutils import ID_BATCH_SIZE
+from reviews.models import Review, ReviewFlag
+
+REVIEW_PAGE_SIZE = 10
+
+_CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+
+
+def encode_cursor(review):
+    last_modified = review.last_modified
+    if timezone.is_aware(last_modified):
+        last_modified = last_modified.astimezone(timezone.utc)
+    return '%s-%d' % (last_modified.strftime(_CURSOR_FORMAT), review.id)
+
+
+def decode_cursor(cursor):
+    """
+    Returns the (last_modified, id) pair encoded in the given cursor, or None if the cursor is malformed.
+    """
+    try:
+        timestamp, review_id = cursor.split('-')
+        last_modified = datetime.datetime.strptime(timestamp, _CURSOR_FORMAT)
+        if settings.USE_TZ:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified, int(review_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def get_review_page(product, cursor=None, page_size=REVIEW_PAGE_SIZE):
+    """
+    Returns a (reviews, next_cursor) pair for the given product.  'reviews' is a list of at most page_size reviews
+    that come after the given cursor, and next_cursor is the cursor of the following page, or None if this is the
+    last page.  A malformed cursor is treated as the first page.
+    """
+    reviews = Review.objects.filter(product=product).select_related('user__public_profile').\
+        prefetch_related('flags').order_by('-last_modified', '-id')
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        last_modified, review_id = position
+        reviews = reviews.filter(Q(last_modified__lt=last_modified) | Q(last_modified=last_modified, id__lt=review_id))
+
+    # fetch one extra review to find out whether or not there is another page
+    reviews = list(reviews[:page_size + 1])
+    next_cursor = None
+    if len(reviews) > page_size:
+        reviews = reviews[:page_size]
+        next_cursor = encode_cursor(reviews[-1])
+
+    for review in reviews:
+        # the reviews all belong to this product, so don't join the product table to fetch it again
+        review.product = product
+    return reviews, next_cursor
+
+
+def reclassify_reviews(queryset, spam, user, **kwargs):
+    """
+    Marks the given reviews as spam (or ham) in bulk.  Reviews have no spam field, so the verdict is recorded with
+    moderation flags: spam loses its moderator approval and is flagged for removal by 'user', ham loses its removal
+    suggestions and is approved by 'user'.  Reviews whose classification changed are reported to Akismet
+    concurrently, see spamcheck.report_verdicts for the keyword arguments.  Returns the number of reviews that were
+    marked, together with the ids of the reviews whose Akismet reports failed.
+    """
+    reviews = list(queryset.select_related('product', 'user__public_profile'))
+    if not reviews:
+        return 0, []
+    ids = [review.id for review in reviews]
+    flag, opposite = (ReviewFlag.SUGGEST_REMOVAL, ReviewFlag.MODERATOR_APPROVAL) if spam else \
+        (ReviewFlag.MODERATOR_APPROVAL, ReviewFlag.SUGGEST_REMOVAL)
+
+    changed_ids = set()
+    for i in range(0, len(ids), ID_BATCH_SIZE):
+        batch = ids[i:i + ID_BATCH_SIZE]
+        flags = list(ReviewFlag.objects.filter(review__in=batch, flag__in=(flag, opposite)).
+                     values_list('review_id', 'flag'))
+        # a review is already classified this way if it has the flag (from anybody) and not the opposite one
+        unchanged = set(id for id, name in flags if name == flag) - set(id for id, name in flags if name == opposite)
+        changed_ids.update(id for id in batch if id not in unchanged)
+
+        ReviewFlag.objects.filter(review__in=batch, flag=opposite).delete()
+        flagged = set(ReviewFlag.objects.filter(review__in=batch, user=user, flag=flag).
+                      values_list('review_id', flat=True))
+        ReviewFlag.objects.bulk_create([ReviewFlag(review_id=id, user=user, flag=flag) for id in batch
+                                        if id not in flagged])
+
+    domain = Site.objects.get_current().domain
+    items = [(review.id, domain, review.get_spam_data()) for review in reviews if review.id in changed_ids]
+    return len(reviews), spamcheck.report_verdicts(items, spam, **kwargs)
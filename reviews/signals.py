@@ -1,8 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 import django.dispatch
-from reviews.models import Review
+from reviews.models import Review, ReviewSummary
 from reviews import email
+from utils import pagecache
 
 review_edited = django.dispatch.Signal(providing_args=['original'])
 review_deleted = django.dispatch.Signal()  # review deleted by user
@@ -19,6 +20,23 @@ def review_added(sender, **kwargs):
     email.notify_managers_new_review(review)
 
 
+@receiver(post_save, sender=Review)
+def update_review_summary(sender, instance, **kwargs):
+    """
+    Keep the product's stored review aggregates in sync with its reviews.
+    """
+    ReviewSummary.update_for_product(instance.product_id)
+    # the product ratings are shown on the cached catalogue pages
+    pagecache.bump_version(pagecache.CATALOGUE)
+
+
+@receiver(post_delete, sender=Review)
+def update_review_summary_on_delete(sender, instance, **kwargs):
+    # don't create a summary here, the review may be deleted because its product is being deleted
+    ReviewSummary.update_for_product(instance.product_id, create=False)
+    pagecache.bump_version(pagecache.CATALOGUE)
+
+
 @receiver(review_edited)
 def handle_review_edited(sender, **kwargs):
     """
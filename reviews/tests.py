@@ -6,6 +6,15 @@ Replace this with more appropriate tests for your application.
 """
 
 from django.test import TestCase
+from django.db.models.query import QuerySet
+from django.contrib.auth.models import User
+from catalogue.models import Category, Brand, Product
+from django.core.management import call_command
+from reviews.models import Review, ReviewSummary, ReviewFlag
+from reviews.reviewutils import get_review_page, reclassify_reviews
+from comments import spamcheck
+from mock import patch
+import reviews.signals
 
 
 class SimpleTest(TestCase):
@@ -14,3 +23,84 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class ReviewSummaryTest(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Toys', slug='toys', description='Toys')
+        brand = Brand.objects.create(name='Brand', slug='brand', short_description='-', long_description='-')
+        self.product = Product.objects.create(name='Product', slug='product', brand=brand, price='5.00',
+                                              category=category, meta_description='-', weight='1.0')
+        self.reviews = []
+        for i, rating in enumerate([5, 5, 4, 1, 5]):
+            user = User.objects.create_user('reviewer%d' % i, 'reviewer%d@example.com' % i, 'password')
+            self.reviews.append(Review.objects.create(product=self.product, user=user, rating=rating,
+                                                      summary='Review %d' % i))
+
+    def test_summary_follows_reviews(self):
+        summary = ReviewSummary.for_product(self.product)
+        self.assertEqual(summary.count, 5)
+        self.assertEqual(summary.average, 4)
+        self.assertEqual(summary.histogram(), [(5, 3, 60), (4, 1, 20), (3, 0, 0), (2, 0, 0), (1, 1, 20)])
+
+        self.reviews[3].delete()
+        summary = ReviewSummary.for_product(self.product)
+        self.assertEqual(summary.count, 4)
+        self.assertEqual(summary.stars1, 0)
+
+    def test_summary_created_concurrently(self):
+        ReviewSummary.objects.all().delete()
+        update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            # another request creates the summary just after this one finds that there isn't one
+            if not ReviewSummary.objects.exists():
+                ReviewSummary.objects.create(product=self.product)
+                return 0
+            return update(queryset, **kwargs)
+
+        with patch.object(QuerySet, 'update', racing_update):
+            self.assertEqual(ReviewSummary.for_product(self.product).count, 5)
+        self.assertEqual(ReviewSummary.objects.get(product=self.product).count, 5)
+
+    def test_review_pages(self):
+        seen = []
+        reviews, cursor = get_review_page(self.product, page_size=2)
+        seen.extend(reviews)
+        while cursor:
+            with self.assertNumQueries(2):
+                # one query for the reviews, and one for their flags
+                reviews, cursor = get_review_page(self.product, cursor, page_size=2)
+                [review.product.name for review in reviews]
+            seen.extend(reviews)
+        self.assertEqual([review.id for review in seen], [review.id for review in reversed(self.reviews)])
+
+    def test_bad_cursor_is_first_page(self):
+        first, _ = get_review_page(self.product, page_size=2)
+        reviews, _ = get_review_page(self.product, 'garbage', page_size=2)
+        self.assertEqual(reviews, first)
+
+    def test_reclassify(self):
+        moderator = User.objects.create_user('moderator', 'moderator@example.com', 'password')
+        ReviewFlag.objects.create(review=self.reviews[0], user=self.reviews[1].user, flag=ReviewFlag.MODERATOR_APPROVAL)
+        ids = '%d,%d-%d' % (self.reviews[0].id, self.reviews[1].id, self.reviews[2].id)
+
+        call_command('reclassify_spam', 'spam', reviews=ids, user='moderator')
+        self.assertFalse(ReviewFlag.objects.filter(flag=ReviewFlag.MODERATOR_APPROVAL).exists())
+        self.assertEqual(ReviewFlag.objects.filter(user=moderator, flag=ReviewFlag.SUGGEST_REMOVAL).count(), 3)
+
+        call_command('reclassify_spam', 'ham', reviews=ids, user='moderator')
+        self.assertEqual(ReviewFlag.objects.filter(user=moderator, flag=ReviewFlag.MODERATOR_APPROVAL).count(), 3)
+        self.assertFalse(ReviewFlag.objects.filter(flag=ReviewFlag.SUGGEST_REMOVAL).exists())
+
+    def test_reclassify_reports_changes_only(self):
+        moderator = User.objects.create_user('moderator', 'moderator@example.com', 'password')
+        ReviewFlag.objects.create(review=self.reviews[0], user=self.reviews[1].user, flag=ReviewFlag.MODERATOR_APPROVAL)
+        queryset = Review.objects.filter(id__in=[self.reviews[0].id, self.reviews[1].id])
+        with patch.object(spamcheck, 'report_verdicts', return_value=[]) as report_verdicts:
+            self.assertEqual((2, []), reclassify_reviews(queryset, False, moderator))
+            self.assertEqual([self.reviews[1].id], [id for id, _, _ in report_verdicts.call_args[0][0]])
+
+            reclassify_reviews(queryset, False, moderator)
+            self.assertEqual([], report_verdicts.call_args[0][0])
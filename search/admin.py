@@ -1,5 +1,6 @@
 from django.contrib import admin
-from search.models import SearchTerm
+from django.contrib.admin import SimpleListFilter
+from search.models import SearchTerm, SearchQueryDay
 
 
 class SearchTermAdmin(admin.ModelAdmin):
@@ -7,4 +8,38 @@ class SearchTermAdmin(admin.ModelAdmin):
     exclude = ('user',)
 
 
+class ZeroHitsFilter(SimpleListFilter):
+    title = 'zero hits'
+    parameter_name = 'zero_hits'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('True', 'Yes'),
+            ('False', 'No'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'True':
+            return queryset.filter(zero_hits__gt=0)
+        if self.value() == 'False':
+            return queryset.filter(zero_hits=0)
+        return queryset
+
+
+class SearchQueryDayAdmin(admin.ModelAdmin):
+    """
+    Browses the daily search rollups, which stay small enough to filter and sort by date and query even when there
+    are months of raw search terms.
+    """
+    list_display = ('query', 'date', 'count', 'zero_hits')
+    list_filter = (ZeroHitsFilter,)
+    date_hierarchy = 'date'
+    search_fields = ('query',)
+    readonly_fields = ('query', 'date', 'count', 'zero_hits')
+
+    def has_add_permission(self, request):
+        return False
+
+
 admin.site.register(SearchTerm, SearchTermAdmin)
+admin.site.register(SearchQueryDay, SearchQueryDayAdmin)
@@ -0,0 +1,236 @@
+"""
+A Haystack backend that searches an in-process index (see search.textindex) instead of a Solr server, for
+development, CI and small deployments.  Configure it with a PATH for the index file:
+
+    HAYSTACK_CONNECTIONS = {
+        'default': {
+            'ENGINE': 'search.inprocess_backend.InProcessEngine',
+            'PATH': '/var/lib/arthurcode/search_index',
+            'INCLUDE_SPELLING': True,
+        },
+    }
+
+Documents are indexed from the same templates as they are for Solr (the document field, ie. product_text.txt) and
+the other index fields are stored with them, so rebuild_index, update_index and catalogue.indexutils work unchanged.
+
+Searches support what the site's search box produces: words (all of which must match, ranked with BM25), excluded
+'-words', quoted phrases (matched as words, not as phrases) and 'prefix*' words, as well as ordering by stored
+fields and spelling suggestions.  Narrow queries and facets are Solr features, and are ignored with a warning, so the
+search-backed catalogue listings (settings.CATALOGUE_SEARCH_LISTINGS) still need Solr.
+"""
+
+import datetime
+import logging
+from decimal import Decimal
+from django.core.exceptions import ImproperlyConfigured
+from haystack import connections
+from haystack.backends import BaseEngine, BaseSearchBackend, BaseSearchQuery, SearchNode, log_query
+from haystack.constants import DJANGO_CT, DJANGO_ID, ID
+from haystack.inputs import PythonData
+from haystack.models import SearchResult
+from haystack.utils import get_identifier
+from search.textindex import get_index_file, tokenize
+
+logger = logging.getLogger(__name__)
+
+MATCH_ALL = u'*'
+
+
+def _stored_value(value):
+    """
+    Converts a prepared field value to something that marshal can save.
+    """
+    if value is None or isinstance(value, (bool, int, long, float, unicode)):
+        return value
+    if isinstance(value, str):
+        return value.decode('utf-8')
+    if isinstance(value, (list, tuple, set)):
+        return [_stored_value(item) for item in value]
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return unicode(value.isoformat())
+    if isinstance(value, Decimal):
+        return unicode(value)
+    return unicode(value)
+
+
+def parse_query(query_string):
+    """
+    Splits a query built by InProcessSearchQuery into (words, excluded words, prefixes).
+    """
+    words, excluded, prefixes = [], [], []
+    for bit in query_string.split():
+        if bit == MATCH_ALL:
+            continue
+        if bit.startswith('-'):
+            excluded.extend(tokenize(bit[1:]))
+        elif bit.endswith('*'):
+            bit_words = tokenize(bit[:-1])
+            words.extend(bit_words[:-1])
+            prefixes.extend(bit_words[-1:])
+        else:
+            words.extend(tokenize(bit))
+    return words, excluded, prefixes
+
+
+class InProcessSearchBackend(BaseSearchBackend):
+
+    def __init__(self, connection_alias, **connection_options):
+        super(InProcessSearchBackend, self).__init__(connection_alias, **connection_options)
+        if not connection_options.get('PATH'):
+            raise ImproperlyConfigured("You must specify a 'PATH' in your settings for connection '%s'."
+                                       % connection_alias)
+        self.index_file = get_index_file(connection_options['PATH'])
+
+    def update(self, index, iterable, commit=True):
+        documents = []
+        content_field = index.get_content_field()
+        for obj in iterable:
+            data = index.full_prepare(obj)
+            text = data.pop(content_field, u'') or u''
+            fields = dict((key, _stored_value(value)) for key, value in data.items())
+            documents.append((data[ID], text, fields))
+
+        if documents:
+            with self.index_file.modify() as text_index:
+                for doc_id, text, fields in documents:
+                    text_index.add(doc_id, text, fields)
+
+    def remove(self, obj_or_string, commit=True):
+        doc_id = get_identifier(obj_or_string)
+        with self.index_file.modify() as text_index:
+            text_index.remove(doc_id)
+
+    def clear(self, models=[], commit=True):
+        with self.index_file.modify() as text_index:
+            if not models:
+                text_index.clear()
+            else:
+                content_types = set(u'%s.%s' % (model._meta.app_label, model._meta.module_name) for model in models)
+                text_index.clear(lambda doc_id, fields: fields.get(DJANGO_CT) in content_types)
+
+    @log_query
+    def search(self, query_string, sort_by=None, start_offset=0, end_offset=None, models=None,
+               limit_to_registered_models=None, result_class=None, spelling_query=None, **kwargs):
+        if kwargs.get('narrow_queries') or kwargs.get('facets') or kwargs.get('query_facets'):
+            logger.warning("The in-process search backend ignores narrow queries and facets")
+
+        if not query_string:
+            return {'results': [], 'hits': 0}
+
+        if models:
+            content_types = set(u'%s.%s' % (model._meta.app_label, model._meta.module_name) for model in models)
+        elif limit_to_registered_models is False:
+            content_types = None
+        else:
+            content_types = set(self.build_models_list())
+
+        text_index = self.index_file.get()
+        words, excluded, prefixes = parse_query(query_string)
+        scores = text_index.search(words, excluded, prefixes)
+
+        matches = []
+        for doc_id, score in scores.iteritems():
+            fields = text_index.fields(doc_id)
+            if content_types is None or fields.get(DJANGO_CT) in content_types:
+                matches.append((doc_id, score, fields))
+
+        # best match first, then by the requested fields (the last of which is applied first)
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        for field in reversed(sort_by or []):
+            reverse = field.startswith('-')
+            field = field.lstrip('-')
+            matches.sort(key=lambda match: match[2].get(field), reverse=reverse)
+
+        indexes = self._indexes()
+        results = [self._result(indexes, score, fields, result_class)
+                   for doc_id, score, fields in matches[start_offset:end_offset]]
+
+        spelling_suggestion = None
+        if self.include_spelling:
+            spelling_suggestion = text_index.suggest(spelling_query or u' '.join(words + prefixes))
+
+        return {
+            'results': results,
+            'hits': len(matches),
+            'facets': {},
+            'spelling_suggestion': spelling_suggestion,
+        }
+
+    def _indexes(self):
+        unified_index = connections[self.connection_alias].get_unified_index()
+        return dict((u'%s.%s' % (model._meta.app_label, model._meta.module_name), unified_index.get_index(model))
+                    for model in unified_index.get_indexed_models())
+
+    def _result(self, indexes, score, fields, result_class=None):
+        """
+        Returns a search result for the given stored fields, which are converted back to Python values the same way
+        the Solr backend converts them.
+        """
+        index = indexes.get(fields[DJANGO_CT])
+        additional_fields = {}
+        for key, value in fields.items():
+            if key in (ID, DJANGO_CT, DJANGO_ID):
+                continue
+            if index is not None and key in index.fields:
+                value = index.fields[key].convert(value)
+            additional_fields[str(key)] = value
+        app_label, model_name = fields[DJANGO_CT].split('.')
+        return (result_class or SearchResult)(app_label, model_name, fields[DJANGO_ID], score, **additional_fields)
+
+    def autocomplete(self, text, limit=10):
+        """
+        Returns completions of the given text, made by completing its last word with words from the index.
+        """
+        return self.index_file.get().complete(text, limit)
+
+    def more_like_this(self, model_instance, additional_query_string=None, start_offset=0, end_offset=None,
+                       models=None, limit_to_registered_models=None, result_class=None, **kwargs):
+        return {'results': [], 'hits': 0}
+
+
+class InProcessSearchQuery(BaseSearchQuery):
+    """
+    Builds the query strings that InProcessSearchBackend.search understands: whitespace separated words, where
+    '-word' excludes a word and 'word*' matches any word that starts with 'word'.
+    """
+
+    def clean(self, query_fragment):
+        # there is no query syntax to escape, the backend only reads words
+        return query_fragment
+
+    def build_not_query(self, query_string):
+        return u' '.join(u'-%s' % bit for bit in query_string.split())
+
+    def build_exact_query(self, query_string):
+        return query_string
+
+    def build_query(self):
+        if not self.query_filter:
+            return MATCH_ALL
+        return self._build_sub_query(self.query_filter)
+
+    def _build_sub_query(self, search_node):
+        bits = []
+        for child in search_node.children:
+            if isinstance(child, SearchNode):
+                bits.append(self._build_sub_query(child))
+                continue
+
+            expression, value = child
+            field, filter_type = search_node.split_expression(expression)
+            if not hasattr(value, 'input_type_name'):
+                value = PythonData(value)
+            prepared = unicode(value.prepare(self))
+            if filter_type == 'startswith':
+                prepared = u' '.join(u'%s*' % bit for bit in prepared.split())
+            bits.append(prepared)
+
+        query = u' '.join(bits)
+        if search_node.negated:
+            query = self.build_not_query(query)
+        return query
+
+
+class InProcessEngine(BaseEngine):
+    backend = InProcessSearchBackend
+    query = InProcessSearchQuery
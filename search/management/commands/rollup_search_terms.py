@@ -0,0 +1,11 @@
+import sys
+from django.core.management.base import BaseCommand
+from search.searchutils import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily search rollups from the logged search terms."
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups(progress=lambda done: sys.stderr.write("\rRolled up %d search terms" % done))
+        sys.stderr.write("\nRolled up %d search terms.\n" % count)
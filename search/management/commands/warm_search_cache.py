@@ -0,0 +1,24 @@
+import sys
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from search.resultcache import search_products
+from search.searchutils import top_queries
+
+DEFAULT_TOP = 100
+DEFAULT_DAYS = 7
+
+
+class Command(BaseCommand):
+    help = "Runs the most frequent recent search queries, so that their results are cached before customers ask."
+    option_list = BaseCommand.option_list + (
+        make_option('--top', dest='top', type='int', default=DEFAULT_TOP,
+                    help="The number of queries to run."),
+        make_option('--days', dest='days', type='int', default=DEFAULT_DAYS,
+                    help="How many days of search rollups to pick the most frequent queries from."),
+    )
+
+    def handle(self, *args, **options):
+        queries = top_queries(options['top'], options['days'])
+        for query, count in queries:
+            search_products(query)
+        sys.stderr.write("Ran %d search queries.\n" % len(queries))
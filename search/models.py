@@ -12,4 +12,24 @@ class SearchTerm(models.Model):
     hits = models.PositiveIntegerField()
 
     def __unicode__(self):
-        return self.q
\ No newline at end of file
+        return self.q
+
+
+class SearchQueryDay(models.Model):
+    """
+    The number of times a (normalized) query was searched for on one day, and how many of those searches found
+    nothing.  Maintained incrementally as search terms are logged, see search.searchutils, so that search statistics
+    can be read without scanning the raw SearchTerm rows.
+    """
+    query = models.CharField(max_length=SearchTerm.TERM_LENGTH, db_index=True)
+    date = models.DateField(db_index=True)
+    count = models.PositiveIntegerField(default=0)
+    zero_hits = models.PositiveIntegerField(default=0, help_text="The number of searches that found nothing")
+
+    class Meta:
+        unique_together = ('query', 'date')
+        ordering = ('-date', '-count')
+        verbose_name = 'daily search count'
+
+    def __unicode__(self):
+        return self.query
@@ -0,0 +1,87 @@
+"""
+A short lived cache of product search results.
+
+Paging through a search, re-sorting it or applying filters re-renders the search page with the same search text, and
+each of those page views used to repeat the same requests to the search backend.  The first view of a search now
+saves the ordered product ids, their scores, the total and the spelling suggestion under the normalized search text,
+and the following views read them from the cache.
+
+The entries are keyed on the index version as well, which changes whenever catalogue.indexutils sends product
+updates to the search backend, so a search never shows results from before an index update for longer than it takes
+the update to be sent.  Rebuilding the index with the management commands doesn't change the version, the entries
+simply expire after RESULT_TIMEOUT.
+"""
+
+import hashlib
+import uuid
+from django.core.cache import cache
+from haystack.query import SearchQuerySet
+from catalogue.models import Product
+from search.searchutils import normalize_query
+
+RESULT_TIMEOUT = 5 * 60
+VERSION_TIMEOUT = 30 * 24 * 60 * 60
+
+# the number of results fetched by the first request to the backend.  A search with more hits than this needs a second
+# request for the rest.
+FIRST_FETCH = 500
+
+VERSION_KEY = 'search-results-version'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(VERSION_KEY, version, VERSION_TIMEOUT)
+    return version
+
+
+def bump_version():
+    """
+    Invalidates every cached search result.
+    """
+    cache.set(VERSION_KEY, uuid.uuid4().hex, VERSION_TIMEOUT)
+
+
+def _results_key(query):
+    return 'search-results-%s-%s' % (get_version(), hashlib.md5(query.encode('utf-8')).hexdigest())
+
+
+def run_search(query):
+    """
+    Searches the products for the given text, and returns the product ids in order of relevance, their scores, the
+    total number of hits and the spelling suggestion, in a dict.
+    """
+    sqs = SearchQuerySet().auto_query(query).models(Product)
+    # slicing runs a single request, which also brings back the hit count and (with INCLUDE_SPELLING) the suggestion
+    results = list(sqs[:FIRST_FETCH])
+    total = sqs.count()
+    if total > len(results):
+        results.extend(sqs[len(results):total])
+
+    suggestion = sqs.spelling_suggestion()
+    if isinstance(suggestion, dict):
+        # for some reason solr sometimes returns a dict, so we need to grab the 'suggestion' list
+        suggestion = suggestion['suggestion'][0]
+
+    return {
+        'ids': [int(result.pk) for result in results],
+        'scores': [result.score for result in results],
+        'total': total,
+        'suggestion': suggestion,
+    }
+
+
+def search_products(search_text):
+    """
+    Returns the results of run_search for the given search text, from the cache if the same search (after
+    normalization) has been run recently.
+    """
+    query = normalize_query(search_text)
+    key = _results_key(query)
+    results = cache.get(key)
+    if results is None:
+        results = run_search(query)
+        cache.set(key, results, RESULT_TIMEOUT)
+    return results
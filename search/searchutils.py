@@ -1,17 +1,215 @@
-from search.models import SearchTerm
+"""
+Search term logging.
+
+Search terms are buffered in memory and written to the SearchTerm table with a single bulk INSERT once
+settings.SEARCH_LOG_BATCH_SIZE terms are waiting, or once the oldest waiting term is settings.SEARCH_LOG_FLUSH_INTERVAL
+seconds old, so a search page doesn't pay for a write of its own.  How the buffer is flushed depends on settings.SEARCH_LOG_FLUSH:
+
+    'background'    a daemon thread in the web process flushes the buffer (default)
+    'inline'        the request that fills the buffer (or finds it stale) flushes it, which is handy for tests
+
+Every flush also adds the new terms to the daily SearchQueryDay rollups, with one UPDATE (or INSERT) per distinct
+query in the batch.
+
+Terms still in the buffer when the process exits are flushed by an atexit hook, although a process that is killed
+outright loses them.  That is an acceptable price for a log of search statistics.
+"""
+
+import atexit
+import datetime
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_ipv4_address
+from django.db import close_connection, IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from search.models import SearchTerm, SearchQueryDay
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND = 'background'
+INLINE = 'inline'
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 10
+
+ROLLUP_BATCH_SIZE = 1000
 
 
 def store(request, q, hits):
     """
-     Store the search text in the database
+     Store the search text in the database.  'hits' is the number of results that the search produced.
     """
     if len(q) > 1:
-        term = SearchTerm()
-        term.q = q
-        term.ip_address = request.META.get('REMOTE_ADDR')
-        term.user = None
-        term.hits = hits
+        term = SearchTerm(q=q[:SearchTerm.TERM_LENGTH], ip_address=_ip_address(request), hits=hits,
+                          search_date=timezone.now())
         if request.user.is_authenticated():
-            term.user = request.user
-        term.full_clean()
-        term.save()
\ No newline at end of file
+            term.user_id = request.user.id
+        search_log.add(term)
+
+
+def normalize_query(q):
+    """
+    Returns the form of a search query that the rollups count it under: lower case, with runs of whitespace collapsed
+    to a single space.
+    """
+    return u' '.join(q.lower().split())[:SearchTerm.TERM_LENGTH]
+
+
+def _search_day(search_date):
+    if timezone.is_aware(search_date):
+        search_date = timezone.localtime(search_date)
+    return search_date.date()
+
+
+def add_to_rollups(terms):
+    """
+    Adds the given (saved or unsaved) SearchTerms to the daily rollups.
+    """
+    counts = {}
+    for term in terms:
+        key = (normalize_query(term.q), _search_day(term.search_date))
+        count, zero_hits = counts.get(key, (0, 0))
+        counts[key] = (count + 1, zero_hits + (0 if term.hits else 1))
+
+    for (query, date), (count, zero_hits) in counts.items():
+        _add_to_rollup(query, date, count, zero_hits)
+
+
+def _add_to_rollup(query, date, count, zero_hits):
+    rollups = SearchQueryDay.objects.filter(query=query, date=date)
+    if rollups.update(count=F('count') + count, zero_hits=F('zero_hits') + zero_hits):
+        return
+    # the same savepoint dance as QuerySet.get_or_create
+    sid = transaction.savepoint()
+    try:
+        SearchQueryDay.objects.create(query=query, date=date, count=count, zero_hits=zero_hits)
+        transaction.savepoint_commit(sid)
+    except IntegrityError:
+        # another process created the rollup in the meantime
+        transaction.savepoint_rollback(sid)
+        rollups.update(count=F('count') + count, zero_hits=F('zero_hits') + zero_hits)
+
+
+def rebuild_rollups(progress=None):
+    """
+    Rebuilds the daily rollups from all of the logged search terms.  If given, progress(terms done) is called after
+    each batch of terms.
+    """
+    SearchQueryDay.objects.all().delete()
+    done = 0
+    after = 0
+    while True:
+        batch = list(SearchTerm.objects.filter(id__gt=after).order_by('id').only('id', 'q', 'search_date', 'hits')
+                     [:ROLLUP_BATCH_SIZE])
+        if not batch:
+            break
+        after = batch[-1].id
+        add_to_rollups(batch)
+        done += len(batch)
+        if progress:
+            progress(done)
+    return done
+
+
+def top_queries(limit, days=7, zero_hits=False):
+    """
+    Returns the 'limit' most frequent normalized queries of the last 'days' days as (query, search count) pairs, most
+    frequent first.  If zero_hits is True, only queries that found nothing are counted.
+    """
+    since = timezone.localtime(timezone.now()).date() - datetime.timedelta(days=days - 1)
+    rollups = SearchQueryDay.objects.filter(date__gte=since)
+    field = 'zero_hits' if zero_hits else 'count'
+    if zero_hits:
+        rollups = rollups.filter(zero_hits__gt=0)
+    totals = rollups.values('query').annotate(total=Sum(field)).order_by('-total', 'query')[:limit]
+    return [(row['query'], row['total']) for row in totals]
+
+
+def _ip_address(request):
+    # SearchTerm.ip_address only holds IPv4 addresses
+    address = request.META.get('REMOTE_ADDR') or ''
+    try:
+        validate_ipv4_address(address)
+    except ValidationError:
+        return '0.0.0.0'
+    return address
+
+
+class SearchLog(object):
+    """
+    A buffer of unsaved SearchTerms.  Safe to use from several threads.
+    """
+
+    def __init__(self):
+        self._terms = []
+        self._first_added = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def batch_size(self):
+        return getattr(settings, 'SEARCH_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+    def flush_interval(self):
+        return getattr(settings, 'SEARCH_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+    def add(self, term):
+        with self._lock:
+            if not self._terms:
+                self._first_added = time.time()
+            self._terms.append(term)
+            due = len(self._terms) >= self.batch_size() or \
+                time.time() - self._first_added >= self.flush_interval()
+
+        if getattr(settings, 'SEARCH_LOG_FLUSH', BACKGROUND) == INLINE:
+            if due:
+                self.flush()
+        else:
+            self._start()
+            if due:
+                self._wakeup.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._terms)
+
+    def flush(self):
+        """
+        Writes the buffered terms to the DB, and returns the number of terms written.
+        """
+        with self._lock:
+            terms, self._terms = self._terms, []
+        if not terms:
+            return 0
+        try:
+            SearchTerm.objects.bulk_create(terms)
+            add_to_rollups(terms)
+        except Exception:
+            logger.exception("Failed to save %d search terms", len(terms))
+            return 0
+        return len(terms)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='search-log')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            # wake up when the buffer is full, and at least once per interval to write out a slow trickle of terms
+            self._wakeup.wait(self.flush_interval())
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_connection()
+
+
+search_log = SearchLog()
+atexit.register(search_log.flush)
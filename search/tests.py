@@ -6,6 +6,27 @@ Replace this with more appropriate tests for your application.
 """
 
 from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django.contrib.auth.models import User, AnonymousUser
+from search import searchutils, typeahead, resultcache
+from search.models import SearchTerm, SearchQueryDay
+from django.utils import timezone
+from django.core.urlresolvers import reverse
+from django.template.defaultfilters import slugify
+from haystack import connections
+from haystack.inputs import AutoQuery
+from haystack.query import SQ
+from catalogue.models import Brand, Category, Product
+from catalogue.search_indexes import ProductIndex
+from search.inprocess_backend import InProcessSearchBackend, InProcessSearchQuery
+from search.textindex import IndexFile, TextIndex, stem
+from mock import patch
+import datetime
+import json
+import os
+import shutil
+import tempfile
 
 
 class SimpleTest(TestCase):
@@ -14,3 +35,225 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class SearchViewTest(TestCase):
+
+    def test_invalid_search_goes_back(self):
+        url = reverse('product_search')
+        response = self.client.post(url, {'q': '', 'from': '/products/'})
+        self.assertEqual(response['Location'], 'http://testserver/products/')
+
+        # only to pages on this site
+        fallback = 'http://testserver' + reverse('catalogue_category', kwargs={'category_slug': ''})
+        response = self.client.post(url, {'q': '', 'from': 'http://evil.example.com/'})
+        self.assertEqual(response['Location'], fallback)
+        response = self.client.post(url, {'q': ''})
+        self.assertEqual(response['Location'], fallback)
+
+
+@override_settings(SEARCH_LOG_FLUSH='inline', SEARCH_LOG_BATCH_SIZE=3, SEARCH_LOG_FLUSH_INTERVAL=60)
+class SearchLogTest(TestCase):
+
+    def setUp(self):
+        searchutils.search_log.flush()
+        self.factory = RequestFactory()
+
+    def request(self, address='127.0.0.1', user=None):
+        request = self.factory.get('/', REMOTE_ADDR=address)
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_terms_are_written_in_batches(self):
+        user = User.objects.create_user('arthur', 'me@example.com', 'whocares')
+        with self.assertNumQueries(0):
+            searchutils.store(self.request(), "lego", 10)
+            searchutils.store(self.request(user=user), "blocks", 0)
+            searchutils.store(self.request(), "x", 0)   # too short to log
+        self.assertEqual(2, searchutils.search_log.pending())
+
+        # the third term fills the buffer, one INSERT writes the terms (the rest update the rollups)
+        searchutils.store(self.request('::1'), "x" * 100, 3)
+        self.assertEqual(0, searchutils.search_log.pending())
+
+        terms = list(SearchTerm.objects.order_by('id'))
+        self.assertEqual(["lego", "blocks", "x" * SearchTerm.TERM_LENGTH], [term.q for term in terms])
+        self.assertEqual([10, 0, 3], [term.hits for term in terms])
+        self.assertEqual([None, user.id, None], [term.user_id for term in terms])
+        self.assertEqual(["127.0.0.1", "127.0.0.1", "0.0.0.0"], [term.ip_address for term in terms])
+        self.assertTrue(all(term.search_date for term in terms))
+
+    def test_stale_terms_are_flushed(self):
+        searchutils.store(self.request(), "lego", 10)
+        with override_settings(SEARCH_LOG_FLUSH_INTERVAL=0):
+            searchutils.store(self.request(), "blocks", 10)
+        self.assertEqual(2, SearchTerm.objects.count())
+
+    def test_rollups(self):
+        for q, hits in (("Lego", 5), ("  lego ", 5), ("LEGO  blocks", 0), ("lego blocks", 0), ("puzzle", 1)):
+            searchutils.store(self.request(), q, hits)
+        searchutils.search_log.flush()
+
+        today = timezone.localtime(timezone.now()).date()
+        rollups = dict((r.query, (r.date, r.count, r.zero_hits)) for r in SearchQueryDay.objects.all())
+        self.assertEqual({u"lego": (today, 2, 0), u"lego blocks": (today, 2, 2), u"puzzle": (today, 1, 0)}, rollups)
+        self.assertEqual([(u"lego", 2), (u"lego blocks", 2)], searchutils.top_queries(2))
+        self.assertEqual([(u"lego blocks", 2)], searchutils.top_queries(10, zero_hits=True))
+
+        # searches from last month fall outside of the default window
+        SearchQueryDay.objects.create(query="puzzle", date=today - datetime.timedelta(days=30), count=10)
+        self.assertEqual([(u"lego", 2), (u"lego blocks", 2), (u"puzzle", 1)], searchutils.top_queries(10))
+
+        SearchQueryDay.objects.all().delete()
+        self.assertEqual(5, searchutils.rebuild_rollups())
+        self.assertEqual(rollups, dict((r.query, (r.date, r.count, r.zero_hits)) for r in SearchQueryDay.objects.all()))
+
+
+class TextIndexTest(TestCase):
+
+    def setUp(self):
+        self.index = TextIndex()
+        self.index.add('a', u'Wooden puzzle with 24 pieces', {'name': u'Puzzle'})
+        self.index.add('b', u'Puzzles and games for toddlers.  The best puzzles!', {'name': u'Games'})
+        self.index.add('c', u'Building blocks', {'name': u'Blocks'})
+
+    def test_search(self):
+        self.assertEqual(u'puzzl', stem(u'puzzles'))
+        self.assertEqual(stem(u'build'), stem(u'building'))
+        scores = self.index.search([u'puzzle'])
+        self.assertEqual(set(['a', 'b']), set(scores))
+        self.assertTrue(scores['b'] > scores['a'])    # two occurrences
+        self.assertEqual(['a'], self.index.search([u'puzzle'], excluded=[u'games']).keys())
+        self.assertEqual(['c'], self.index.search(prefixes=[u'bui']).keys())
+        self.assertEqual({}, self.index.search([u'puzzle', u'blocks']))
+
+    def test_complete_and_suggest(self):
+        self.assertEqual([u'puzzle', u'puzzles'], self.index.complete_words(u'puz'))
+        self.assertEqual([u'wooden blocks'], self.index.complete(u'wooden blo'))
+        self.assertEqual(u'wooden puzzles', self.index.suggest(u'woodn puzzles'))
+        self.assertEqual(None, self.index.suggest(u'wooden puzzles'))
+
+    def test_remove(self):
+        self.index.remove('b')
+        self.assertEqual(['a'], self.index.search([u'puzzle']).keys())
+        self.assertEqual([u'puzzle'], self.index.complete_words(u'puz'))
+
+    def test_index_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'index')
+            reader, writer = IndexFile(path), IndexFile(path)
+            self.assertEqual(0, len(reader.get()))
+            with writer.modify() as index:
+                index.add('a', u'Wooden puzzle', {'name': u'Puzzle'})
+            # the reader picks up the change
+            self.assertEqual({u'name': u'Puzzle'}, reader.get().fields('a'))
+        finally:
+            shutil.rmtree(directory)
+
+
+class InProcessBackendTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.backend = InProcessSearchBackend('default', PATH=os.path.join(self.directory, 'index'),
+                                              INCLUDE_SPELLING=True)
+        category = Category.objects.create(name='Toys', slug='toys', description='Toys')
+        brand = Brand.objects.create(name='Brand', slug='brand', short_description='-', long_description='-')
+        self.products = [Product.objects.create(name=name, slug=slugify(name), brand=brand, price=price,
+                                                category=category, meta_description='-', weight='1.0',
+                                                short_description=description)
+                         for name, price, description in [('Wooden Train', '30.00', 'A wooden train set'),
+                                                           ('Puzzle Box', '20.00', 'A wooden puzzle')]]
+        self.backend.update(ProductIndex(), self.products)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def search(self, text, **kwargs):
+        query = InProcessSearchQuery()
+        query.add_filter(SQ(content=AutoQuery(text)))
+        return self.backend.search(query.build_query(), **kwargs)
+
+    def test_search(self):
+        train, puzzle = self.products
+        results = self.search(u'wooden', sort_by=['current_price'])
+        self.assertEqual(2, results['hits'])
+        self.assertEqual([str(puzzle.id), str(train.id)], [result.pk for result in results['results']])
+        self.assertEqual(u'Puzzle Box', results['results'][0].name)
+        self.assertEqual([str(train.id)], [result.pk for result in self.search(u'wooden -puzzle')['results']])
+        self.assertEqual(u'wooden train', self.search(u'woodn trian')['spelling_suggestion'])
+
+        self.backend.remove(train)
+        self.assertEqual(1, self.search(u'wooden')['hits'])
+        self.assertEqual([u'puzzle'], self.backend.autocomplete(u'puz'))
+
+
+class TypeaheadTest(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Wooden Toys', slug='wooden-toys', description='-')
+        brand = Brand.objects.create(name='Woodland', slug='woodland', short_description='-', long_description='-')
+        for name in ['Wooden Train', 'Puzzle Box', 'Big Wooden Blocks']:
+            Product.objects.create(name=name, slug=slugify(name), brand=brand, price='10.00', category=category,
+                                   meta_description='-', weight='1.0')
+
+    def test_suggestions(self):
+        suggestions = typeahead.suggest(u'Wood')
+        # names that start with the prefix come first
+        self.assertEqual([u'Wooden Train', u'Big Wooden Blocks'], [p['name'] for p in suggestions['products']])
+        self.assertEqual([u'Woodland'], [b['name'] for b in suggestions['brands']])
+        self.assertEqual(['/products/wooden-toys'], [c['url'] for c in suggestions['categories']])
+        self.assertEqual([], typeahead.suggest(u'w')['products'])
+
+    def test_refreshed_on_change(self):
+        self.assertEqual([], typeahead.suggest(u'rocket')['products'])
+        Product.objects.filter(name='Puzzle Box').update(name='Rocket Ship')
+        # update() sends no signals, so the index isn't rebuilt
+        self.assertEqual([], typeahead.suggest(u'rocket')['products'])
+        Product.objects.get(name='Rocket Ship').save()
+        self.assertEqual([u'Rocket Ship'], [p['name'] for p in typeahead.suggest(u'rocket')['products']])
+
+    def test_view(self):
+        response = self.client.get(reverse('search_typeahead'), {'q': 'puz'})
+        self.assertEqual(200, response.status_code)
+        self.assertTrue('public' in response['Cache-Control'])
+        self.assertEqual([u'Puzzle Box'], [p['name'] for p in json.loads(response.content)['products']])
+
+
+class ResultCacheTest(TestCase):
+
+    def setUp(self):
+        # search an in-process index rather than whatever backend is configured (e.g. Solr)
+        self.directory = tempfile.mkdtemp()
+        self.connection = patch.dict(connections.connections_info, {'default': {
+            'ENGINE': 'search.inprocess_backend.InProcessEngine',
+            'PATH': os.path.join(self.directory, 'index'),
+            'INCLUDE_SPELLING': True,
+        }})
+        self.connection.start()
+        connections.reload('default')
+
+        category = Category.objects.create(name='Toys', slug='toys', description='-')
+        brand = Brand.objects.create(name='Brand', slug='brand', short_description='-', long_description='-')
+        self.product = Product.objects.create(name='Wooden Train', slug='wooden-train', brand=brand, price='10.00',
+                                              category=category, meta_description='-', weight='1.0')
+        connections['default'].get_backend().update(ProductIndex(), [self.product])
+        resultcache.bump_version()
+
+    def tearDown(self):
+        self.connection.stop()
+        connections.reload('default')
+        shutil.rmtree(self.directory)
+
+    def test_results_are_cached(self):
+        with patch.object(resultcache, 'run_search', wraps=resultcache.run_search) as run_search:
+            results = resultcache.search_products(u'wooden')
+            self.assertEqual([self.product.id], results['ids'])
+            self.assertEqual(1, results['total'])
+            self.assertEqual(results, resultcache.search_products(u'  WOODEN '))
+            self.assertEqual(1, run_search.call_count)
+
+            resultcache.bump_version()
+            resultcache.search_products(u'wooden')
+            self.assertEqual(2, run_search.call_count)
@@ -0,0 +1,377 @@
+"""
+A small full text index that lives in the web process: tokenisation, a light English stemmer, BM25 ranking, prefix
+completion and spelling suggestions.  The catalogue is small enough for the whole index to sit in memory, where a
+search costs less than the network round trip to Solr.  See search.inprocess_backend for the Haystack backend that
+uses it.
+
+An index is saved to a single file with marshal, which loads in one read, and IndexFile reloads that file whenever it
+changes on disk, so every process serves the index that was last written by any of them.
+"""
+
+import bisect
+import errno
+import fcntl
+import marshal
+import math
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+FORMAT_VERSION = 1
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it', 'of', 'on', 'or', 'that',
+    'the', 'this', 'to', 'with',
+])
+
+ALPHABET = u'abcdefghijklmnopqrstuvwxyz0123456789'
+
+
+def tokenize(text):
+    """
+    Returns the lower case words of the given text, without stop words.
+    """
+    return [word for word in TOKEN_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def stem(word):
+    """
+    A light English stemmer: strips plural, -ing and -ed endings, and a final 'e', so that 'puzzles', 'puzzle' and
+    'puzzled' all index as 'puzzl'.  It is much less thorough than the Porter stemmer that Solr uses, but it needs
+    to be fast more than it needs to be clever.
+    """
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith('sses'):
+        word = word[:-2]
+    elif word.endswith('ies') and len(word) > 4:
+        word = word[:-3] + 'y'
+    elif word.endswith(('xes', 'ches', 'shes', 'zzes')):
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        word = word[:-1]
+
+    for suffix in ('ing', 'ed'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            root = word[:-len(suffix)]
+            if any(c in 'aeiouy' for c in root):
+                word = root
+                if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+                    word = word[:-1]
+            break
+
+    if word.endswith('e') and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def edit_distance(a, b, limit):
+    """
+    Returns the Levenshtein distance between a and b, or limit + 1 if it is larger than limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = range(len(b) + 1)
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _edits1(word):
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    deletes = [a + b[1:] for a, b in splits if b]
+    transposes = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+    replaces = [a + c + b[1:] for a, b in splits if b for c in ALPHABET]
+    inserts = [a + c + b for a, b in splits for c in ALPHABET]
+    return set(deletes + transposes + replaces + inserts)
+
+
+class TextIndex(object):
+    """
+    An inverted index of documents, each identified by a string and holding some text and a dict of stored fields.
+
+        postings    stem --> {document id: number of occurrences}
+        documents   document id --> (length, stored fields, {stem: occurrences}, [distinct words])
+        words       word --> number of documents it appears in, for completion and spelling suggestions
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}
+        self.words = {}
+        self.total_length = 0
+        self._sorted_words = None
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, doc_id, text, fields=None):
+        """
+        Adds the given document to the index, replacing any document with the same id.
+        """
+        self.remove(doc_id)
+        words = tokenize(text)
+        terms = {}
+        for word in words:
+            term = stem(word)
+            terms[term] = terms.get(term, 0) + 1
+        for term, count in terms.iteritems():
+            self.postings.setdefault(term, {})[doc_id] = count
+        distinct = list(set(words))
+        for word in distinct:
+            self.words[word] = self.words.get(word, 0) + 1
+
+        self.documents[doc_id] = (len(words), fields or {}, terms, distinct)
+        self.total_length += len(words)
+        self._sorted_words = None
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+        length, fields, terms, distinct = document
+        for term in terms:
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+        for word in distinct:
+            self.words[word] -= 1
+            if not self.words[word]:
+                del self.words[word]
+        self.total_length -= length
+        self._sorted_words = None
+
+    def clear(self, predicate=None):
+        """
+        Removes the documents for which predicate(doc_id, fields) is True, or every document if there is no predicate.
+        """
+        if predicate is None:
+            self.__init__()
+            return
+        for doc_id, document in self.documents.items():
+            if predicate(doc_id, document[1]):
+                self.remove(doc_id)
+
+    def fields(self, doc_id):
+        return self.documents[doc_id][1]
+
+    def _expand(self, prefix):
+        """
+        Returns the stems of the indexed words that start with the given prefix.
+        """
+        return set(stem(word) for word in self.complete_words(prefix, limit=None))
+
+    def search(self, terms=(), excluded=(), prefixes=()):
+        """
+        Returns a {document id: BM25 score} dict of the documents that contain every one of 'terms', at least one
+        completion of every one of 'prefixes' and none of 'excluded'.  The terms are words, which are stemmed here.
+        With no terms or prefixes, every document matches with a score of 0.
+        """
+        required = [set([stem(word)]) for word in terms]
+        required += [self._expand(prefix) for prefix in prefixes]
+
+        if not required:
+            scores = dict.fromkeys(self.documents, 0.0)
+        else:
+            scores = None
+            average_length = float(self.total_length) / len(self.documents) if self.documents else 0.0
+            for alternatives in required:
+                matches = {}
+                for term in alternatives:
+                    postings = self.postings.get(term, {})
+                    if not postings:
+                        continue
+                    idf = math.log(1 + (len(self.documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, count in postings.iteritems():
+                        if scores is not None and doc_id not in scores:
+                            continue
+                        length = self.documents[doc_id][0]
+                        norm = K1 * (1 - B + B * length / average_length) if average_length else K1
+                        score = idf * count * (K1 + 1) / (count + norm)
+                        matches[doc_id] = max(matches.get(doc_id, 0.0), score)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = dict((doc_id, scores[doc_id] + score) for doc_id, score in matches.iteritems())
+                if not scores:
+                    return {}
+
+        for word in excluded:
+            for doc_id in self.postings.get(stem(word), {}):
+                scores.pop(doc_id, None)
+        return scores
+
+    def complete_words(self, prefix, limit=10):
+        """
+        Returns the indexed words that start with the given prefix, the most common first.
+        """
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self.words)
+        words = []
+        for i in xrange(bisect.bisect_left(self._sorted_words, prefix), len(self._sorted_words)):
+            word = self._sorted_words[i]
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+        words.sort(key=lambda word: (-self.words[word], word))
+        return words if limit is None else words[:limit]
+
+    def complete(self, text, limit=10):
+        """
+        Returns completions of the given text, made by completing its last word.
+        """
+        words = TOKEN_RE.findall(text.lower())
+        if not words or not text[-1:].isalnum():
+            return []
+        head = u' '.join(words[:-1])
+        return [(head + u' ' + word).strip() for word in self.complete_words(words[-1], limit)]
+
+    def correct(self, word):
+        """
+        Returns the indexed word that is closest to the given word (the most common one if there is a tie), or None
+        if there is nothing within two edits of it.
+        """
+        if word in self.words:
+            return word
+        candidates = [w for w in _edits1(word) if w in self.words]
+        if not candidates and len(word) > 4:
+            candidates = [w for w in self.words if edit_distance(word, w, 2) <= 2]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda w: (self.words[w], w))
+
+    def suggest(self, text):
+        """
+        Returns a spelling correction of the given text, or None if every word of the text is in the index (or can't
+        be corrected).
+        """
+        words = TOKEN_RE.findall(text.lower())
+        corrected = []
+        changed = False
+        for word in words:
+            if word in STOP_WORDS or stem(word) in self.postings:
+                corrected.append(word)
+                continue
+            correction = self.correct(word)
+            if correction is None or correction == word:
+                corrected.append(word)
+            else:
+                corrected.append(correction)
+                changed = True
+        return u' '.join(corrected) if changed else None
+
+    def dumps(self):
+        return marshal.dumps((FORMAT_VERSION, self.postings, self.documents, self.words, self.total_length))
+
+    @classmethod
+    def loads(cls, data):
+        index = cls()
+        version, index.postings, index.documents, index.words, index.total_length = marshal.loads(data)
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported search index format %r" % version)
+        return index
+
+
+class IndexFile(object):
+    """
+    A TextIndex that is saved to the given path.  get() returns the index as it was last saved by any process, and
+    modify() is used to change it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._index = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError, e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+        return stat.st_mtime, stat.st_size, stat.st_ino
+
+    def _load(self):
+        with open(self.path, 'rb') as f:
+            return TextIndex.loads(f.read())
+
+    def get(self):
+        """
+        Returns the index, reloading it first if the file has changed since it was last read.
+        """
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp != self._stamp or self._index is None:
+                self._index = self._load() if stamp is not None else TextIndex()
+                self._stamp = stamp
+            return self._index
+
+    def _save(self, index):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # write a new file and rename it over the old one, so readers never see a partly written index
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.search-index-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(index.dumps())
+            os.rename(temp_path, self.path)
+        except:
+            os.unlink(temp_path)
+            raise
+
+    @contextmanager
+    def modify(self):
+        """
+        A context manager that yields the current index for changing, and saves it on exit.  Changes made by several
+        processes at once are serialised with a lock file next to the index.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with self._lock:
+                    stamp = self._file_stamp()
+                    index = self._load() if stamp is not None else TextIndex()
+                yield index
+                with self._lock:
+                    self._save(index)
+                    self._index, self._stamp = index, self._file_stamp()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+_index_files = {}
+_index_files_lock = threading.Lock()
+
+
+def get_index_file(path):
+    """
+    Returns the IndexFile for the given path, which is shared by every backend that uses the same path.
+    """
+    path = os.path.abspath(path)
+    with _index_files_lock:
+        if path not in _index_files:
+            _index_files[path] = IndexFile(path)
+        return _index_files[path]
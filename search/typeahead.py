@@ -0,0 +1,134 @@
+"""
+Search box suggestions: the products, brands and categories whose names start with what has been typed so far.
+
+The suggestions come from a prefix index that is held in memory by each process: a sorted list of (key, entry)
+pairs, with one key for every word of every name, so a lookup is a binary search followed by a short scan.  The index
+is built with three small queries and is stamped with the catalogue version, which changes whenever a product,
+brand or category is saved or deleted (see catalogue.signals).  A process rebuilds its index on the first lookup after
+the version changes, so a lookup normally costs one cache read.
+"""
+
+import bisect
+import threading
+import uuid
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from catalogue.models import Product, Brand, Category
+from search.textindex import TOKEN_RE
+
+PRODUCT = 'products'
+BRAND = 'brands'
+CATEGORY = 'categories'
+
+# the number of suggestions of each kind
+LIMITS = {
+    PRODUCT: 6,
+    BRAND: 3,
+    CATEGORY: 3,
+}
+
+MIN_PREFIX_LENGTH = 2
+
+VERSION_KEY = 'typeahead-version'
+VERSION_TIMEOUT = 30 * 24 * 60 * 60
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(VERSION_KEY, version, VERSION_TIMEOUT)
+    return version
+
+
+def bump_version():
+    """
+    Makes every process rebuild its typeahead index on its next lookup.
+    """
+    cache.set(VERSION_KEY, uuid.uuid4().hex, VERSION_TIMEOUT)
+
+
+def normalize(text):
+    return u' '.join(TOKEN_RE.findall(text.lower()))
+
+
+class PrefixIndex(object):
+    """
+    Finds the names that have a word starting with a given prefix.  Entries are (kind, name, url) tuples.  Names that
+    start with the prefix come before names that only have a later word starting with it, and otherwise names are in
+    alphabetical order.
+    """
+
+    def __init__(self, entries):
+        self.entries = sorted(entries, key=lambda entry: entry[1].lower())
+        keys = []
+        for position, (kind, name, url) in enumerate(self.entries):
+            words = normalize(name).split()
+            for i in range(len(words)):
+                # (key, is a later word, position) sorts the best match for a prefix first
+                keys.append((u' '.join(words[i:]), i > 0, position))
+        keys.sort()
+        self.keys = keys
+
+    def lookup(self, prefix, limits=LIMITS):
+        """
+        Returns a map from kind --> list of {'name': ..., 'url': ...} dicts, with at most limits[kind] entries of
+        each kind.
+        """
+        prefix = normalize(prefix)
+        matches = dict((kind, []) for kind in limits)
+        if not prefix:
+            return matches
+
+        # collect the matching positions, then order them by (is a later word, position)
+        found = {}
+        for i in xrange(bisect.bisect_left(self.keys, (prefix,)), len(self.keys)):
+            key, later, position = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            if position not in found or not later:
+                found[position] = later
+
+        for position in sorted(found, key=lambda position: (found[position], position)):
+            kind, name, url = self.entries[position]
+            if len(matches[kind]) < limits[kind]:
+                matches[kind].append({'name': name, 'url': url})
+        return matches
+
+
+def build_index():
+    entries = []
+    for name, slug in Product.active.values_list('name', 'slug'):
+        entries.append((PRODUCT, name, reverse('catalogue_product', kwargs={'slug': slug})))
+    for name, slug in Brand.objects.values_list('name', 'slug'):
+        entries.append((BRAND, name, reverse('brand', kwargs={'brand_slug': slug})))
+    for name, slug in Category.objects.values_list('name', 'slug'):
+        entries.append((CATEGORY, name, reverse('catalogue_category', kwargs={'category_slug': slug})))
+    return PrefixIndex(entries)
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Returns the typeahead index of the current catalogue.
+    """
+    global _index, _index_version
+    version = get_version()
+    with _index_lock:
+        if _index is None or _index_version != version:
+            _index = build_index()
+            _index_version = version
+        return _index
+
+
+def suggest(prefix):
+    """
+    Returns the products, brands and categories whose names match the given prefix, see PrefixIndex.lookup.
+    """
+    if len(prefix.strip()) < MIN_PREFIX_LENGTH:
+        return dict((kind, []) for kind in LIMITS)
+    return get_index().lookup(prefix)
@@ -1,6 +1,7 @@
 from django.conf.urls import patterns, url
-from search.views import product_search_view
+from search.views import product_search_view, typeahead_view
 
 urlpatterns = patterns('',
                         url(r'^products$', product_search_view, name="product_search"),
+                        url(r'^typeahead$', typeahead_view, name="search_typeahead"),
                         )
@@ -1,10 +1,21 @@
 # Create your views here.
 from search.forms import SearchForm
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, HttpResponse
 from django.core.urlresolvers import reverse
-from django.views.decorators.http import require_POST
+from django.utils.cache import patch_cache_control
+from django.utils.http import is_safe_url
+from django.views.decorators.http import require_POST, require_GET
+from django.views.decorators.csrf import csrf_exempt
+from search import typeahead
+import json
 import urllib
 
+# typeahead responses are the same for everyone, so browsers and the CDN can cache them for a while
+TYPEAHEAD_MAX_AGE = 5 * 60
+
+# the search form is on every page, and a CSRF token would keep those pages out of the page cache (see
+# utils.pagecache).  The view only redirects to the search results, so it has nothing to protect.
+@csrf_exempt
 @require_POST
 def product_search_view(request):
     post_data = request.POST.copy()
@@ -16,4 +27,21 @@ def product_search_view(request):
         url = reverse('catalogue_category', kwargs={'category_slug': category_slug})
         params['search'] = q
         return HttpResponseRedirect(url + "?" + urllib.urlencode(params))
-    return HttpResponseRedirect(post_data['from'] + "?" + urllib.urlencode(params))
+    # the form can be posted from anywhere, so only go back to pages on this site
+    from_url = post_data.get('from', '')
+    if not from_url or not is_safe_url(from_url, host=request.get_host()):
+        from_url = reverse('catalogue_category', kwargs={'category_slug': ''})
+    return HttpResponseRedirect(from_url + "?" + urllib.urlencode(params))
+
+
+@require_GET
+def typeahead_view(request):
+    """
+    Returns the products, brands and categories whose names match the 'q' parameter, as JSON.
+    """
+    q = request.GET.get('q', '')[:50]
+    data = typeahead.suggest(q)
+    data['query'] = q
+    response = HttpResponse(json.dumps(data), content_type='application/json')
+    patch_cache_control(response, public=True, max_age=TYPEAHEAD_MAX_AGE)
+    return response
@@ -38,3 +38,50 @@ var refresh_cart_summary = function() {
         Y.Custom.ajax_reload(node, '{% url ajax_cart_summary %}');
     });
 };
+
+// pages served from the page cache can leave the per-user parts (the cart summary, the account links) as empty
+// placeholders.  Fill them all in with a single request.
+Y.use('json-parse', function(Y) {
+    var placeholders = Y.all('.page-hole');
+    if (placeholders.isEmpty()) {
+        return;
+    }
+    var names = [];
+    placeholders.each(function(node) {
+        names.push('hole=' + encodeURIComponent(node.getData('hole')));
+    });
+    Y.io('{% url page_holes %}?' + names.join('&'), {
+        timeout: Y.Custom.DEFAULT_AJAX_TIMEOUT,
+        on: {
+            success: function(id, o) {
+                var holes = Y.JSON.parse(o.responseText);
+                placeholders.each(function(node) {
+                    node.setHTML(holes[node.getData('hole')] || '');
+                });
+            }
+        }
+    });
+});
+
+// suggest products, brands and categories as the customer types in the search bar
+Y.use('autocomplete', 'autocomplete-highlighters', 'json-parse', function(Y) {
+    Y.all("form#search input#id_q").each(function(searchBox) {
+        searchBox.plug(Y.Plugin.AutoComplete, {
+            source: '{% url search_typeahead %}?q={query}',
+            minQueryLength: 2,
+            queryDelay: 100,
+            maxResults: 12,
+            resultHighlighter: 'wordMatch',
+            resultTextLocator: 'name',
+            resultListLocator: function(response) {
+                var data = response || {};
+                return (data.products || []).concat(data.brands || [], data.categories || []);
+            }
+        });
+        searchBox.ac.on('select', function(e) {
+            // go straight to the product, brand or category page
+            e.preventDefault();
+            window.location = e.result.raw.url;
+        });
+    });
+});
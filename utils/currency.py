@@ -0,0 +1,97 @@
+"""
+Currency formatting, for prices, totals and the price filters.
+
+The format of each currency (symbol, separators, grouping and the number of decimal places) is set up once, when
+this module is imported, and formatting an amount is plain Decimal arithmetic and string handling.  This replaces
+locale.currency, which reads the formatting rules from the process-wide locale: setting that locale on every call was
+slow, depended on the locales installed on the server and wasn't safe with more than one thread per process.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from django.conf import settings
+
+DEFAULT_CURRENCY = 'CAD'
+
+
+class CurrencyFormat(object):
+    """
+    How amounts of one currency are written, e.g. CurrencyFormat('USD', u'$').format(Decimal('-1234.5')) is
+    u'-$1,234.50'.
+    """
+
+    def __init__(self, code, symbol, decimal_places=2, decimal_point=u'.', thousands_separator=u',', grouping=3,
+                 symbol_first=True, symbol_separator=u''):
+        self.code = code
+        self.symbol = symbol
+        self.decimal_places = decimal_places
+        self.decimal_point = decimal_point
+        self.thousands_separator = thousands_separator
+        self.grouping = grouping
+        self.symbol_first = symbol_first
+        self.symbol_separator = symbol_separator
+        self.quantum = Decimal(1).scaleb(-decimal_places)
+
+    def _group(self, digits):
+        groups = []
+        while len(digits) > self.grouping:
+            groups.append(digits[-self.grouping:])
+            digits = digits[:-self.grouping]
+        groups.append(digits)
+        return self.thousands_separator.join(reversed(groups))
+
+    def format(self, amount, symbol=True, grouping=True):
+        """
+        Returns the given amount, rounded to the currency's decimal places, as text.  The amount can be a Decimal, an
+        int, a float or a numeric string.
+        """
+        amount = to_decimal(amount).quantize(self.quantum, rounding=ROUND_HALF_UP)
+        negative = amount < 0
+        integer, _, fraction = unicode(abs(amount)).partition(u'.')
+        if grouping:
+            integer = self._group(integer)
+        text = integer + self.decimal_point + fraction if fraction else integer
+
+        if symbol:
+            if self.symbol_first:
+                text = self.symbol + self.symbol_separator + text
+            else:
+                text = text + self.symbol_separator + self.symbol
+        return u'-' + text if negative else text
+
+
+CURRENCIES = dict((f.code, f) for f in [
+    CurrencyFormat('CAD', u'$'),
+    CurrencyFormat('USD', u'$'),
+    CurrencyFormat('EUR', u'\u20ac'),
+    CurrencyFormat('GBP', u'\xa3'),
+    CurrencyFormat('JPY', u'\xa5', decimal_places=0),
+])
+
+
+def to_decimal(amount):
+    if isinstance(amount, float):
+        # repr gives the shortest string that reads back as the same float, ie. 0.1 rather than 0.1000000000000000055
+        amount = repr(amount)
+    try:
+        value = Decimal(amount)
+    except InvalidOperation:
+        raise ValueError("Not an amount: %r" % (amount,))
+    if not value.is_finite():
+        raise ValueError("Not an amount: %r" % (amount,))
+    return value
+
+
+def get_format(code=None):
+    """
+    Returns the CurrencyFormat of the given currency code, or of settings.CURRENCY if there is no code.  Raises
+    ValueError for an unknown code.
+    """
+    code = code or getattr(settings, 'CURRENCY', DEFAULT_CURRENCY)
+    try:
+        return CURRENCIES[code]
+    except KeyError:
+        raise ValueError("Not a currency code: %r" % (code,))
+
+
+def format_currency(amount, code=None, symbol=True, grouping=True):
+    return get_format(code).format(amount, symbol=symbol, grouping=grouping)
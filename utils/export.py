@@ -0,0 +1,181 @@
+"""
+Helpers for streaming large querysets out of the database as CSV or JSON without materializing the whole result set.
+
+Rows are read in bounded, primary-key ordered chunks (keyset pagination) rather than with OFFSET or a single
+queryset iteration.  This keeps memory use flat regardless of the table size, and it makes every export resumable:
+the primary key of the last exported row is the cursor that picks the export up where it left off.
+"""
+
+import csv
+import json
+from django.db import reset_queries
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.core.exceptions import PermissionDenied
+from django.core.serializers.json import DjangoJSONEncoder
+
+DEFAULT_CHUNK_SIZE = 500
+
+CSV = 'csv'
+JSON = 'json'
+FORMATS = (CSV, JSON)
+
+CONTENT_TYPES = {
+    CSV: 'text/csv; charset=utf-8',
+    JSON: 'application/json; charset=utf-8',
+}
+
+
+def iterate_in_chunks(queryset, chunk_size=DEFAULT_CHUNK_SIZE, after=None):
+    """
+    Yields lists of at most chunk_size model instances from the given queryset, in increasing primary key order.
+    Only instances with a primary key greater than 'after' are returned.  Each chunk is a separate query, so only
+    one chunk is ever held in memory at a time.
+    """
+    queryset = queryset.order_by('pk')
+    while True:
+        chunk_queryset = queryset
+        if after is not None:
+            chunk_queryset = chunk_queryset.filter(pk__gt=after)
+        chunk = list(chunk_queryset[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        after = chunk[-1].pk
+        # with DEBUG = True django remembers every query it runs, which would make a long export grow without bound
+        reset_queries()
+        if len(chunk) < chunk_size:
+            return
+
+
+ADDRESS_FIELDS = ('name', 'line1', 'line2', 'city', 'region', 'country', 'post_code', 'phone')
+
+
+def address_dict(address):
+    """
+    Returns the exportable fields of an AbstractAddress as a dictionary, or None if there is no address.
+    """
+    if address is None:
+        return None
+    row = dict((field, getattr(address, field)) for field in ADDRESS_FIELDS)
+    row['country'] = unicode(address.country)
+    return row
+
+
+class _Echo(object):
+    """
+    A file-like object that hands back whatever is written to it, so that csv.writer can be used as a line
+    formatter inside of a generator.
+    """
+    def write(self, value):
+        return value
+
+
+def _encode(value):
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+def csv_lines(columns, rows):
+    """
+    Generates the lines of a CSV document.  columns is a list of (key, header) pairs and rows is an iterable of
+    dictionaries.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow([_encode(header) for _, header in columns])
+    for row in rows:
+        yield writer.writerow([_encode(row.get(key)) for key, _ in columns])
+
+
+def json_lines(rows):
+    """
+    Generates a JSON array of the given row dictionaries, one element per line.
+    """
+    yield '['
+    separator = '\n'
+    for row in rows:
+        yield separator + json.dumps(row, cls=DjangoJSONEncoder)
+        separator = ',\n'
+    yield '\n]\n'
+
+
+def export_lines(format, columns, rows):
+    if format == CSV:
+        return csv_lines(columns, rows)
+    elif format == JSON:
+        return json_lines(rows)
+    raise ValueError("Unrecognized export format: %s" % format)
+
+
+def export_to_file(out, format, columns, rows):
+    """
+    Writes the export to the given file-like object.  Returns the number of rows written together with the id of the
+    last row written, which can be passed back in as the 'after' cursor to resume the export.
+    """
+    progress = {'count': 0, 'cursor': None}
+
+    def tracking(rows):
+        for row in rows:
+            progress['count'] += 1
+            progress['cursor'] = row.get('id')
+            yield row
+
+    for line in export_lines(format, columns, tracking(rows)):
+        out.write(line)
+    return progress['count'], progress['cursor']
+
+
+def export_response(format, columns, rows, filename):
+    """
+    Returns an HttpResponse that streams the export to the client.  The response content is a generator, so the
+    rows are only read from the database as the response is being written out.  Nothing downstream may access
+    response.content, or the whole export will be buffered in memory.
+    """
+    response = HttpResponse(export_lines(format, columns, rows), content_type=CONTENT_TYPES[format])
+    response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (filename, format)
+    return response
+
+
+class ExportAdminMixin(object):
+    """
+    Adds streaming CSV and JSON exports to a ModelAdmin, both as actions on the selected rows and as an 'export/'
+    url that exports every row.  The url accepts 'format' and 'after' query parameters, where 'after' is the id of the
+    last row of a previous (interrupted) export.  Subclasses must implement export().
+    """
+    actions = ['export_as_csv', 'export_as_json']
+
+    def export(self, format, queryset=None, after=None):
+        """
+        Returns a streaming response that exports the given queryset (or every row) in the given format.
+        """
+        raise NotImplementedError
+
+    def export_as_csv(self, request, queryset):
+        return self.export(CSV, queryset=queryset)
+    export_as_csv.short_description = "Export selected rows as CSV"
+
+    def export_as_json(self, request, queryset):
+        return self.export(JSON, queryset=queryset)
+    export_as_json.short_description = "Export selected rows as JSON"
+
+    def get_urls(self):
+        from django.conf.urls import patterns, url
+        info = self.model._meta.app_label, self.model._meta.module_name
+        urls = patterns('',
+                        url(r'^export/$', self.admin_site.admin_view(self.export_view), name='%s_%s_export' % info))
+        return urls + super(ExportAdminMixin, self).get_urls()
+
+    def export_view(self, request):
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        format = request.GET.get('format', CSV)
+        if format not in FORMATS:
+            return HttpResponseBadRequest("Unrecognized export format: %s" % format)
+        after = request.GET.get('after', None)
+        try:
+            after = int(after) if after else None
+        except ValueError:
+            return HttpResponseBadRequest("The 'after' cursor must be an integer id.")
+        return self.export(format, after=after)
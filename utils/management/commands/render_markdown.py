@@ -0,0 +1,33 @@
+import sys
+from django.core.management.base import BaseCommand
+from blog.models import Post
+from catalogue.models import Product
+
+BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = "Re-renders the stored HTML of the markdown fields of blog posts and products."
+
+    def handle(self, *args, **options):
+        self.render(Post, ('body',), 'render_body')
+        self.render(Product, ('short_description', 'long_description'), 'render_descriptions')
+
+    def render(self, model, fields, render_method):
+        """
+        Updates the stored HTML with update() rather than save(), so that the objects' modification dates (and
+        anything else that runs on save) are left alone.
+        """
+        html_fields = ['%s_html' % field for field in fields]
+        count = 0
+        after = 0
+        while True:
+            batch = list(model.objects.filter(id__gt=after).order_by('id').only('id', *fields)[:BATCH_SIZE])
+            if not batch:
+                break
+            after = batch[-1].id
+            for obj in batch:
+                getattr(obj, render_method)()
+                model.objects.filter(id=obj.id).update(**dict((field, getattr(obj, field)) for field in html_fields))
+            count += len(batch)
+        sys.stderr.write("Rendered %d %s.\n" % (count, model._meta.verbose_name_plural))
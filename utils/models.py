@@ -2,7 +2,7 @@ from django.db import models
 from utils.validators import not_blank
 from django_countries import CountryField
 from arthurcode import settings
-from comments.akismet import comment_check, AkismetError, verify_key, submit_spam, submit_ham
+from comments import spamcheck
 from django.contrib.sites.models import Site
 from utils.util import get_full_url
 
@@ -99,54 +99,15 @@ class AkismetMixin(object):
         """
         Returns True if the comment is spam and False if it's ham.
         """
-        key = self._get_key()
-
-        if not key:
-            # TODO: log a warning
+        if not spamcheck.get_key():
             return False
-
-        domain = self._get_domain()
-
-        try:
-            if verify_key(key, domain):
-                data = self.get_spam_data(request)
-                return comment_check(key, domain, **data)
-        except AkismetError, e:
-            # TODO: log a warning with the exception
-            print e.response, e.statuscode
-        return False
+        return spamcheck.is_spam(self._get_domain(), self.get_spam_data(request))
 
     def marked_as_spam(self):
-        key = self._get_key()
-        if not key:
-            return
-
-        domain = self._get_domain()
-        try:
-            if verify_key(key, domain):
-                data = self.get_spam_data()
-                submit_spam(key, domain, **data)
-        except AkismetError, e:
-            print e.response, e.statuscode
+        spamcheck.report_spam(self._get_domain(), self.get_spam_data())
 
     def marked_not_spam(self):
-        key = self._get_key()
-        if not key:
-            return
-
-        domain = self._get_domain()
-        try:
-            if verify_key(key, domain):
-                data = self.get_spam_data()
-                submit_ham(key, domain, **data)
-        except AkismetError, e:
-            print e.response, e.statuscode
-
-    def _get_key(self):
-        return getattr(settings, 'AKISMET_KEY', None)
+        spamcheck.report_ham(self._get_domain(), self.get_spam_data())
 
     def _get_domain(self):
         return Site.objects.get_current().domain
-
-
-
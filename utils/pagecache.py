@@ -0,0 +1,199 @@
+"""
+A full page cache.
+
+Views opt in with the page_cache decorator, naming the version groups their pages depend on:
+
+    @page_cache('catalogue')
+    def brands_view(request):
+        ...
+
+PageCacheMiddleware saves the response of a GET to such a view, and serves it to the next GET of the same URL without
+calling the view, for up to settings.PAGE_CACHE_TIMEOUT seconds.  Each version group has a version in the cache that
+is changed by bump_version whenever the data behind the pages changes (see catalogue.signals, reviews.signals and
+blog.signals), and a saved page is only served while the versions it was saved with are current.
+
+Parts of a page that differ from one visitor to the next, such as the cart summary and the account links, are left
+out of the saved page as named holes (see hole and the page_hole template tag), and are rendered by the functions in
+settings.PAGE_CACHE_HOLES.  By default the holes are filled in each time the page is served.  With
+settings.PAGE_CACHE_AJAX_HOLES the page is served as it was saved, with empty placeholders that base_site.js fills in
+with a single request to utils.views.page_holes_view, so that serving a page that is cached for every user (see
+below) reads neither the session nor the DB.
+
+Pages are only saved for and served to anonymous visitors, unless the view is marked with authenticated=True, which
+says that everything on its pages that depends on the user is in a hole.  A page isn't saved if rendering it used the
+CSRF token, showed or added messages, or set a cookie, since those are per-visitor too.
+"""
+
+import hashlib
+import re
+import uuid
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.importlib import import_module
+from django.utils.safestring import mark_safe
+
+VERSION_TIMEOUT = 30 * 24 * 60 * 60
+DEFAULT_TIMEOUT = 10 * 60
+
+CATALOGUE = 'catalogue'
+BLOG = 'blog'
+
+HOLE_RE = re.compile(r'<!--hole:(\w+)-->(.*?)<!--endhole-->', re.DOTALL)
+EMPTY_HOLE_RE = re.compile(r'<!--hole:(\w+)-->')
+PLACEHOLDER = '<span class="page-hole" data-hole="%s"></span>'
+
+
+def _version_key(group):
+    return 'page-cache-version-%s' % group
+
+
+def get_versions(groups):
+    """
+    Returns a {group: version} dict of the current versions of the given groups.
+    """
+    keys = dict((_version_key(group), group) for group in groups)
+    versions = dict((keys[key], version) for key, version in cache.get_many(keys.keys()).items())
+    for group in groups:
+        if group not in versions:
+            versions[group] = uuid.uuid4().hex
+            cache.set(_version_key(group), versions[group], VERSION_TIMEOUT)
+    return versions
+
+
+def bump_version(group):
+    """
+    Invalidates the saved pages that depend on the given group.
+    """
+    cache.set(_version_key(group), uuid.uuid4().hex, VERSION_TIMEOUT)
+
+
+def page_cache(*groups, **options):
+    """
+    Marks a view as one whose GETs can be served from the page cache, which is invalidated when any of the given
+    version groups changes.  Only anonymous GETs are cached unless authenticated=True is given.
+    """
+    authenticated = options.pop('authenticated', False)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return view(request, *args, **kwargs)
+        wrapper.page_cache_groups = groups
+        wrapper.page_cache_authenticated = authenticated
+        return wrapper
+    return decorator
+
+
+def skip(request):
+    """
+    Keeps the current response out of the page cache, for views that have to run on every request for some URLs.
+    """
+    request._page_cache_groups = None
+
+
+def is_caching(request):
+    return getattr(request, '_page_cache_groups', None) is not None
+
+
+def hole(request, name, content):
+    """
+    Marks the given rendered content as the hole with the given name, if the current page is going to be saved.
+    settings.PAGE_CACHE_HOLES[name] must be a function that renders the same content given a request.
+    """
+    if not is_caching(request):
+        return content
+    return mark_safe(u'<!--hole:%s-->%s<!--endhole-->' % (name, content))
+
+
+_hole_functions = {}
+
+
+def _hole_function(name):
+    if name not in _hole_functions:
+        module_name, function_name = settings.PAGE_CACHE_HOLES[name].rsplit('.', 1)
+        _hole_functions[name] = getattr(import_module(module_name), function_name)
+    return _hole_functions[name]
+
+
+def render_hole(request, name):
+    """
+    Returns the content of the hole with the given name for the given request.
+    """
+    return _hole_function(name)(request)
+
+
+def fill_holes(request, content):
+    return EMPTY_HOLE_RE.sub(lambda match: render_hole(request, match.group(1)).encode('utf-8'), content)
+
+
+def placeholder_holes(content):
+    return EMPTY_HOLE_RE.sub(lambda match: PLACEHOLDER % match.group(1), content)
+
+
+def _page_key(request):
+    url = request.get_host() + request.get_full_path()
+    return 'page-cache-%s' % hashlib.md5(url.encode('utf-8')).hexdigest()
+
+
+def _is_cacheable_request(request, authenticated):
+    return request.method in ('GET', 'HEAD') and (authenticated or not request.user.is_authenticated())
+
+
+def _uses_messages(request):
+    storage = getattr(request, '_messages', None)
+    return storage is not None and (storage.used or storage.added_new)
+
+
+class PageCacheMiddleware(object):
+    """
+    Serves and saves the pages of the views marked with page_cache.  Must come after the authentication and message
+    middleware.
+    """
+
+    def process_request(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        page = cache.get(_page_key(request))
+        if page is None or not _is_cacheable_request(request, page['authenticated']) or \
+                get_versions(page['versions'].keys()) != page['versions']:
+            return None
+
+        if getattr(settings, 'PAGE_CACHE_AJAX_HOLES', False):
+            content = placeholder_holes(page['content'])
+        else:
+            content = fill_holes(request, page['content'])
+        response = HttpResponse(content, status=page['status'])
+        for header, value in page['headers']:
+            response[header] = value
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        groups = getattr(view_func, 'page_cache_groups', None)
+        authenticated = getattr(view_func, 'page_cache_authenticated', False)
+        if groups is not None and _is_cacheable_request(request, authenticated):
+            request._page_cache_groups = groups
+            request._page_cache_authenticated = authenticated
+            # the versions are read before the view runs, so a change made while it runs invalidates the page
+            request._page_cache_versions = get_versions(groups)
+        return None
+
+    def process_response(self, request, response):
+        if not is_caching(request):
+            return response
+
+        content = response.content
+        if request.method == 'GET' and response.status_code == 200 and not response.cookies and \
+                not request.META.get('CSRF_COOKIE_USED') and not _uses_messages(request):
+            page = {
+                'versions': request._page_cache_versions,
+                'authenticated': request._page_cache_authenticated,
+                'status': response.status_code,
+                'headers': response.items(),
+                'content': HOLE_RE.sub(r'<!--hole:\1-->', content),
+            }
+            cache.set(_page_key(request), page, getattr(settings, 'PAGE_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+
+        response.content = HOLE_RE.sub(r'\2', content)
+        return response
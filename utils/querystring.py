@@ -0,0 +1,86 @@
+"""
+The query string of the current request, parsed once.
+
+A category page has a link for every filter, sort and page, and each link is the current query string with a
+parameter or two added or removed.  get_query_params(request) parses the query string the first time it is called
+for a request and returns the same QueryParams after that, and QueryParams remembers both its encoding and the result
+of each change made to it, so the links that make the same change (e.g. removing 'page') share the work.
+"""
+
+from urlparse import parse_qsl
+from django.utils.http import urlencode
+
+
+class QueryParams(object):
+    """
+    An immutable list of (key, value) query parameters, in query string order.
+    """
+
+    def __init__(self, params=()):
+        self.params = tuple(params)
+        self._encoded = None
+        self._changes = {}
+
+    @classmethod
+    def parse(cls, query_string):
+        return cls(parse_qsl(query_string))
+
+    def __iter__(self):
+        return iter(self.params)
+
+    def __len__(self):
+        return len(self.params)
+
+    def get(self, key, default=None):
+        for k, value in self.params:
+            if k == key:
+                return value
+        return default
+
+    def with_changes(self, add=None, remove=None):
+        """
+        Returns a QueryParams without the keys in 'remove', and with the {key: value} parameters in 'add'.  A value
+        in 'add' replaces every parameter with the same key, taking the place of the first one (a value of None
+        removes them all), and the others are added at the end.
+        """
+        add = add or {}
+        remove = remove or ()
+        key = (tuple(sorted(add.items())), tuple(remove))
+        changed = self._changes.get(key)
+        if changed is None:
+            changed = self._changes[key] = QueryParams(self._changed(dict(add), remove))
+        return changed
+
+    def _changed(self, add, remove):
+        params = []
+        replaced = set()
+        for key, value in self.params:
+            if key in remove or key in replaced:
+                continue
+            if key in add:
+                # use the new value as long as it is not None, and drop the later parameters with the same key
+                value = add.pop(key)
+                replaced.add(key)
+                if value is None:
+                    continue
+            params.append((key, value))
+
+        for key, value in add.items():
+            if value is not None:
+                params.append((key, value))
+        return params
+
+    def urlencode(self):
+        if self._encoded is None:
+            self._encoded = urlencode(self.params, doseq=True)
+        return self._encoded
+
+
+def get_query_params(request):
+    """
+    Returns the QueryParams of the given request's query string.
+    """
+    params = getattr(request, '_query_params', None)
+    if params is None:
+        params = request._query_params = QueryParams.parse(request.META.get('QUERY_STRING', ''))
+    return params
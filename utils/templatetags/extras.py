@@ -1,9 +1,8 @@
 
 from django.template import Library, Node, resolve_variable
 from django.utils.safestring import mark_safe
-import locale
-import urllib
-from urlparse import parse_qsl
+from utils.currency import format_currency
+from utils.querystring import QueryParams, get_query_params
 
 register = Library()
 
@@ -13,10 +12,8 @@ class AddGetParameter(Node):
 
     def render(self, context):
         req = resolve_variable('request', context)
-        params = req.GET.copy()
-        for key, value in self.values.items():
-            params[key] = value.resolve(context)
-        return '?%s' %  params.urlencode()
+        values = dict((key, value.resolve(context)) for key, value in self.values.items())
+        return '?%s' % get_query_params(req).with_changes(values).urlencode()
 
 
 @register.tag
@@ -70,8 +67,7 @@ def query_string(context, add=None, remove=None):
     add = string_to_dict(add)
     remove = string_to_list(remove)
     request = context['request']
-    params = parse_qsl(request.META['QUERY_STRING'])
-    response = get_query_string(params, add, remove)
+    response = mark_safe("?" + get_query_params(request).with_changes(add, remove).urlencode())
     return {'response': response }
 
 
@@ -79,28 +75,12 @@ def query_string(context, add=None, remove=None):
 def get_query_string(p, new_params=None, remove=None):
     """
     Add and remove query parameters. From `django.contrib.admin`.
-    p is a list of existing query params: [(key, value), (key, value) ...]
+    p is a list of existing query params: [(key, value), (key, value) ...], or a QueryParams
     New params are added to the end of the existing query sequence.
     """
-    final_params = []
-    if new_params is None: new_params = {}
-    if remove is None: remove = []
-
-    for (key, value) in p:
-        if key in remove:
-            continue
-        if key in new_params:
-            # use the new value as long as it is not None
-            value = new_params[key]
-            del(new_params[key])
-            if value is None:
-                continue
-        final_params.append((key, value))
-
-    for key, value in new_params.items():
-        if value is not None:
-            final_params.append((key, value))
-    return mark_safe("?" + urllib.urlencode(final_params, doseq=True))
+    if not isinstance(p, QueryParams):
+        p = QueryParams(p)
+    return mark_safe("?" + p.with_changes(new_params, remove).urlencode())
 
 
 def string_to_dict(string):
@@ -144,13 +124,16 @@ def string_to_list(string):
     return args
 
 @register.filter(name='currency')
-def currency(value):
+def currency(value, code=None):
+    """
+    Formats a price in settings.CURRENCY, or in the currency with the given code, see utils.currency.
+
+    Usage: {{ product.price|currency }} or {{ price|currency:"USD" }}
+    """
     try:
-        locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
-    except:
-        locale.setlocale(locale.LC_ALL, '')
-    loc = locale.localeconv()
-    return locale.currency(value, loc['currency_symbol'], grouping=True)
+        return format_currency(value, code)
+    except (TypeError, ValueError):
+        return u''
 
 
 @register.filter
@@ -0,0 +1,13 @@
+from django import template
+from utils import pagecache
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_hole(context, name):
+    """
+    Renders the page cache hole with the given name (see settings.PAGE_CACHE_HOLES) for the current request.
+    """
+    request = context['request']
+    return pagecache.hole(request, name, pagecache.render_hole(request, name))
@@ -5,9 +5,24 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse
+from django.template import Context, Template
 from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from mock import patch
+from utils import pagecache
+from utils.currency import CurrencyFormat, format_currency
+from utils.querystring import QueryParams, get_query_params
+from utils.templatetags.extras import currency
+from decimal import Decimal
 from utils.templatetags import form_tags
 from string import replace
+import json
 
 
 # utils for testing forms
@@ -89,4 +104,142 @@ class FormTest(TestCase):
         if not field:
             field = self.get_field(form, label=field_name)
         self.assertIsNotNone(field)
-        self.assert_error(field, error)
\ No newline at end of file
+        self.assert_error(field, error)
+
+def render_visitor(request):
+    return request.COOKIES.get('visitor', u'nobody')
+
+
+@override_settings(PAGE_CACHE_HOLES=dict(settings.PAGE_CACHE_HOLES, visitor='utils.tests.render_visitor'))
+class PageCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.middleware = pagecache.PageCacheMiddleware()
+        self.calls = 0
+
+        self.view = pagecache.page_cache(pagecache.CATALOGUE)(self.render)
+
+    def render(self, request):
+        self.calls += 1
+        content = u'<p>%d</p><p>%s</p>' % (self.calls, pagecache.hole(request, 'visitor', render_visitor(request)))
+        return HttpResponse(content)
+
+    def get(self, path='/page', visitor=None, user=None):
+        request = self.factory.get(path)
+        request.user = user or AnonymousUser()
+        if visitor:
+            request.COOKIES['visitor'] = visitor
+        response = self.middleware.process_request(request)
+        if response is None:
+            self.middleware.process_view(request, self.view, (), {})
+            response = self.middleware.process_response(request, self.view(request))
+        return response.content
+
+    def test_cached_page_with_holes(self):
+        self.assertEqual(self.get(visitor='ann'), '<p>1</p><p>ann</p>')
+        self.assertEqual(self.get(visitor='bob'), '<p>1</p><p>bob</p>')
+        self.assertEqual(self.get(), '<p>1</p><p>nobody</p>')
+        self.assertEqual(self.get('/page?page=2'), '<p>2</p><p>nobody</p>')
+        self.assertEqual(self.calls, 2)
+
+    def test_invalidation(self):
+        self.get()
+        pagecache.bump_version(pagecache.BLOG)
+        self.assertEqual(self.get(), '<p>1</p><p>nobody</p>')
+        pagecache.bump_version(pagecache.CATALOGUE)
+        self.assertEqual(self.get(), '<p>2</p><p>nobody</p>')
+
+    def test_not_cached(self):
+        user = User.objects.create_user('ann', 'ann@example.com', 'secret')
+        self.get(user=user)
+        self.get(user=user)
+        self.assertEqual(self.calls, 2)
+
+        request = self.factory.get('/page')
+        request.user = AnonymousUser()
+        request.META['CSRF_COOKIE_USED'] = True
+        self.middleware.process_view(request, self.view, (), {})
+        self.middleware.process_response(request, self.view(request))
+        self.assertEqual(self.get(), '<p>4</p><p>nobody</p>')
+
+    def test_authenticated(self):
+        self.view = pagecache.page_cache(pagecache.CATALOGUE, authenticated=True)(self.render)
+        user = User.objects.create_user('ann', 'ann@example.com', 'secret')
+        self.assertEqual(self.get(visitor='ann', user=user), '<p>1</p><p>ann</p>')
+        self.assertEqual(self.get(), '<p>1</p><p>nobody</p>')
+        self.assertEqual(self.calls, 1)
+
+    def test_ajax_holes(self):
+        self.get(visitor='ann')
+        with override_settings(PAGE_CACHE_AJAX_HOLES=True):
+            self.assertEqual(self.get(visitor='bob'), '<p>1</p><p>' + pagecache.PLACEHOLDER % 'visitor' + '</p>')
+
+        self.client.cookies['visitor'] = 'bob'
+        response = self.client.get(reverse('page_holes'), {'hole': ['visitor', 'bogus']})
+        self.assertEqual(json.loads(response.content), {'visitor': 'bob'})
+
+    def test_staff_links_are_a_hole(self):
+        admin_link = 'href="%s"' % reverse('admin:index')
+        User.objects.create_superuser('staff', 'staff@example.com', 'secret')
+        self.client.login(username='staff', password='secret')
+        self.assertContains(self.client.get(reverse('about')), admin_link)
+
+        # the page is served from the cache, without the staff user's admin link
+        self.client.logout()
+        with patch.object(pagecache.PageCacheMiddleware, 'process_view') as process_view:
+            response = self.client.get(reverse('about'))
+        self.assertFalse(process_view.called)
+        self.assertNotContains(response, admin_link)
+
+
+class CurrencyTest(TestCase):
+
+    def test_format(self):
+        self.assertEqual(format_currency(Decimal('1234567.891')), u'$1,234,567.89')
+        self.assertEqual(format_currency(Decimal('-0.5')), u'-$0.50')
+        self.assertEqual(format_currency(Decimal('-0.001')), u'$0.00')
+        self.assertEqual(format_currency(0.125), u'$0.13')
+        self.assertEqual(format_currency(999), u'$999.00')
+        self.assertEqual(format_currency('1000.005', grouping=False, symbol=False), u'1000.01')
+        self.assertEqual(format_currency(Decimal('1234.5'), 'JPY'), u'\xa51,235')
+
+        euro = CurrencyFormat('EUR', u'\u20ac', decimal_point=u',', thousands_separator=u' ', symbol_first=False,
+                              symbol_separator=u' ')
+        self.assertEqual(euro.format(Decimal('-1234.5')), u'-1 234,50 \u20ac')
+
+    def test_filter(self):
+        self.assertEqual(currency(Decimal('24.99')), u'$24.99')
+        self.assertEqual(currency(Decimal('24.99'), 'GBP'), u'\xa324.99')
+        self.assertEqual(currency(None), u'')
+        self.assertEqual(currency('abc'), u'')
+        self.assertEqual(currency(Decimal('24.99'), 'XYZ'), u'')
+
+
+class QueryParamsTest(TestCase):
+
+    def test_with_changes(self):
+        params = QueryParams.parse('brand=lego&page=2&sortBy=priceMin&brand=hape')
+        changed = params.with_changes({'brand': 'plan', 'pageSize': '32'}, ['page'])
+        self.assertEqual(changed.urlencode(), 'brand=plan&sortBy=priceMin&pageSize=32')
+        self.assertIs(params.with_changes({'pageSize': '32', 'brand': 'plan'}, ['page']), changed)
+        self.assertEqual(params.with_changes({'sortBy': None}).urlencode(), 'brand=lego&page=2&brand=hape')
+        self.assertEqual(params.urlencode(), 'brand=lego&page=2&sortBy=priceMin&brand=hape')
+        self.assertEqual(params.get('brand'), 'lego')
+        self.assertEqual(QueryParams().with_changes({'search': u'caf\xe9'}).urlencode(), 'search=caf%C3%A9')
+
+    def test_repeated_keys(self):
+        params = QueryParams.parse('a=1&b=2&a=2')
+        self.assertEqual(params.with_changes({'a': '3'}).urlencode(), 'a=3&b=2')
+        self.assertEqual(params.with_changes({'a': None}).urlencode(), 'b=2')
+        self.assertEqual(params.with_changes({'b': '3'}).urlencode(), 'a=1&b=3&a=2')
+
+        request = RequestFactory().get('/products/?a=1&a=2')
+        link = Template("{% load extras %}{% add_get a=3 %}").render(Context({'request': request}))
+        self.assertEqual(link, '?a=3')
+
+    def test_parsed_once_per_request(self):
+        request = RequestFactory().get('/products/', {'brand': 'lego'})
+        self.assertIs(get_query_params(request), get_query_params(request))
+        self.assertEqual(list(get_query_params(request)), [('brand', 'lego')])
@@ -3,6 +3,7 @@ __author__ = 'rhyanarthur'
 from decimal import Decimal, ROUND_HALF_DOWN
 from django.contrib.sites.models import get_current_site
 from django.db.models import Model
+from django.contrib.markup.templatetags.markup import markdown
 
 def round_cents(dec_value):
     if not dec_value:
@@ -30,4 +31,14 @@ def get_full_url(instance, request=None):
     if request:
         return request.build_absolute_uri(url)
     # we don't have the request, use the Sites framework
-    return 'http://' + get_current_site(None).domain + url
\ No newline at end of file
+    return 'http://' + get_current_site(None).domain + url
+
+
+def render_markdown(text):
+    """
+    Renders markdown text to HTML, exactly as the 'markdown' template filter would.  Used to store the rendered HTML
+    of markdown fields when they are saved, so templates don't convert markdown on every request.
+    """
+    if not text:
+        return u''
+    return unicode(markdown(text))
@@ -1 +1,18 @@
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+from utils import pagecache
+import json
+
+
+@never_cache
+@require_GET
+def page_holes_view(request):
+    """
+    Returns the per-user parts of a cached page, as a JSON map of hole name --> html, for the holes named by the
+    'hole' parameters.  See utils.pagecache.
+    """
+    names = [name for name in request.GET.getlist('hole') if name in settings.PAGE_CACHE_HOLES]
+    holes = dict((name, pagecache.render_hole(request, name)) for name in names)
+    return HttpResponse(json.dumps(holes), content_type='application/json')
@@ -5,7 +5,6 @@ from utils.validators import not_blank
 from django.core.urlresolvers import reverse
 from cart.models import CartItem
 from orders.models import OrderItem
-from cart import cartutils
 
 
 class WishList(models.Model):
@@ -55,9 +54,9 @@ class WishListItem(models.Model):
         """
         Returns True if this wish list item is in the customer's cart.
         """
-        cart_items = cartutils.get_cart_items(request)
-        # return true if there is a CartLink that links this wish item to any of the given cart_items
-        return WishListItemToCartItem.objects.filter(cart_item__in=cart_items, wishlist_item=self).exists()
+        # imported here because wishutils depends on this module
+        from wishlists.wishutils import get_wishlist_items_in_cart
+        return self.id in get_wishlist_items_in_cart(request)
 
 
 class WishListItemToCartItem(models.Model):
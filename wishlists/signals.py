@@ -1,6 +1,9 @@
 from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
 from orders.signals import signal_order_cancelled
-from models import WishListItem
+from catalogue.models import Product, ProductImage
+from models import WishList, WishListItem
+from wishutils import bump_wishlist_version
 
 @receiver(signal_order_cancelled)
 def order_cancelled(sender, **kwargs):
@@ -13,3 +16,35 @@ def order_cancelled(sender, **kwargs):
             wl_item.full_clean()
             wl_item.save()
 
+
+
+@receiver(post_save, sender=WishList)
+@receiver(post_delete, sender=WishList)
+def wishlist_changed(sender, instance, **kwargs):
+    bump_wishlist_version(instance.id)
+
+
+@receiver(post_save, sender=WishListItem)
+@receiver(post_delete, sender=WishListItem)
+def wishlist_item_changed(sender, instance, **kwargs):
+    """
+    Items are added, removed, have their notes edited, and are marked as purchased by process_order (which sets
+    order_item).  All of these invalidate the cached shop page of the wish list.
+    """
+    bump_wishlist_version(instance.wish_list_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_changed(sender, instance, **kwargs):
+    """
+    The cached shop pages show the product names, prices and images, so invalidate the wish lists that have the
+    product on them.  Product instances are left out: they are saved on every order (stock), and the stock isn't part
+    of the cached page.  Deleted products and instances take their wish list items with them, see
+    wishlist_item_changed.
+    """
+    product_id = instance.id if sender is Product else instance.product_id
+    wishlist_ids = WishListItem.objects.filter(instance__product=product_id).values_list('wish_list', flat=True)
+    for wishlist_id in set(wishlist_ids):
+        bump_wishlist_version(wishlist_id)
@@ -6,6 +6,16 @@ Replace this with more appropriate tests for your application.
 """
 
 from django.test import TestCase
+from django.test.client import RequestFactory
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.contrib.auth.models import User
+from catalogue.models import Category, Brand, Product, ProductInstance, ProductImage, ProductOption, Color
+from cart.models import ProductCartItem
+from cart.cartutils import CART_ID_SESSION_KEY
+from wishlists.models import WishList, WishListItemToCartItem
+from wishlists.wishutils import load_wishlist_items, get_wishlists_by_cart_item
 
 
 class SimpleTest(TestCase):
@@ -14,3 +24,104 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class LoadWishListItemsTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('wisher', 'wisher@example.com', 'password')
+        self.wishlist = WishList.objects.create(user=self.user, name='Birthday')
+        category = Category.objects.create(name='Toys', slug='toys', description='Toys')
+        brand = Brand.objects.create(name='Brand', slug='brand', short_description='-', long_description='-')
+        red = Color.objects.create(name='Red', category=ProductOption.COLOR, html='red')
+        self.instances = []
+        for i in range(3):
+            product = Product.objects.create(name='Product %d' % i, slug='product-%d' % i, brand=brand, price='5.00',
+                                             category=category, meta_description='-', weight='1.0')
+            ProductImage.objects.create(product=product, path='generic.jpg', detail_path='-', alt_text='-')
+            ProductImage.objects.create(product=product, path='red.jpg', detail_path='-', alt_text='-', option=red)
+            instance = ProductInstance.objects.create(product=product, quantity=i, sku='SKU%d' % i)
+            if i:
+                instance.options.add(red)
+            self.wishlist.add_product(instance)
+            self.instances.append(instance)
+
+        self.request = RequestFactory().get('/')
+        self.request.session = {}
+
+    def test_fixed_number_of_queries(self):
+        link = WishListItemToCartItem(wishlist_item=self.wishlist.items.all()[1],
+                                      cart_item=ProductCartItem.objects.create(cart_id='a' * 50,
+                                                                               item=self.instances[1]))
+        link.save()
+        self.request.session[CART_ID_SESSION_KEY] = 'a' * 50
+
+        with self.assertNumQueries(4):
+            items = load_wishlist_items(self.request, self.wishlist)
+            self.assertEqual(['generic.jpg', 'red.jpg', 'red.jpg'], [item.best_image.path for item in items])
+            self.assertEqual([False, True, False], [item.is_in_cart for item in items])
+            self.assertEqual([False, True, False], [item.in_cart(self.request) for item in items])
+            self.assertEqual([0, 1, 2], [item.instance.quantity for item in items])
+            self.assertEqual([[], ['Red'], ['Red']],
+                             [[o.name for o in item.instance.options.all()] for item in items])
+            self.assertFalse(any(item.order_item for item in items))
+
+
+class ShopWishListCacheTest(LoadWishListItemsTest):
+
+    def setUp(self):
+        super(ShopWishListCacheTest, self).setUp()
+        cache.clear()
+        self.url = reverse('wishlist_shop', args=[self.wishlist.id])
+
+    def test_cached_until_items_change(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Product 2')
+        self.assertContains(response, 'Out of Stock', count=1)
+
+        # only the per-customer parts of the page (session, cart) should hit the DB once the page is cached
+        connection.use_debug_cursor = True
+        start = len(connection.queries)
+        response = self.client.get(self.url)
+        connection.use_debug_cursor = None
+        for query in connection.queries[start:]:
+            self.assertNotIn('"catalogue_', query['sql'])
+            self.assertNotIn('"wishlists_wishlist"', query['sql'])
+            self.assertNotIn('"wishlists_wishlistitem"', query['sql'])
+        self.assertContains(response, 'Product 2')
+
+        self.wishlist.items.get(instance=self.instances[2]).delete()
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Product 2')
+
+    def test_stock_refreshed_on_save(self):
+        self.client.get(self.url)
+        self.instances[0].quantity = 5
+        self.instances[0].save()
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Out of Stock')
+
+    def test_refreshed_on_product_edit(self):
+        self.client.get(self.url)
+        product = self.instances[1].product
+        product.sale_price = '3.50'
+        product.save()
+        self.assertContains(self.client.get(self.url), 'Sale: $3.50')
+
+
+class WishListsByCartItemTest(LoadWishListItemsTest):
+
+    def test_single_query(self):
+        other = WishList.objects.create(user=self.user, name='Christmas')
+        other_item = other.add_product(self.instances[0])
+        cart_items = [ProductCartItem.objects.create(cart_id='a' * 50, item=instance) for instance in self.instances]
+        for item in self.wishlist.items.all()[:2]:
+            WishListItemToCartItem.objects.create(wishlist_item=item, cart_item=cart_items[0])
+        WishListItemToCartItem.objects.create(wishlist_item=other_item, cart_item=cart_items[0])
+        WishListItemToCartItem.objects.create(wishlist_item=self.wishlist.items.all()[2], cart_item=cart_items[2])
+
+        with self.assertNumQueries(1):
+            wishlists = get_wishlists_by_cart_item(cart_items)
+            self.assertEqual([self.wishlist, other], wishlists[cart_items[0].id])
+            self.assertNotIn(cart_items[1].id, wishlists)
+            self.assertEqual(['Birthday'], [w.name for w in wishlists[cart_items[2].id]])
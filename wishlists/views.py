@@ -1,12 +1,13 @@
 from django.shortcuts import get_object_or_404, render_to_response
 from django.template import RequestContext
 from forms import CreateWishListForm, RemoveFromWishList, EditWishListForm, EditWishListItemNote
-from django.http import HttpResponseRedirect, HttpResponseForbidden
+from django.http import HttpResponseRedirect, HttpResponseForbidden, Http404
 from models import WishList, WishListItem
 from django.core.urlresolvers import reverse
 from django.core.signing import Signer
 from cart.cartutils import cart_distinct_item_count, cart_subtotal
-from wishlists.wishutils import add_wishlist_item_to_cart
+from wishlists.wishutils import add_wishlist_item_to_cart, load_wishlist_items, get_shop_wishlist, \
+    get_shop_wishlist_items
 from wishlists import signals
 from utils.decorators import ajax_required
 from django.views.decorators.http import require_POST, require_GET
@@ -71,7 +72,7 @@ def view_wishlist(request, wishlist_id):
                 bound_form = form
                 instance_id = data.get('instance_id', None)
 
-    items = wishlist.items.all()
+    items = load_wishlist_items(request, wishlist)
 
     for item in items:
         if bound_form and str(item.id) == instance_id:
@@ -83,7 +84,7 @@ def view_wishlist(request, wishlist_id):
 
     context = {
         'wishlist': wishlist,
-        'items': list(items),   # so that I can use the 'last' template tag on it
+        'items': items,   # a list, so that I can use the 'last' template tag on it
     }
     return render_to_response('wishlist.html', context, context_instance=RequestContext(request))
 
@@ -128,10 +129,16 @@ def shop_wishlist(request, token):
     #wishlist = get_object_or_404(WishList, id=wishlist_id)
 
     # TODO: encrypt the token.  For now it is easier to test without encryption.
-    wishlist = get_object_or_404(WishList, id=token)
-    if wishlist.user == request.user:
+    try:
+        wishlist_id = int(token)
+    except ValueError:
+        raise Http404("Unrecognized Wish List")
+
+    # the rendered page is cached per wish list version, see wishutils.get_shop_wishlist
+    shop = get_shop_wishlist(wishlist_id)
+    if shop['user_id'] == request.user.id:
         # redirect them to their editable wish list page
-        return HttpResponseRedirect(wishlist.get_absolute_url())
+        return HttpResponseRedirect(shop['url'])
 
     if request.method == "POST":
         data = request.POST.copy()
@@ -141,11 +148,9 @@ def shop_wishlist(request, token):
             add_wishlist_item_to_cart(request, wishlist_item)
             return HttpResponseRedirect(reverse('show_cart'))
 
-    items = wishlist.items.all()
-
     context = {
-        'wishlist': wishlist,
-        'items': items,
+        'shop': shop,
+        'items': get_shop_wishlist_items(request, shop),
     }
     return render_to_response('shop_wishlist.html', context, context_instance=RequestContext(request))
 
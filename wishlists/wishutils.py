@@ -1,6 +1,20 @@
+import uuid
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
 from cart import cartutils
+from catalogue.stockutils import get_stock_levels
 from models import WishListItemToCartItem, WishList
 
+# the request attribute used to remember which wish list items are in the customer's cart
+IN_CART_CACHE_ATTR = '_wishlist_items_in_cart'
+
+# shared wish lists are cached per wish list version.  The version changes whenever the wish list, one of its items or
+# one of their products changes (see wishlists.signals), so the timeout only bounds how long a page nobody views stays
+# in the cache.
+SHOP_WISHLIST_TIMEOUT = 15 * 60
+WISHLIST_VERSION_TIMEOUT = 30 * 24 * 60 * 60
+
 
 def add_wishlist_item_to_cart(request, wishlist_item):
     product_instance = wishlist_item.instance
@@ -12,15 +26,132 @@ def add_wishlist_item_to_cart(request, wishlist_item):
     )
     link.full_clean()
     link.save()
+    if hasattr(request, IN_CART_CACHE_ATTR):
+        getattr(request, IN_CART_CACHE_ATTR).add(wishlist_item.id)
+    return link
+
+
+def get_wishlists_by_cart_item(cart_items):
+    """
+    Returns a map from cart item id --> the list of wish lists that cart item was added from, for all of the given
+    cart items, using a single query.  Cart items that weren't added from a wish list are not in the map.
+    """
+    wishlists = {}
+    links = WishListItemToCartItem.objects.filter(cart_item__in=[cart_item.id for cart_item in cart_items]).\
+        select_related('wishlist_item__wish_list').order_by('id')
+    for link in links:
+        wishlist = link.wishlist_item.wish_list
+        item_wishlists = wishlists.setdefault(link.cart_item_id, [])
+        if wishlist not in item_wishlists:
+            item_wishlists.append(wishlist)
+    return wishlists
+
+
+def get_wishlist_items_in_cart(request):
+    """
+    Returns the set of ids of the wish list items that are linked to an item in the customer's cart.  The set is
+    computed once per request, so checking whether a wish list item is in the cart is a set lookup.
+    """
+    if not hasattr(request, IN_CART_CACHE_ATTR):
+        if request.session.get(cartutils.CART_ID_SESSION_KEY, '') == '':
+            # the customer doesn't have a cart yet, so there's nothing to look up
+            item_ids = []
+        else:
+            item_ids = WishListItemToCartItem.objects.filter(cart_item__cart_id=cartutils._cart_id(request)).\
+                values_list('wishlist_item', flat=True)
+        setattr(request, IN_CART_CACHE_ATTR, set(item_ids))
+    return getattr(request, IN_CART_CACHE_ATTR)
+
+
+def load_wishlist_items(request, wishlist):
+    """
+    Returns a list of the items in the given wish list with everything the wish list templates need already loaded:
+    the product instances, products, options, images, purchasing order items and whether or not each item is in the
+    customer's cart.  This takes a fixed number of queries no matter how many items are on the list.  Each item gets
+    a best_image attribute and an is_in_cart attribute.
+    """
+    items = _get_hydrated_items(wishlist)
+    in_cart = get_wishlist_items_in_cart(request)
+    for item in items:
+        setattr(item, 'is_in_cart', item.id in in_cart)
+    return items
+
+
+def _get_hydrated_items(wishlist):
+    items = list(wishlist.items.select_related('instance__product', 'order_item').
+                 prefetch_related('instance__options', 'instance__product__images'))
+    for item in items:
+        setattr(item, 'best_image', item.instance.get_best_prefetched_image())
+    return items
+
+
+def _version_key(wishlist_id):
+    return 'wishlist-version-%s' % wishlist_id
+
+
+def get_wishlist_version(wishlist_id):
+    """
+    Returns the current version of the given wish list.  Cached renderings of the wish list are keyed on this value.
+    """
+    key = _version_key(wishlist_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version, WISHLIST_VERSION_TIMEOUT)
+    return version
+
+
+def bump_wishlist_version(wishlist_id):
+    """
+    Invalidates any cached renderings of the given wish list.  Versions are random rather than counters so that a
+    version key that was evicted from the cache can never be re-used for stale content.
+    """
+    cache.set(_version_key(wishlist_id), uuid.uuid4().hex, WISHLIST_VERSION_TIMEOUT)
 
 
-def get_wishlists(request):
-    # returns a list of wish lists that the user has been shopping from
-    cart_id = cartutils._cart_id(request)
-    wishlist_item_ids = WishListItemToCartItem.objects.filter(cart_item__cart_id=cart_id).values_list('wishlist_item')
-    return WishList.objects.filter(items__id__in=wishlist_item_ids).distinct()
+def get_shop_wishlist(wishlist_id):
+    """
+    Returns the cached, pre-rendered version of the shared ('shop') page of the given wish list.  This is a
+    dictionary with the wish list's id, owner id, and url, the rendered header and the rendered item rows.  Each
+    item row records the wish list item id, the product instance id, and whether or not the item has been
+    purchased, so that the per-customer parts of the page (in-cart and stock status) can be filled in separately.
+    Raises Http404 if the wish list doesn't exist.
+    """
+    key = 'wishlist-shop-%s-%s' % (wishlist_id, get_wishlist_version(wishlist_id))
+    shop = cache.get(key)
+    if shop is None:
+        wishlist = get_object_or_404(WishList.objects.select_related('user'), id=wishlist_id)
+        items = []
+        for item in _get_hydrated_items(wishlist):
+            items.append({
+                'id': item.id,
+                'instance_id': item.instance_id,
+                'is_purchased': item.order_item is not None,
+                'html': render_to_string('_shop_wishlist_item.html', {'item': item}),
+            })
+        shop = {
+            'id': wishlist.id,
+            'user_id': wishlist.user_id,
+            'url': wishlist.get_absolute_url(),
+            'header': render_to_string('_shop_wishlist_header.html', {'wishlist': wishlist}),
+            'items': items,
+        }
+        cache.set(key, shop, SHOP_WISHLIST_TIMEOUT)
+    return shop
 
 
-def get_wishlists_for_item(cart_item):
-    wishlist_item_ids = cart_item.wishlist_links.values_list('wishlist_item')
-    return WishList.objects.filter(items__id__in=wishlist_item_ids).distinct()
+def get_shop_wishlist_items(request, shop):
+    """
+    Combines the cached item rows of a shop wish list (see get_shop_wishlist) with the state that is specific to
+    this customer, or that changes too often to be cached with the rest of the page: whether each item is in the
+    customer's cart, and whether it is in stock.  Returns a list of item dictionaries.
+    """
+    in_cart = get_wishlist_items_in_cart(request)
+    stock = get_stock_levels([item['instance_id'] for item in shop['items']])
+    items = []
+    for item in shop['items']:
+        item = dict(item)
+        item['is_in_cart'] = item['id'] in in_cart
+        item['in_stock'] = stock.get(item['instance_id'], 0) > 0
+        items.append(item)
+    return items